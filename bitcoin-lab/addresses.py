@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+import hashlib
+
+"""
+Offline address decoding for the lab scripts.
+
+Turns base58check (P2PKH/P2SH) and bech32/bech32m (segwit v0/v1+) addresses
+into their scriptPubKey without asking bitcoind, following BIP 173/350, and
+encodes segwit addresses (used by mockbitcoind.py).
+"""
+
+BASE58_ALPHABET = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+BECH32_CHARSET = "qpzry9x8gf2tvdw0s3jn54khce6mua7l"
+BECH32_CONST = 1
+BECH32M_CONST = 0x2bc830a3
+
+# base58 version byte -> (network, kind); testnet and regtest share versions
+BASE58_VERSIONS = {
+    0x00: ("main", "p2pkh"),
+    0x05: ("main", "p2sh"),
+    0x6f: ("test", "p2pkh"),
+    0xc4: ("test", "p2sh"),
+}
+BECH32_HRPS = {"bc": "main", "tb": "test", "bcrt": "regtest"}
+# getblockchaininfo "chain" -> the network its addresses decode to
+CHAIN_NETWORKS = {"main": "main", "test": "test", "testnet4": "test", "signet": "test", "regtest": "regtest"}
+
+
+# --- BASE58CHECK ---
+def b58decode_check(address):
+    num = 0
+    for char in address:
+        index = BASE58_ALPHABET.find(char)
+        if index < 0: raise ValueError(f"Invalid base58 character {char!r}")
+        num = num * 58 + index
+    pad = len(address) - len(address.lstrip("1"))
+    raw = b'\x00' * pad + (num.to_bytes((num.bit_length() + 7) // 8, "big") if num else b'')
+    if len(raw) < 5: raise ValueError("Base58 payload too short")
+    payload, checksum = raw[:-4], raw[-4:]
+    if hashlib.sha256(hashlib.sha256(payload).digest()).digest()[:4] != checksum:
+        raise ValueError("Bad base58 checksum")
+    return payload
+
+
+# --- BECH32 / BECH32M ---
+def bech32_polymod(values):
+    generator = (0x3b6a57b2, 0x26508e6d, 0x1ea119fa, 0x3d4233dd, 0x2a1462b3)
+    chk = 1
+    for value in values:
+        top = chk >> 25
+        chk = (chk & 0x1ffffff) << 5 ^ value
+        for i in range(5):
+            chk ^= generator[i] if (top >> i) & 1 else 0
+    return chk
+
+def bech32_hrp_expand(hrp):
+    return [ord(c) >> 5 for c in hrp] + [0] + [ord(c) & 31 for c in hrp]
+
+def bech32_decode(address):
+    """Returns (hrp, data, const) where const tells bech32 from bech32m."""
+    if address.lower() != address and address.upper() != address:
+        raise ValueError("Mixed-case bech32 address")
+    address = address.lower()
+    sep = address.rfind("1")
+    if sep < 1 or sep + 7 > len(address) or len(address) > 90:
+        raise ValueError("Malformed bech32 address")
+    hrp = address[:sep]
+    try:
+        data = [BECH32_CHARSET.index(c) for c in address[sep + 1:]]
+    except ValueError:
+        raise ValueError("Invalid bech32 character") from None
+    const = bech32_polymod(bech32_hrp_expand(hrp) + data)
+    if const not in (BECH32_CONST, BECH32M_CONST):
+        raise ValueError("Bad bech32 checksum")
+    return hrp, data[:-6], const
+
+def convertbits(data, frombits, tobits, pad=False):
+    acc = 0
+    bits = 0
+    out = []
+    maxv = (1 << tobits) - 1
+    for value in data:
+        acc = (acc << frombits) | value
+        bits += frombits
+        while bits >= tobits:
+            bits -= tobits
+            out.append((acc >> bits) & maxv)
+    if pad:
+        if bits: out.append((acc << (tobits - bits)) & maxv)
+    elif bits >= frombits or (acc << (tobits - bits)) & maxv:
+        raise ValueError("Invalid bech32 padding")
+    return bytes(out)
+
+def encode_segwit_address(hrp, version, program):
+    """bech32 (v0) or bech32m (v1+) address for a witness program."""
+    data = [version] + list(convertbits(program, 8, 5, pad=True))
+    const = BECH32_CONST if version == 0 else BECH32M_CONST
+    polymod = bech32_polymod(bech32_hrp_expand(hrp) + data + [0] * 6) ^ const
+    checksum = [(polymod >> 5 * (5 - i)) & 31 for i in range(6)]
+    return hrp + "1" + "".join(BECH32_CHARSET[d] for d in data + checksum)
+
+
+# --- SCRIPTS ---
+def chain_accepts(chain, address, network):
+    """
+    True if an address that decode_address() placed on `network` is valid
+    on a node running `chain` (getblockchaininfo's name). Regtest has its
+    own bech32 prefix but shares testnet's base58 versions.
+    """
+    expected = CHAIN_NETWORKS.get(chain)
+    if network == expected: return True
+    sep = address.rfind("1")
+    bech32 = sep > 0 and address[:sep].lower() in BECH32_HRPS
+    return expected == "regtest" and network == "test" and not bech32
+
+def decode_address(address):
+    """
+    Returns (network, script_pubkey) for a standard address.
+    Raises ValueError for anything it cannot decode locally.
+    """
+    sep = address.rfind("1")
+    if sep > 0 and address[:sep].lower() in BECH32_HRPS:
+        hrp, data, const = bech32_decode(address)
+        if not data: raise ValueError("Empty witness program")
+        version = data[0]
+        program = convertbits(data[1:], 5, 8)
+        if version > 16 or not 2 <= len(program) <= 40:
+            raise ValueError("Invalid witness program")
+        if version == 0 and len(program) not in (20, 32):
+            raise ValueError("Invalid v0 witness program length")
+        if (const == BECH32_CONST) != (version == 0):
+            raise ValueError("Wrong bech32 variant for witness version")
+        op_version = 0x50 + version if version else 0x00
+        return BECH32_HRPS[hrp], bytes([op_version, len(program)]) + program
+
+    payload = b58decode_check(address)
+    if len(payload) != 21 or payload[0] not in BASE58_VERSIONS:
+        raise ValueError("Unknown base58 address version")
+    network, kind = BASE58_VERSIONS[payload[0]]
+    if kind == "p2pkh":
+        return network, b'\x76\xa9\x14' + payload[1:] + b'\x88\xac'
+    return network, b'\xa9\x14' + payload[1:] + b'\x87'
@@ -4,13 +4,20 @@ import threading
 import json
 import time
 import random
-import subprocess
 import logging
-import sys
 import argparse
 import signal
+import struct
 import os
-from logging.handlers import RotatingFileHandler
+import asyncio
+import math
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import lablog
+import labmetrics
+import zmqnotify
+from rpcclient import RPCClient, RPCError, RPCTimeout
 
 """
 AI Disclosure: this script was fully vibed by Gemini 3 Pro
@@ -24,122 +31,596 @@ DEFAULT_WALLET_NAME = "student"
 # UPDATED: Only clean the mempool if it exceeds 4000 transactions
 DEFAULT_MEMPOOL_TRIGGER = 4000 
 MAX_CONCURRENT_CONNECTIONS = 10 
+# asyncio listener: connections handled at once (the rest wait for a slot)
+MAX_ASYNC_CONNECTIONS = 1000
+CLIENT_TIMEOUT = 5
+# Peer discovery: parallel exchanges per sweep, and retry backoff for dead peers
+DEFAULT_DISCOVERY_WORKERS = 8
+PEER_BACKOFF_BASE = 300
+PEER_BACKOFF_MAX = 6 * 60 * 60
+LOOPBACK_HOSTS = ("127.0.0.1", "::1", "localhost")
+# Verbose traces kept per kind (1 in N): "rpc" commands/responses, "net" exchange payloads
+DEFAULT_LOG_SAMPLE = {"rpc": 10, "net": 1}
+# Rate-controlled generator (--target-tps): burst size, status poll period, and
+# how it slows down as the mempool fills towards --mempool-trigger
+DEFAULT_OUTPUTS_PER_TX = 2
+TPS_BURST_SECONDS = 2
+TPS_STATUS_INTERVAL = 5
+TPS_SLOWDOWN_START = 0.5
+TPS_MIN_FACTOR = 0.05
+GENERATOR_AMOUNT = (0.0001, 0.001)
+# UTXO view: full listunspent resync period, minimum gap between refreshes, and
+# the pool of small confirmed coins that sends draw from. Each send ties up one
+# coin until the next block, so the pool aims for target_tps x block interval
+# (x POOL_HEADROOM, at least SPLIT_TARGET) and is split off big coins when
+# fewer than half of that are left
+UTXO_RESYNC_INTERVAL = 120
+UTXO_REFRESH_MIN = 1.0
+COINBASE_MATURITY = 10  # custom-genesis.patch lowers it from 100
+SPLIT_TARGET = 50
+SPLIT_MAX_OUTPUTS = 500  # per split transaction, well under the standard weight limit
+SPLIT_VALUE = 0.05
+SEND_FEE_MARGIN = 0.001
+POOL_HEADROOM = 1.5
+DEFAULT_BLOCK_INTERVAL = 600  # until two block arrivals have been seen
+BLOCK_INTERVAL_SAMPLES = 10
+# Receive addresses: ring size, and how many fresh ones are rotated in how often
+ADDRESS_RING_SIZE = 64
+ADDRESS_ROTATE_INTERVAL = 120
+ADDRESS_ROTATE_COUNT = 16
+# Address gossip: peers known (and for how long), peers contacted per sweep, entries sent per exchange
+PEER_TABLE_SIZE = 1024
+PEER_TTL = 30 * 60
+DEFAULT_GOSSIP_FANOUT = 4
+GOSSIP_BATCH = 64
+GOSSIP_MAGIC = b"LAB"
+GOSSIP_VERSION = 1
+GOSSIP_HEADER = struct.Struct(">3sBI")  # magic, version, payload length
+GOSSIP_MAX_BYTES = 256 * 1024
+
+# --- METRICS ---
+METRICS = labmetrics.Registry("agent")
+RPC_SECONDS = METRICS.histogram("rpc_seconds", "RPC round-trip time per method ('batch' for batched calls)", ("method",))
+RPC_TIMEOUTS = METRICS.counter("rpc_timeouts_total", "RPC calls that timed out", ("method",))
+RPC_ERRORS = METRICS.counter("rpc_errors_total", "RPC calls answered with an error or failed to connect", ("method",))
+CONNECTIONS = METRICS.counter("listener_connections_total", "Address-exchange connections accepted", ("listener",))
+REJECTIONS = METRICS.counter("listener_rejections_total",
+                             "Times all connection slots were busy (threaded: accepts paused; asyncio: a connection had to queue)",
+                             ("listener",))
+EXCHANGES = METRICS.counter("exchanges_total", "Outbound address exchanges per peer", ("peer", "result"))
+TXS_BROADCAST = METRICS.counter("txs_broadcast_total", "Transactions sent (payment or coin-pool split)", ("kind",))
+RECOVERY_BLOCKS = METRICS.counter("recovery_blocks_total", "Blocks mined by the agent itself, per reason", ("reason",))
+PEER_MAP_SIZE = METRICS.gauge("peer_map_size", "Peers with a known wallet address")
+GOSSIP_LEARNED = METRICS.counter("gossip_learned_total", "Peer table entries added or refreshed by gossip (not direct exchange)")
+
+def parse_peer_host(addr):
+    """Host part of a getpeerinfo addr: "1.2.3.4:8333", "[2001:db8::1]:8333" or a bare host."""
+    if addr.startswith('['):
+        return addr[1:addr.index(']')]
+    if addr.count(':') == 1:
+        return addr.rsplit(':', 1)[0]
+    # No port, or an unbracketed IPv6 literal
+    return addr
+
+# --- GOSSIP WIRE FORMAT ---
+# v1: GOSSIP_HEADER, then a JSON payload {"address": ..., "peers": [[ip, address, last_seen], ...]}.
+# Legacy agents send and answer a bare JSON object ({"address": ...}) instead.
+def encode_gossip(address, entries):
+    payload = json.dumps({"address": address, "peers": [[ip, addr, int(seen)] for ip, addr, seen in entries]}).encode('utf-8')
+    return GOSSIP_HEADER.pack(GOSSIP_MAGIC, GOSSIP_VERSION, len(payload)) + payload
+
+def gossip_frame_size(header):
+    """Total frame length announced by a v1 header. Raises ValueError for anything we won't read."""
+    magic, version, length = GOSSIP_HEADER.unpack_from(header)
+    if magic != GOSSIP_MAGIC: raise ValueError("Not a gossip frame")
+    if version != GOSSIP_VERSION: raise ValueError(f"Unsupported gossip version {version}")
+    if length > GOSSIP_MAX_BYTES: raise ValueError(f"Gossip frame too large ({length} bytes)")
+    return GOSSIP_HEADER.size + length
+
+def decode_gossip(payload):
+    """(address, [(ip, address, last_seen), ...]) from a v1 payload; malformed entries are dropped."""
+    msg = json.loads(payload)
+    if not isinstance(msg, dict): raise ValueError("Gossip payload is not an object")
+    address = msg.get("address")
+    entries = []
+    for entry in msg.get("peers") or []:
+        if not isinstance(entry, list) or len(entry) != 3: continue
+        ip, addr, seen = entry
+        if isinstance(ip, str) and isinstance(addr, str) and isinstance(seen, (int, float)) and ip and addr:
+            entries.append((ip, addr, seen))
+    return (address if isinstance(address, str) else None), entries[:GOSSIP_BATCH]
+
+def recv_message(sock, first=b""):
+    """
+    One message from a socket: a whole v1 frame (header + payload), or a
+    legacy JSON object (a single recv). Returns b"" if the peer sent nothing.
+    """
+    data = first or sock.recv(4096)
+    if not data or not GOSSIP_MAGIC.startswith(data[:len(GOSSIP_MAGIC)]): return data
+    while len(data) < GOSSIP_HEADER.size:
+        chunk = sock.recv(GOSSIP_HEADER.size - len(data))
+        if not chunk: raise ConnectionError("Connection closed inside a gossip header")
+        data += chunk
+    total = gossip_frame_size(data)
+    while len(data) < total:
+        chunk = sock.recv(min(65536, total - len(data)))
+        if not chunk: raise ConnectionError("Connection closed inside a gossip frame")
+        data += chunk
+    return data[:total]
+
+def normalize_ip(host):
+    """A dual-stack listener sees IPv4 clients as ::ffff:a.b.c.d; getpeerinfo reports a.b.c.d."""
+    return host[7:] if host.lower().startswith("::ffff:") and "." in host else host
+
+def adaptive_tps(target_tps, mempool_size, mempool_trigger):
+    """
+    Full target rate while the mempool is under TPS_SLOWDOWN_START of the
+    trigger, then linearly less, down to TPS_MIN_FACTOR of it at the trigger.
+    """
+    if mempool_trigger <= 0: return target_tps
+    fill = mempool_size / mempool_trigger
+    if fill <= TPS_SLOWDOWN_START: return target_tps
+    factor = (1 - fill) / (1 - TPS_SLOWDOWN_START)
+    return target_tps * max(TPS_MIN_FACTOR, factor)
+
+class TokenBucket:
+    """
+    Refills `rate` tokens per second up to `capacity`; take() never blocks.
+    Starts empty, so a generator ramps up at the target rate instead of
+    opening with a full burst.
+    """
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = 0.0
+        self.last = time.monotonic()
+
+    def refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+        self.last = now
+
+    def set_rate(self, rate):
+        self.refill()
+        self.rate = rate
+
+    def take(self, n=1):
+        self.refill()
+        if self.tokens < n: return False
+        self.tokens -= n
+        return True
+
+    def wait_time(self, n=1):
+        """Seconds until n tokens are available."""
+        self.refill()
+        if self.tokens >= n: return 0.0
+        return (n - self.tokens) / self.rate if self.rate > 0 else float("inf")
+
+class AddressRing:
+    """
+    Fixed-size ring of our receive addresses, derived in bulk from the
+    wallet's active receive descriptor (one deriveaddresses call per range)
+    and rotated in the background. Writers swap in a new tuple, so readers
+    pick an address without taking a lock.
+    """
+    def __init__(self, rpc, rpc_batch, size=ADDRESS_RING_SIZE):
+        self.rpc = rpc
+        self.rpc_batch = rpc_batch
+        self.size = size
+        self.addresses = ()
+        self.descriptor = None
+        self.cursor = 0       # next index we derive
+        self.wallet_next = 0  # next index getnewaddress would hand out
+        self.range_end = 0    # first index the wallet no longer watches
+        self.lock = threading.RLock()  # writers only
+
+    def pick(self):
+        addresses = self.addresses
+        return random.choice(addresses) if addresses else None
+
+    def load_descriptor(self):
+        """Reads the active receive descriptor and its range. False for legacy (non-descriptor) wallets."""
+        listing = self.rpc("listdescriptors")
+        if not isinstance(listing, dict): return False
+        receive = [d for d in listing.get("descriptors", []) if d.get("active") and not d.get("internal") and "range" in d]
+        receive.sort(key=lambda d: not d["desc"].startswith("wpkh("))  # getnewaddress' default bech32
+        for d in receive:
+            info = self.rpc("getdescriptorinfo", [d["desc"]])
+            if not isinstance(info, dict) or not info.get("isrange"): continue
+            self.descriptor = info["descriptor"]
+            self.wallet_next = d.get("next_index", d.get("next", 0))
+            self.cursor = max(self.cursor, self.wallet_next)
+            self.range_end = d["range"][1] + 1
+            return True
+        return False
+
+    def derive(self, count):
+        """The next `count` receive addresses, without touching the ring."""
+        with self.lock:
+            if self.descriptor is None: self.load_descriptor()
+            if self.descriptor is not None and self.cursor + count > self.range_end:
+                # Addresses past the keypool would never be seen by the wallet
+                self.rpc("keypoolrefill", [self.cursor + count - self.wallet_next + self.size])
+                self.load_descriptor()
+            if self.descriptor is None or self.cursor + count > self.range_end:
+                return [a for a in self.rpc_batch([("getnewaddress", [])] * count) if isinstance(a, str)]
+
+            addresses = self.rpc("deriveaddresses", [self.descriptor, [self.cursor, self.cursor + count - 1]])
+            if not isinstance(addresses, list): return []
+            self.cursor += count
+            return addresses
+
+    def rotate(self, count=None):
+        """Derives `count` fresh addresses (a full ring the first time) and keeps the newest `size`."""
+        with self.lock:
+            fresh = self.derive(count or (ADDRESS_ROTATE_COUNT if self.addresses else self.size))
+            if fresh: self.addresses = (self.addresses + tuple(fresh))[-self.size:]
+            return fresh
+
+class PeerTable:
+    """
+    ip -> (wallet address, last_seen) for the other agents, learned by direct
+    exchange or through gossip. Entries older than `ttl` expire, and past
+    `capacity` the stalest entry is evicted. last_seen travels with gossip, so
+    an address that nobody has heard from directly ages out everywhere.
+    """
+    def __init__(self, capacity=PEER_TABLE_SIZE, ttl=PEER_TTL):
+        self.capacity = capacity
+        self.ttl = ttl
+        self.entries = {}
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, ip):
+        return ip in self.entries
+
+    def update(self, ip, address, last_seen=None):
+        """Stores the entry unless we already hold a fresher one (or it has expired). True if stored."""
+        now = time.time()
+        last_seen = now if last_seen is None else min(last_seen, now)  # distrust clocks running ahead
+        if now - last_seen > self.ttl: return False
+        with self.lock:
+            current = self.entries.get(ip)
+            if current and current[1] >= last_seen: return False
+            self.entries[ip] = (address, last_seen)
+            if len(self.entries) > self.capacity:
+                stalest = min(self.entries, key=lambda k: self.entries[k][1])
+                del self.entries[stalest]
+            return True
+
+    def expire(self, now=None):
+        """Drops entries older than the TTL; returns how many."""
+        cutoff = (now or time.time()) - self.ttl
+        with self.lock:
+            stale = [ip for ip, (_, seen) in self.entries.items() if seen < cutoff]
+            for ip in stale:
+                del self.entries[ip]
+        return len(stale)
+
+    def live(self):
+        """[(ip, address, last_seen)] for entries within the TTL."""
+        cutoff = time.time() - self.ttl
+        with self.lock:
+            return [(ip, addr, seen) for ip, (addr, seen) in self.entries.items() if seen >= cutoff]
+
+    def addresses(self):
+        return [addr for _, addr, _ in self.live()]
+
+    def choice(self):
+        """A random live (ip, address), or None."""
+        live = self.live()
+        return random.choice(live)[:2] if live else None
+
+    def sample(self, count, exclude=None):
+        """Up to `count` random live entries to gossip, leaving out `exclude` (the peer we are talking to)."""
+        live = [entry for entry in self.live() if entry[0] != exclude]
+        return random.sample(live, min(count, len(live)))
+
+class UtxoView:
+    """
+    Local copy of the wallet's unspent coins, kept current with listsinceblock
+    (plus a full listunspent every UTXO_RESYNC_INTERVAL), so sends can pick
+    confirmed inputs themselves instead of running into the mempool chain
+    limit ("Unconfirmed UTXOs are available") and mining their way out.
+    """
+    def __init__(self, rpc_batch):
+        self.rpc_batch = rpc_batch
+        self.lock = threading.Lock()
+        self.coins = {}  # (txid, vout) -> {"amount", "height" (None if unconfirmed), "coinbase", "address"}
+        self.reserved = set()
+        self.last_block = None
+        self.tip_height = 0
+        self.tip_times = deque(maxlen=BLOCK_INTERVAL_SAMPLES)  # (arrival time, height) of new tips
+        self.synced_at = 0
+        self.refreshed_at = 0
+
+    def _coin(self, entry, coinbase):
+        confirmations = entry.get("confirmations", 0)
+        height = self.tip_height - confirmations + 1 if confirmations > 0 else None
+        return {"amount": float(entry["amount"]), "height": height,
+                "coinbase": coinbase, "address": entry.get("address")}
+
+    def _note_tip(self, height, now):
+        # Called with the lock held, before tip_height moves; the tip found at startup is not an arrival
+        if self.tip_height and height > self.tip_height: self.tip_times.append((now, height))
+
+    def _confirmations(self, coin):
+        return 0 if coin["height"] is None else self.tip_height - coin["height"] + 1
+
+    def _spendable(self, coin):
+        # The wallet spends coinbases one block after consensus would allow
+        return self._confirmations(coin) >= (COINBASE_MATURITY + 1 if coin["coinbase"] else 1)
+
+    def refresh(self, force=False):
+        """Brings the view up to the node's tip. Returns False if the node could not be queried."""
+        now = time.time()
+        with self.lock:
+            if not force and now - self.refreshed_at < UTXO_REFRESH_MIN: return True
+            last_block = self.last_block
+            full = last_block is None or now - self.synced_at >= UTXO_RESYNC_INTERVAL
+
+        if full:
+            # listunspent leaves immature coinbases out; they come back through
+            # listsinceblock as "generate" once they mature
+            unspent, info = self.rpc_batch([("listunspent", [0]), ("getblockchaininfo", [])])
+            if not isinstance(unspent, list) or not isinstance(info, dict): return False
+            with self.lock:
+                self._note_tip(info["blocks"], now)
+                self.tip_height = info["blocks"]
+                self.coins = {(u["txid"], u["vout"]): self._coin(u, False) for u in unspent}
+                self.reserved &= self.coins.keys()
+                self.last_block = info["bestblockhash"]
+                self.synced_at = self.refreshed_at = now
+            return True
+
+        # blockhash, target_confirmations, include_watchonly, include_removed, include_change
+        since, info = self.rpc_batch([("listsinceblock", [last_block, 1, False, True, True]),
+                                      ("getblockchaininfo", [])])
+        if not isinstance(since, dict) or not isinstance(info, dict): return False
+        with self.lock:
+            self._note_tip(info["blocks"], now)
+            self.tip_height = info["blocks"]
+            for tx in since.get("removed", []):
+                self.coins.pop((tx["txid"], tx.get("vout")), None)
+            for tx in since.get("transactions", []):
+                category = tx.get("category")
+                if category not in ("receive", "generate", "immature"): continue
+                key = (tx["txid"], tx["vout"])
+                if tx.get("confirmations", 0) < 0:
+                    self.coins.pop(key, None)  # conflicted
+                    continue
+                self.coins[key] = self._coin(tx, category != "receive")
+            self.last_block = since.get("lastblock") or info["bestblockhash"]
+            self.refreshed_at = now
+        return True
+
+    def invalidate(self):
+        """Forces a full resync on the next refresh (e.g. a coin turned out to be spent)."""
+        with self.lock:
+            self.last_block = None
+
+    def select(self, amount):
+        """
+        Reserves spendable coins worth at least `amount` and returns their
+        outpoints: the smallest single coin that covers it, else the largest
+        coins first. Returns [] if the confirmed coins are not enough.
+        """
+        with self.lock:
+            coins = sorted(((key, coin["amount"]) for key, coin in self.coins.items()
+                            if key not in self.reserved and self._spendable(coin)), key=lambda c: c[1])
+            chosen = next(([key] for key, value in coins if value >= amount), None)
+            if chosen is None:
+                chosen, total = [], 0.0
+                for key, value in reversed(coins):
+                    chosen.append(key)
+                    total += value
+                    if total >= amount: break
+                else:
+                    return []
+            self.reserved.update(chosen)
+            return chosen
+
+    def spent(self, outpoints):
+        with self.lock:
+            for key in outpoints:
+                self.coins.pop(key, None)
+                self.reserved.discard(key)
+
+    def release(self, outpoints):
+        with self.lock:
+            self.reserved.difference_update(outpoints)
+
+    def total(self):
+        """Value that is spendable now or once its transaction confirms (immature coinbases excluded)."""
+        with self.lock:
+            return sum(coin["amount"] for key, coin in self.coins.items()
+                       if key not in self.reserved and (not coin["coinbase"] or self._spendable(coin)))
+
+    def pool_status(self):
+        """(spendable small coins that sends can draw from, total value of the spendable big ones)."""
+        with self.lock:
+            small, big = 0, 0.0
+            for key, coin in self.coins.items():
+                if key in self.reserved or not self._spendable(coin): continue
+                if coin["amount"] <= SPLIT_VALUE * 2: small += 1
+                else: big += coin["amount"]
+            return small, big
+
+    def block_interval(self):
+        """Seconds per block over the recent arrivals, or DEFAULT_BLOCK_INTERVAL until two were seen."""
+        with self.lock:
+            if len(self.tip_times) < 2: return DEFAULT_BLOCK_INTERVAL
+            (first_at, first_height), (last_at, last_height) = self.tip_times[0], self.tip_times[-1]
+        return max(1.0, (last_at - first_at) / (last_height - first_height))
 
 class BitcoinAgent:
-    def __init__(self, port, log_path, wallet_name, mempool_trigger, verbose=False):
+    def __init__(self, port, log_path, wallet_name, mempool_trigger, verbose=False,
+                 listener="threaded", max_connections=MAX_ASYNC_CONNECTIONS,
+                 discovery_workers=DEFAULT_DISCOVERY_WORKERS,
+                 target_tps=None, outputs_per_tx=DEFAULT_OUTPUTS_PER_TX, zmq_endpoint="auto",
+                 log_sample=None, metrics_port=None, gossip_fanout=DEFAULT_GOSSIP_FANOUT):
         self.running = True
+        self.gossip_fanout = gossip_fanout
+        self.zmq_endpoint = zmq_endpoint
+        self.metrics_port = metrics_port
+        self.events = None  # zmqnotify.ChainEvents once subscribed
+        self.target_tps = target_tps
+        self.outputs_per_tx = max(1, outputs_per_tx)
+        self.discovery_workers = max(1, discovery_workers)
         self.port = port
+        self.listener = listener
+        self.max_connections = max_connections
         self.wallet_name = wallet_name
         self.mempool_trigger = mempool_trigger
         self.verbose = verbose
-        self.rpc_cmd = ["bitcoin-cli", f"-rpcwallet={self.wallet_name}"]
         self.rpc_timeout = 30 # [FIX] Prevent hangs
+        self.rpc_client = RPCClient(wallet=self.wallet_name, timeout=self.rpc_timeout)
         
         # --- CONCURRENCY LOCKS ---
-        self.addr_lock = threading.Lock()
         self.peer_lock = threading.Lock()
         
         self.conn_limit = threading.Semaphore(MAX_CONCURRENT_CONNECTIONS)
         
-        # Setup Rotating Logging
-        logging.basicConfig(
-            level=logging.INFO,
-            format='%(asctime)s [%(levelname)s] %(message)s',
-            datefmt='%H:%M:%S',
-            handlers=[
-                RotatingFileHandler(log_path, maxBytes=5*1024*1024, backupCount=3),
-                logging.StreamHandler(sys.stdout)
-            ]
-        )
+        # Queued logging: JSON lines to a rotating file, text to stdout, written off-thread
+        lablog.setup(log_path, sample={**DEFAULT_LOG_SAMPLE, **(log_sample or {})})
         self.logger = logging.getLogger("Agent")
         
         # State
-        self.local_addresses = []
-        self.peer_map = {} 
+        self.addresses = AddressRing(self.rpc, self.rpc_batch)
+        self.peer_map = PeerTable()
+        self.legacy_peers = {}  # ip -> when it answered as an old single-address JSON agent (PEER_TTL)
+        self.peer_backoff = {}  # ip -> (consecutive failures, next attempt time)
         self.last_rpc_error = None
+        self.utxos = UtxoView(self.rpc_batch)
         
         # Ensure wallet exists and load initial state
         self.check_wallet()
-        self.refresh_local_addresses()
+        self.addresses.rotate()
 
     # --- BITCOIN RPC HELPERS ---
     def rpc(self, method, params=None):
-        """Executes a bitcoin-cli command with safe parsing and timeouts."""
+        """Executes a JSON-RPC call with safe error handling and timeouts."""
         self.last_rpc_error = None 
         if params is None: params = []
         
-        cmd = self.rpc_cmd + [method] + [str(p) for p in params]
-        
         if self.verbose:
-            self.logger.info(f"CMD EXEC: {' '.join(cmd)}")
+            self.logger.info("CMD EXEC: %s %s", method, lablog.Lazy(json.dumps, params), extra={"kind": "rpc"})
 
         try:
-            # [FIX] Added timeout=30 to prevent zombie processes if bitcoind hangs
-            result_bytes = subprocess.check_output(cmd, stderr=subprocess.PIPE, timeout=self.rpc_timeout)
-            result_str = result_bytes.decode('utf-8').strip()
+            with RPC_SECONDS.time(method=method):
+                result = self.rpc_client.call(method, params)
             
-            if self.verbose and result_str:
-                log_out = result_str if len(result_str) < 100 else result_str[:100] + "..."
-                self.logger.info(f"CMD RESP: {log_out}")
+            if self.verbose and result is not None:
+                self.logger.info("CMD RESP: %s", lablog.Lazy(lablog.preview, result), extra={"kind": "rpc"})
 
-            try:
-                return json.loads(result_str)
-            except json.JSONDecodeError:
-                return result_str
+            return result
 
-        except subprocess.TimeoutExpired:
+        except RPCTimeout:
+            RPC_TIMEOUTS.inc(method=method)
             self.logger.error(f"RPC TIMEOUT: {method} took >{self.rpc_timeout}s")
             return None
-        except subprocess.CalledProcessError as e:
-            if e.stderr:
-                try:
-                    self.last_rpc_error = e.stderr.decode('utf-8').strip()
-                except:
-                    self.last_rpc_error = str(e.stderr)
+        except RPCError as e:
+            RPC_ERRORS.inc(method=method)
+            self.last_rpc_error = str(e)
             
             if self.verbose:
-                log_msg = self.last_rpc_error if self.last_rpc_error else str(e)
-                self.logger.error(f"CMD FAIL: {log_msg}")
+                self.logger.error(f"CMD FAIL: {self.last_rpc_error}", extra={"kind": "rpc"})
             return None
             
         except Exception as e:
+            RPC_ERRORS.inc(method=method)
             self.last_rpc_error = str(e)
             self.logger.error(f"RPC Error ({method}): {e}")
             return None
 
+    def rpc_batch(self, calls):
+        """
+        Executes independent calls in one round trip.
+        Returns results in call order, with None for any call that failed.
+        """
+        self.last_rpc_error = None
+        if self.verbose:
+            self.logger.info(f"CMD BATCH: {', '.join(method for method, _ in calls)}", extra={"kind": "rpc"})
+
+        try:
+            with RPC_SECONDS.time(method="batch"):
+                results = self.rpc_client.batch(calls)
+        except RPCTimeout:
+            RPC_TIMEOUTS.inc(method="batch")
+            self.logger.error(f"RPC TIMEOUT: batch took >{self.rpc_timeout}s")
+            return [None] * len(calls)
+        except Exception as e:
+            RPC_ERRORS.inc(method="batch")
+            self.last_rpc_error = str(e)
+            self.logger.error(f"RPC Batch Error: {e}")
+            return [None] * len(calls)
+
+        for i, res in enumerate(results):
+            if isinstance(res, RPCError):
+                RPC_ERRORS.inc(method=calls[i][0])
+                self.last_rpc_error = str(res)
+                if self.verbose:
+                    self.logger.error(f"CMD FAIL: {calls[i][0]}: {res}", extra={"kind": "rpc"})
+                results[i] = None
+        return results
+
     def check_wallet(self):
         """Ensures the target wallet exists."""
         wallets = self.rpc("listwallets")
         if wallets is None or (isinstance(wallets, list) and self.wallet_name not in wallets):
             self.logger.info(f"Creating wallet: {self.wallet_name}")
             try:
-                subprocess.run(["bitcoin-cli", "createwallet", self.wallet_name], 
-                             stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True, timeout=30)
+                self.rpc_client.call_global("createwallet", [self.wallet_name])
             except Exception as e:
                 self.logger.error(f"Failed to create wallet {self.wallet_name}: {e}")
 
-    def refresh_local_addresses(self):
-        """Fetches current addresses from the wallet to populate local list."""
-        try:
-            addr = self.rpc("getnewaddress")
-            if addr and isinstance(addr, str):
-                with self.addr_lock:
-                    if addr not in self.local_addresses:
-                        self.local_addresses.append(addr)
-        except Exception as e:
-            self.logger.error(f"Error refreshing addresses: {e}")
-
     def get_my_shareable_address(self):
-        """Returns a random local address to share with peers."""
+        """Returns a random address from the ring to share with peers (lock-free)."""
+        return self.addresses.pick()
+
+    # --- NOTIFICATIONS (ZMQ) ---
+    def start_notifications(self):
+        """
+        Subscribes to bitcoind's hashblock/rawtx ZMQ feeds ("auto" asks
+        getzmqnotifications where they are). Without them, or without pyzmq,
+        the loops keep polling RPC on their timers.
+        """
+        if self.zmq_endpoint == "off": return None
+        if not zmqnotify.available():
+            if self.zmq_endpoint != "auto":
+                self.logger.warning("pyzmq is not installed. Falling back to RPC polling.")
+            return None
+
+        endpoints = [self.zmq_endpoint]
+        if self.zmq_endpoint == "auto":
+            notifications = self.rpc("getzmqnotifications") or []
+            endpoints = list(dict.fromkeys(n["address"].replace("0.0.0.0", self.rpc_client.host)
+                                           for n in notifications if n.get("type") in ("pubhashblock", "pubrawtx")))
+            if not endpoints:
+                self.logger.info("Node publishes no ZMQ notifications. Using RPC polling.")
+                return None
+
+        def mempool_size():
+            info = self.rpc("getmempoolinfo")
+            return info.get("size") if isinstance(info, dict) else None
+
         try:
-            with self.addr_lock:
-                if not self.local_addresses:
-                    return None
-                return random.choice(self.local_addresses)
+            self.events = zmqnotify.ChainEvents(endpoints, mempool_size).start()
         except Exception as e:
-            self.logger.error(f"Error getting local address: {e}")
+            self.logger.error(f"ZMQ subscription failed ({e}). Using RPC polling.")
             return None
-            
+        self.logger.info(f"Subscribed to ZMQ notifications at {', '.join(endpoints)}")
+        return self.events
+
+    def wait_for_block(self, timeout):
+        """Sleeps up to timeout, returning early on a new block when ZMQ notifications are on."""
+        if self.events is None:
+            time.sleep(timeout)
+            return False
+        return self.events.wait_for_block(timeout)
+
     def wait_for_ibd(self):
         """Blocks execution until Initial Block Download is complete."""
         self.logger.info("Checking Initial Block Download (IBD) status...")
@@ -164,25 +645,31 @@ class BitcoinAgent:
             except Exception as e:
                 self.logger.error(f"Error checking IBD status: {e}")
             
-            time.sleep(5)
+            self.wait_for_block(5)
 
     # --- NETWORKING (P2P Address Exchange) ---
     def start_listener(self):
         """Starts the TCP server to listen for address exchanges."""
         try:
-            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as server:
-                server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-                server.bind(('0.0.0.0', self.port))
-                server.listen(10)
+            # One socket for IPv4 and IPv6 peers where the OS allows it (create_server sets SO_REUSEADDR)
+            if socket.has_dualstack_ipv6():
+                server = socket.create_server(('::', self.port), family=socket.AF_INET6, backlog=10, dualstack_ipv6=True)
+            else:
+                server = socket.create_server(('0.0.0.0', self.port), backlog=10)
+            with server:
                 server.settimeout(1.0) 
                 self.logger.info(f"Listener started on port {self.port}")
 
+                saturated = False
                 while self.running:
                     try:
                         # Acquire semaphore to limit active threads
                         if not self.conn_limit.acquire(blocking=False):
+                            if not saturated: REJECTIONS.inc(listener="threaded")
+                            saturated = True
                             time.sleep(0.1)
                             continue
+                        saturated = False
 
                         try:
                             client, addr = server.accept()
@@ -195,6 +682,7 @@ class BitcoinAgent:
                             time.sleep(1)
                             continue
 
+                        CONNECTIONS.inc(listener="threaded")
                         # Spawn thread
                         t = threading.Thread(target=self.handle_client_connection, args=(client, addr))
                         t.daemon = True
@@ -207,32 +695,58 @@ class BitcoinAgent:
             self.logger.critical(f"Failed to bind port {self.port}: {e}")
             self.running = False
 
+    def learn(self, ip, address, entries=()):
+        """
+        Records `ip`'s own address as seen now, plus the (ip, address, last_seen)
+        entries it gossiped. Returns how many gossiped entries were new or fresher.
+        """
+        own = set(self.addresses.addresses)
+        if address and address not in own:
+            self.peer_map.update(ip, address)
+        learned = 0
+        for peer_ip, peer_addr, last_seen in entries:
+            if peer_ip == ip or peer_ip in LOOPBACK_HOSTS or peer_addr in own: continue
+            if self.peer_map.update(peer_ip, peer_addr, last_seen): learned += 1
+        if learned: GOSSIP_LEARNED.inc(learned)
+        PEER_MAP_SIZE.set(len(self.peer_map))
+        return learned
+
+    def process_exchange(self, ip, data):
+        """
+        Handles one request (a v1 gossip frame, or legacy JSON) and returns our
+        reply bytes in the same format.
+        """
+        if self.verbose:
+            self.logger.info("NET RECV [from %s]: %s", ip, lablog.Lazy(lablog.preview, data.decode('utf-8', 'replace')), extra={"kind": "net"})
+
+        my_addr = self.get_my_shareable_address()
+        if data.startswith(GOSSIP_MAGIC):
+            peer_wallet_addr, entries = decode_gossip(data[GOSSIP_HEADER.size:gossip_frame_size(data)])
+            learned = self.learn(ip, peer_wallet_addr, entries)
+            response = encode_gossip(my_addr, self.peer_map.sample(GOSSIP_BATCH, exclude=ip))
+        else:
+            peer_wallet_addr = json.loads(data).get("address")
+            learned = self.learn(ip, peer_wallet_addr)
+            # "gossip" tells a peer falling back to JSON that we are not an old agent (old ones ignore it)
+            response = json.dumps({"address": my_addr, "gossip": GOSSIP_VERSION}).encode('utf-8')
+
+        if peer_wallet_addr:
+            self.logger.info(f"Received address from {ip}: {peer_wallet_addr} (+{learned} via gossip)")
+        if self.verbose:
+            self.logger.info("NET SEND [to %s]: %s", ip, lablog.Lazy(lablog.preview, response.decode('utf-8', 'replace')), extra={"kind": "net"})
+
+        return response
+
     def handle_client_connection(self, client_sock, client_addr):
-        ip = client_addr[0]
+        ip = normalize_ip(client_addr[0])
         try:
-            client_sock.settimeout(5)
+            client_sock.settimeout(CLIENT_TIMEOUT)
             
             # RECV
-            data = client_sock.recv(1024).decode('utf-8')
-            if self.verbose:
-                self.logger.info(f"NET RECV [from {ip}]: {data}")
-
-            msg = json.loads(data)
-            peer_wallet_addr = msg.get("address")
-            
-            if peer_wallet_addr:
-                with self.peer_lock:
-                    self.peer_map[ip] = peer_wallet_addr
-                self.logger.info(f"Received address from {ip}: {peer_wallet_addr}")
+            data = recv_message(client_sock)
 
             # SEND
-            my_addr = self.get_my_shareable_address()
-            response = json.dumps({"address": my_addr})
-            
-            if self.verbose:
-                self.logger.info(f"NET SEND [to {ip}]: {response}")
-
-            client_sock.sendall(response.encode('utf-8'))
+            client_sock.sendall(self.process_exchange(ip, data))
 
         except Exception as e:
             if self.verbose:
@@ -244,74 +758,192 @@ class BitcoinAgent:
                 pass
             self.conn_limit.release()
 
-    def exchange_with_peer(self, target_ip):
-        if target_ip == "127.0.0.1": return 
+    # --- NETWORKING (asyncio listener) ---
+    def start_async_listener(self):
+        """Runs the address-exchange server on an asyncio event loop in this thread."""
+        try:
+            asyncio.run(self._serve_async())
+        except Exception as e:
+            self.logger.critical(f"Failed to bind port {self.port}: {e}")
+            self.running = False
+
+    async def _serve_async(self):
+        # Connections beyond the limit wait here for a slot instead of spinning
+        self.async_slots = asyncio.Semaphore(self.max_connections)
+        server = await asyncio.start_server(
+            self._handle_async_client, None, self.port,  # None: every IPv4 and IPv6 interface
+            reuse_address=True, backlog=self.max_connections)
+        self.logger.info(f"Async listener started on port {self.port} (max {self.max_connections} connections)")
+        async with server:
+            while self.running:
+                await asyncio.sleep(0.5)
 
+    async def _handle_async_client(self, reader, writer):
+        peer = writer.get_extra_info('peername')
+        ip = normalize_ip(peer[0]) if peer else "?"
         try:
-            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                s.settimeout(3)
-                s.connect((target_ip, self.port))
+            # One deadline covers queueing for a slot plus the exchange itself
+            await asyncio.wait_for(self._exchange_async(ip, reader, writer), CLIENT_TIMEOUT)
+        except Exception as e:
+            if self.verbose:
+                self.logger.warning(f"Connection error with {ip}: {e!r}")
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except Exception:
+                pass
+
+    async def _exchange_async(self, ip, reader, writer):
+        CONNECTIONS.inc(listener="asyncio")
+        if self.async_slots.locked(): REJECTIONS.inc(listener="asyncio")
+        async with self.async_slots:
+            data = await reader.read(4096)
+            if GOSSIP_MAGIC.startswith(data[:len(GOSSIP_MAGIC)]):
+                if len(data) < GOSSIP_HEADER.size:
+                    data += await reader.readexactly(GOSSIP_HEADER.size - len(data))
+                total = gossip_frame_size(data)
+                if len(data) < total:
+                    data += await reader.readexactly(total - len(data))
+            writer.write(self.process_exchange(ip, data))
+            await writer.drain()
+
+    def exchange_with_peer(self, target_ip, fallback=False):
+        """
+        Swaps addresses and a gossip batch with one peer. Returns True on success.
+        A peer that hangs up on a v1 frame is retried with the legacy
+        single-address JSON. Only a reply without our "gossip" marker proves an
+        old agent; those get JSON for PEER_TTL, then v1 is tried again.
+        """
+        if target_ip in LOOPBACK_HOSTS: return False
+        with self.peer_lock:
+            marked = self.legacy_peers.get(target_ip)
+        legacy = fallback or (marked is not None and time.time() - marked < PEER_TTL)
 
+        try:
+            # create_connection picks AF_INET or AF_INET6 for the address
+            with socket.create_connection((target_ip, self.port), timeout=3) as s:
                 # SEND
                 my_addr = self.get_my_shareable_address()
-                msg = json.dumps({"address": my_addr})
+                if legacy:
+                    msg = json.dumps({"address": my_addr}).encode('utf-8')
+                else:
+                    msg = encode_gossip(my_addr, self.peer_map.sample(GOSSIP_BATCH, exclude=target_ip))
                 
                 if self.verbose:
-                    self.logger.info(f"NET SEND [to {target_ip}]: {msg}")
+                    self.logger.info("NET SEND [to %s]: %s", target_ip, lablog.Lazy(lablog.preview, msg.decode('utf-8', 'replace')), extra={"kind": "net"})
 
-                s.sendall(msg.encode('utf-8'))
+                s.sendall(msg)
 
-                # RECV
-                data = s.recv(1024).decode('utf-8')
+                # RECV (an old agent resets the connection if it left part of our frame unread)
+                try:
+                    data = recv_message(s)
+                except ConnectionResetError:
+                    if legacy: raise
+                    data = b""
                 
                 if self.verbose:
-                    self.logger.info(f"NET RECV [from {target_ip}]: {data}")
+                    self.logger.info("NET RECV [from %s]: %s", target_ip, lablog.Lazy(lablog.preview, data.decode('utf-8', 'replace')), extra={"kind": "net"})
 
-                response = json.loads(data)
-                peer_wallet_addr = response.get("address")
-                
-                if peer_wallet_addr:
+            if not data and not legacy:
+                return self.exchange_with_peer(target_ip, fallback=True)
+
+            if data.startswith(GOSSIP_MAGIC):
+                peer_wallet_addr, entries = decode_gossip(data[GOSSIP_HEADER.size:])
+            else:
+                reply = json.loads(data)
+                peer_wallet_addr, entries = reply.get("address"), []
+                if fallback and peer_wallet_addr and "gossip" not in reply:
                     with self.peer_lock:
-                        self.peer_map[target_ip] = peer_wallet_addr
-                    self.logger.info(f"Exchanged with {target_ip}: Got {peer_wallet_addr}")
+                        self.legacy_peers[target_ip] = time.time()
+            learned = self.learn(target_ip, peer_wallet_addr, entries)
+
+            if peer_wallet_addr:
+                self.logger.info(f"Exchanged with {target_ip}: Got {peer_wallet_addr} (+{learned} via gossip)")
+            return True
 
         except Exception as e:
             if self.verbose:
                 self.logger.debug(f"Exchange failed with {target_ip}: {e}")
+            return False
+
+    def peer_due(self, ip, now):
+        with self.peer_lock:
+            entry = self.peer_backoff.get(ip)
+        return entry is None or entry[1] <= now
+
+    def record_exchange_result(self, ip, ok):
+        """Exponential backoff for peers that keep failing; success resets it."""
+        EXCHANGES.inc(peer=ip, result="ok" if ok else "failed")
+        with self.peer_lock:
+            if ok:
+                self.peer_backoff.pop(ip, None)
+                return
+            failures = self.peer_backoff.get(ip, (0, 0))[0] + 1
+            delay = min(PEER_BACKOFF_MAX, PEER_BACKOFF_BASE * 2 ** (failures - 1))
+            self.peer_backoff[ip] = (failures, time.time() + delay)
+
+    def exchange_with_peers(self, ips, executor):
+        """Fans exchanges out over the executor and waits for the sweep to finish."""
+        def run(ip):
+            if not self.running: return
+            self.record_exchange_result(ip, self.exchange_with_peer(ip))
+        for _ in executor.map(run, ips):
+            pass
+
+    def pick_gossip_targets(self, ips):
+        """
+        Up to gossip_fanout of `ips` for this sweep (all of them if the fanout
+        is 0): peers we hold no address for first, then random others. Gossip
+        carries the rest of the lab's addresses in.
+        """
+        if self.gossip_fanout <= 0: return list(ips)
+        unknown = [ip for ip in ips if ip not in self.peer_map]
+        known = [ip for ip in ips if ip in self.peer_map]
+        random.shuffle(unknown)
+        random.shuffle(known)
+        return (unknown + known)[:self.gossip_fanout]
 
     # --- BACKGROUND LOOPS ---
     def loop_peer_discovery(self):
-        while self.running:
-            try:
-                peers = self.rpc("getpeerinfo")
-                if peers and isinstance(peers, list):
-                    active_ips = []
-                    for p in peers:
-                        if isinstance(p, dict) and 'addr' in p:
-                            ip = p['addr'].split(':')[0]
-                            active_ips.append(ip)
-
-                    if active_ips:
-                        self.logger.info(f"Discovery: Found {len(active_ips)} peers.")
-                        for ip in active_ips:
-                            if not self.running: break
-                            self.exchange_with_peer(ip)
-            except Exception as e:
-                self.logger.error(f"Discovery Loop Error: {e}")
-            
-            for _ in range(300):
-                if not self.running: return
-                time.sleep(1)
+        with ThreadPoolExecutor(max_workers=self.discovery_workers, thread_name_prefix="exchange") as executor:
+            while self.running:
+                try:
+                    peers = self.rpc("getpeerinfo")
+                    if peers and isinstance(peers, list):
+                        active_ips = []
+                        for p in peers:
+                            if isinstance(p, dict) and 'addr' in p:
+                                active_ips.append(parse_peer_host(p['addr']))
+
+                        # Several connections (in/out) to one host show up once
+                        active_ips = [ip for ip in dict.fromkeys(active_ips) if ip not in LOOPBACK_HOSTS]
+                        now = time.time()
+                        due_ips = [ip for ip in active_ips if self.peer_due(ip, now)]
+                        expired = self.peer_map.expire(now)
+                        PEER_MAP_SIZE.set(len(self.peer_map))
+
+                        if active_ips:
+                            targets = self.pick_gossip_targets(due_ips)
+                            self.logger.info(f"Discovery: Found {len(active_ips)} peers ({len(active_ips) - len(due_ips)} backing off), "
+                                             f"exchanging with {len(targets)}; {len(self.peer_map)} addresses known ({expired} expired).")
+                            self.exchange_with_peers(targets, executor)
+                except Exception as e:
+                    self.logger.error(f"Discovery Loop Error: {e}")
+                
+                for _ in range(300):
+                    if not self.running: return
+                    time.sleep(1)
 
     def loop_address_gen(self):
+        """Rotates ADDRESS_ROTATE_COUNT fresh addresses into the ring every ADDRESS_ROTATE_INTERVAL."""
         while self.running:
             try:
-                wait_time = random.randint(10, 15)
-                for _ in range(wait_time):
+                for _ in range(ADDRESS_ROTATE_INTERVAL):
                     if not self.running: return
                     time.sleep(1)
                 
-                self.refresh_local_addresses()
+                self.addresses.rotate()
                 
             except Exception as e:
                 self.logger.error(f"Address Gen Loop Error: {e}")
@@ -319,30 +951,34 @@ class BitcoinAgent:
     def loop_transactions(self):
         while self.running:
             try:
-                # Sleep first
+                # Sleep first (with ZMQ notifications, wake as soon as the mempool crosses the trigger)
                 wait_time = random.randint(30, 90)
+                congested = lambda: self.events.mempool_count > self.mempool_trigger
                 for _ in range(wait_time):
                     if not self.running: return
-                    time.sleep(1)
+                    if self.events is None: time.sleep(1)
+                    elif self.events.wait_for(congested, 1): break
+
+                if self.events:
+                    mempool_info, bal = {"size": self.events.mempool_count}, self.rpc("getbalance")
+                else:
+                    # Independent status queries share one round trip
+                    mempool_info, bal = self.rpc_batch([("getmempoolinfo", []), ("getbalance", [])])
 
                 # --- 1. MEMPOOL CHECK [RESTORED] ---
                 try:
-                    mempool_info = self.rpc("getmempoolinfo")
                     if mempool_info and isinstance(mempool_info, dict):
                         count = int(mempool_info.get("size", 0))
                         
                         if count > self.mempool_trigger:
                             self.logger.info(f"Mempool Congestion ({count} > {self.mempool_trigger}). Mining 1 block to clear...")
-                            mine_addr = self.get_my_shareable_address()
-                            if mine_addr:
-                                self.rpc("generatetoaddress", [1, mine_addr])
+                            if self.mine_recovery_block("congestion"):
                                 time.sleep(2)
                 except Exception as e:
                     self.logger.error(f"Mempool check failed: {e}")
 
 
                 # --- 2. BALANCE CHECK ---
-                bal = self.rpc("getbalance")
                 current_bal = 0.0
                 try:
                     if bal is not None:
@@ -353,14 +989,15 @@ class BitcoinAgent:
                 # Mine if explicitly broke (Survival Mode)
                 if current_bal == 0.0:
                     self.logger.warning("Balance is 0.0. Mining 1 block to refill...")
-                    mine_addr = self.get_my_shareable_address()
-                    if mine_addr:
-                        self.rpc("generatetoaddress", [1, mine_addr])
+                    self.mine_recovery_block("empty_wallet")
                     continue
 
                 if current_bal < 0.001:
                     continue
 
+                self.utxos.refresh(force=True)
+                self.maintain_coin_pool()
+
                 # --- 3. SEND TRANSACTIONS ---
                 tx_targets = {}
 
@@ -368,11 +1005,8 @@ class BitcoinAgent:
                 target_addr = None
                 target_ip = None
                 
-                with self.peer_lock:
-                    peer_ips = list(self.peer_map.keys())
-                    if peer_ips:
-                        target_ip = random.choice(peer_ips)
-                        target_addr = self.peer_map[target_ip]
+                target = self.peer_map.choice()
+                if target: target_ip, target_addr = target
                 
                 if target_addr:
                     amount = round(random.uniform(0.01, 0.5), 5)
@@ -387,42 +1021,188 @@ class BitcoinAgent:
                     self.logger.info(f"Queueing Churn TX to self ({amount} BTC)")
 
                 if tx_targets:
-                    txid = self.rpc("sendmany", ["", json.dumps(tx_targets)])
+                    txid = self.pay(tx_targets)
                     
-                    if txid and isinstance(txid, str):
+                    if txid:
                         self.logger.info(f"Broadcasted TXID: {txid}")
                     else:
-                        if self.last_rpc_error and "Unconfirmed UTXOs are available" in self.last_rpc_error:
-                             self.logger.info("Mempool chain limit detected (Unconfirmed UTXOs). Mining 1 block to clear...")
-                             # If we are stuck with unconfirmed UTXOs, we MUST mine to unstick ourselves.
-                             mine_addr = self.get_my_shareable_address()
-                             if mine_addr:
-                                 self.rpc("generatetoaddress", [1, mine_addr])
-                        else:
-                             self.logger.warning("Transaction failed (Insufficient Funds?). Mining 1 block to recover...")
-                             mine_addr = self.get_my_shareable_address()
-                             if mine_addr:
-                                 self.rpc("generatetoaddress", [1, mine_addr])
+                        self.recover_from_failed_send(sum(tx_targets.values()))
 
             except Exception as e:
                 self.logger.error(f"Transaction Loop Error: {e}")
 
+    def mine_recovery_block(self, reason):
+        """Mines 1 block to one of our addresses (congestion, empty wallet, ...). Returns the block hashes or None."""
+        mine_addr = self.get_my_shareable_address()
+        if not mine_addr: return None
+        hashes = self.rpc("generatetoaddress", [1, mine_addr])
+        if hashes: RECOVERY_BLOCKS.inc(reason=reason)
+        return hashes
+
+    def pay(self, tx_targets, kind="payment"):
+        """
+        Sends tx_targets with `send`, spending only confirmed coins picked from
+        the UTXO view (no unconfirmed chains). Returns the txid or None.
+        """
+        outpoints = self.utxos.select(sum(tx_targets.values()) + SEND_FEE_MARGIN)
+        if not outpoints:
+            self.last_rpc_error = "No confirmed coins available"
+            return None
+        options = {"inputs": [{"txid": txid, "vout": vout} for txid, vout in outpoints], "add_inputs": False}
+        result = self.rpc("send", [tx_targets, None, "unset", None, options])
+        if isinstance(result, dict) and result.get("txid"):
+            self.utxos.spent(outpoints)
+            TXS_BROADCAST.inc(kind=kind)
+            return result["txid"]
+        self.utxos.release(outpoints)
+        if self.last_rpc_error and "already spent" in self.last_rpc_error:
+            self.utxos.invalidate()
+        return None
+
+    def recover_from_failed_send(self, amount):
+        """
+        After a failed send: coins that are only waiting for a confirmation are
+        picked up by the UTXO view on the next block, so just wait; mine 1 block
+        only when the wallet really cannot cover `amount`. Returns True if it mined.
+        """
+        # Only a view that looks short is worth a forced refresh (our own sends land in the mempool)
+        self.utxos.refresh(force=self.utxos.total() < amount + SEND_FEE_MARGIN)
+        available = self.utxos.total()
+        if available >= amount + SEND_FEE_MARGIN:
+            if self.verbose:
+                self.logger.info(f"Send deferred ({self.last_rpc_error}); {available:.8f} BTC awaiting confirmation")
+            return False
+        self.logger.warning(f"Transaction failed, only {available:.8f} BTC available. Mining 1 block to recover...")
+        return bool(self.mine_recovery_block("failed_send"))
+
+    def pool_target(self):
+        """Small confirmed coins to keep: enough for every send until the next block, at least SPLIT_TARGET."""
+        if not self.target_tps: return SPLIT_TARGET
+        return max(SPLIT_TARGET, math.ceil(self.target_tps * self.utxos.block_interval() * POOL_HEADROOM))
+
+    def maintain_coin_pool(self):
+        """
+        Splits big confirmed coins into SPLIT_VALUE coins (to fresh addresses of
+        ours), up to SPLIT_MAX_OUTPUTS per call, when fewer than half of
+        pool_target() confirmed small coins are left, so sends always find
+        confirmed inputs.
+        """
+        target = self.pool_target()
+        small, big = self.utxos.pool_status()
+        if small >= target // 2: return
+        outputs = min(target - small, SPLIT_MAX_OUTPUTS, int((big - SEND_FEE_MARGIN) / SPLIT_VALUE))
+        if outputs < 2: return
+        addresses = self.addresses.derive(outputs)
+        if len(addresses) < 2: return
+        txid = self.pay({address: SPLIT_VALUE for address in addresses}, kind="split")
+        if txid:
+            self.logger.info(f"Split {len(addresses)} x {SPLIT_VALUE} BTC off {big:.8f} BTC of big coins "
+                             f"(pool {small}/{target}, TXID: {txid})")
+
+    def pick_output_addresses(self, count):
+        """Up to `count` distinct addresses: peers first, then our own (derived in one call if the ring is short)."""
+        targets = list(dict.fromkeys(self.peer_map.addresses()))
+        random.shuffle(targets)
+        targets = targets[:count]
+
+        own = [a for a in self.addresses.addresses if a not in targets]
+        missing = count - len(targets) - len(own)
+        if missing > 0:
+            own += self.addresses.derive(missing)
+        random.shuffle(own)
+        return targets + own[:count - len(targets)]
+
+    def send_batch(self):
+        """One transaction paying outputs_per_tx addresses. Returns the txid or None."""
+        tx_targets = {addr: round(random.uniform(*GENERATOR_AMOUNT), 8)
+                      for addr in self.pick_output_addresses(self.outputs_per_tx)}
+        if not tx_targets: return None
+        return self.pay(tx_targets)
+
+    def loop_generator(self):
+        """
+        --target-tps mode: paces sends with a token bucket, each paying
+        outputs_per_tx addresses, and scales the rate down as the mempool fills.
+        """
+        bucket = TokenBucket(self.target_tps, max(1.0, self.target_tps * TPS_BURST_SECONDS))
+        rate = self.target_tps
+        sent = failed = 0
+        window_start = time.time()
+        next_status = 0
+        next_recovery = 0  # refills (low balance or failed sends) mine at most one block per status window
+        blocks_seen = 0
+        self.logger.info(f"Generator mode: {self.target_tps} tx/s, {self.outputs_per_tx} outputs/tx")
+
+        while self.running:
+            try:
+                if self.events:
+                    # Live mempool size between status polls; fresh coins as soon as a block lands
+                    rate = adaptive_tps(self.target_tps, self.events.mempool_count, self.mempool_trigger)
+                    bucket.set_rate(rate)
+                    if self.events.blocks_seen != blocks_seen:
+                        blocks_seen = self.events.blocks_seen
+                        self.utxos.refresh(force=True)
+
+                now = time.time()
+                if now >= next_status:
+                    next_status = now + TPS_STATUS_INTERVAL
+                    mempool_info, bal = self.rpc_batch([("getmempoolinfo", []), ("getbalance", [])])
+                    size = int(mempool_info.get("size", 0)) if isinstance(mempool_info, dict) else 0
+                    rate = adaptive_tps(self.target_tps, size, self.mempool_trigger)
+                    bucket.set_rate(rate)
+
+                    elapsed = max(now - window_start, 1e-6)
+                    self.logger.info(f"Generator: {sent / elapsed:.1f} tx/s sent (target {rate:.1f}, "
+                                     f"mempool {size}, failed {failed})")
+                    sent = failed = 0
+                    window_start = now
+                    self.utxos.refresh(force=True)
+                    self.maintain_coin_pool()
+
+                    if size > self.mempool_trigger:
+                        self.logger.info(f"Mempool Congestion ({size} > {self.mempool_trigger}). Mining 1 block to clear...")
+                        self.mine_recovery_block("congestion")
+                    low = bal is not None and float(bal) < self.outputs_per_tx * GENERATOR_AMOUNT[1] * 2
+                    if low and now >= next_recovery:
+                        self.logger.warning(f"Balance low ({bal}). Mining 1 block to refill...")
+                        if self.mine_recovery_block("low_balance"): next_recovery = now + TPS_STATUS_INTERVAL
+
+                if not bucket.take():
+                    time.sleep(max(0, min(bucket.wait_time(), next_status - time.time(), 0.5)))
+                    continue
+
+                if self.send_batch():
+                    sent += 1
+                else:
+                    failed += 1
+                    if time.time() >= next_recovery and self.recover_from_failed_send(self.outputs_per_tx * GENERATOR_AMOUNT[1]):
+                        next_recovery = time.time() + TPS_STATUS_INTERVAL
+            except Exception as e:
+                self.logger.error(f"Generator Loop Error: {e}")
+                time.sleep(1)
+
     # --- MAIN ENTRY POINT ---
     def start(self):
         self.logger.info(f"Starting Bitcoin Agent on port {self.port} (Wallet: {self.wallet_name})...")
         if self.verbose:
             self.logger.info("Verbose Logging: ENABLED")
         
+        if self.metrics_port:
+            labmetrics.serve_metrics(METRICS, self.metrics_port)
+            self.logger.info(f"Metrics on http://0.0.0.0:{self.metrics_port}/metrics")
+        self.start_notifications()
+
         # [FIX] Wait for Initial Block Download to prevent race conditions
         self.wait_for_ibd()
         
         self.logger.info("Press Ctrl+C to stop.")
 
+        listener = self.start_async_listener if self.listener == "asyncio" else self.start_listener
         threads = [
-            threading.Thread(target=self.start_listener),
+            threading.Thread(target=listener),
             threading.Thread(target=self.loop_peer_discovery),
             threading.Thread(target=self.loop_address_gen),
-            threading.Thread(target=self.loop_transactions)
+            threading.Thread(target=self.loop_generator if self.target_tps else self.loop_transactions)
         ]
 
         for t in threads:
@@ -439,7 +1219,9 @@ class BitcoinAgent:
         while self.running:
             time.sleep(0.5)
         
+        if self.events: self.events.stop()
         self.logger.info("Agent stopped cleanly.")
+        lablog.shutdown()
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Bitcoin Lab Agent")
@@ -448,6 +1230,15 @@ if __name__ == "__main__":
     parser.add_argument("--wallet", type=str, default=DEFAULT_WALLET_NAME, help="Name of the wallet to control")
     parser.add_argument("--mempool-trigger", type=int, default=DEFAULT_MEMPOOL_TRIGGER, help="Mine a block if pending txs exceed this amount")
     parser.add_argument("--verbose", "-v", action="store_true", help="Enable verbose logging of commands and traffic")
+    parser.add_argument("--listener", choices=["threaded", "asyncio"], default="threaded", help="Address-exchange server implementation")
+    parser.add_argument("--max-connections", type=int, default=MAX_ASYNC_CONNECTIONS, help="Concurrent exchanges handled by the asyncio listener")
+    parser.add_argument("--discovery-workers", type=int, default=DEFAULT_DISCOVERY_WORKERS, help="Peers contacted in parallel during discovery")
+    parser.add_argument("--gossip-fanout", type=int, default=DEFAULT_GOSSIP_FANOUT, help="Peers exchanged with per discovery sweep (0 = all); gossip spreads the rest")
+    parser.add_argument("--target-tps", type=float, help="Send transactions at this rate (token bucket) instead of every 30-90s")
+    parser.add_argument("--outputs-per-tx", type=int, default=DEFAULT_OUTPUTS_PER_TX, help="Outputs per transaction in --target-tps mode")
+    parser.add_argument("--log-sample", action="append", metavar="KIND=N", help="Keep 1 in N verbose 'rpc'/'net' trace lines (repeatable, default rpc=10)")
+    parser.add_argument("--metrics-port", type=int, help="Serve Prometheus metrics on this port (/metrics)")
+    parser.add_argument("--zmq", default="auto", metavar="ENDPOINT", help="bitcoind ZMQ endpoint for block/tx notifications ('auto' asks the node, 'off' polls RPC)")
     
     args = parser.parse_args()
     
@@ -458,6 +1249,15 @@ if __name__ == "__main__":
         log_path=args.log_path, 
         wallet_name=args.wallet, 
         mempool_trigger=args.mempool_trigger,
-        verbose=args.verbose
+        verbose=args.verbose,
+        listener=args.listener,
+        max_connections=args.max_connections,
+        discovery_workers=args.discovery_workers,
+        target_tps=args.target_tps,
+        outputs_per_tx=args.outputs_per_tx,
+        zmq_endpoint=args.zmq,
+        log_sample=lablog.parse_sample(args.log_sample),
+        metrics_port=args.metrics_port,
+        gossip_fanout=args.gossip_fanout
     )
     agent.start()
\ No newline at end of file
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for the header hashing loop.
+
+Compares the original "rebuild the 80-byte header and sha256d it" loop
+against the midstate loops in miner.py and patches/mine-genesis-params.py.
+The target is 0, so every loop hashes the full range without finding a block.
+
+    python3 benchmarks/bench_hashing.py --nonces 500000
+"""
+import argparse
+import importlib.util
+import struct
+import sys
+import time
+from pathlib import Path
+
+LAB_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(LAB_DIR))
+
+import miner  # noqa: E402
+
+
+def load_genesis_module():
+    spec = importlib.util.spec_from_file_location(
+        "mine_genesis_params", LAB_DIR / "patches" / "mine-genesis-params.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def naive_scan(header_prefix, target, start, end):
+    """The pre-midstate loop: a fresh 80-byte header and full sha256d per nonce."""
+    version_bytes = header_prefix[:4]
+    prev_hash = header_prefix[4:36]
+    merkle_root = header_prefix[36:68]
+    time_bytes = header_prefix[68:72]
+    bits_bytes = header_prefix[72:76]
+    for nonce in range(start, end):
+        nonce_bytes = struct.pack("<I", nonce)
+        header = version_bytes + prev_hash + merkle_root + time_bytes + bits_bytes + nonce_bytes
+        block_hash = miner.sha256d(header)
+        if int.from_bytes(block_hash, 'little') <= target:
+            return nonce
+    return None
+
+
+def timed(fn, header_prefix, nonces, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(header_prefix, 0, 0, nonces)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return nonces / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Header hashing micro-benchmark")
+    parser.add_argument("--nonces", type=int, default=200000, help="Nonces hashed per run")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per loop (best is kept)")
+    args = parser.parse_args()
+
+    genesis = load_genesis_module()
+    header_prefix = bytes(range(76))
+
+    loops = [
+        ("naive sha256d", naive_scan),
+        ("miner.py midstate", miner.scan_nonces),
+        ("mine-genesis-params.py midstate", genesis.scan_nonces),
+    ]
+
+    baseline = None
+    print(f"{'loop':<34}{'hashes/s':>14}{'speedup':>10}")
+    for name, fn in loops:
+        rate = timed(fn, header_prefix, args.nonces, args.repeat)
+        baseline = baseline or rate
+        print(f"{name:<34}{rate:>14,.0f}{rate / baseline:>9.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Load generator for the agent's address-exchange listener.
+
+Starts the threaded and the asyncio listener in-process (no bitcoind
+needed) and fires one-shot {"address": ...} exchanges at each from many
+concurrent clients, then reports throughput, failures and latency.
+
+    python3 benchmarks/bench_listener.py --clients 500 --exchanges 5000
+"""
+import argparse
+import asyncio
+import json
+import logging
+import socket
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+LAB_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(LAB_DIR))
+
+import agent  # noqa: E402
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_agent(listener, log_dir):
+    bench_agent = agent.BitcoinAgent(
+        port=free_port(), log_path=str(Path(log_dir) / f"{listener}.log"),
+        wallet_name="bench", mempool_trigger=agent.DEFAULT_MEMPOOL_TRIGGER,
+        listener=listener)
+    bench_agent.addresses.addresses = ("bcrt1qbenchaddress0000000000000000000000000",)
+    target = bench_agent.start_async_listener if listener == "asyncio" else bench_agent.start_listener
+    threading.Thread(target=target, daemon=True).start()
+
+    deadline = time.time() + 5
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", bench_agent.port), timeout=0.2).close()
+            break
+        except OSError:
+            time.sleep(0.05)
+    return bench_agent
+
+
+async def one_exchange(port, timeout):
+    start = time.perf_counter()
+    reader, writer = await asyncio.wait_for(asyncio.open_connection("127.0.0.1", port), timeout)
+    try:
+        writer.write(json.dumps({"address": "bcrt1qloadgen"}).encode())
+        await writer.drain()
+        data = await asyncio.wait_for(reader.read(1024), timeout)
+        if not json.loads(data).get("address"): raise ValueError("Reply carries no address")
+    finally:
+        writer.close()
+    return time.perf_counter() - start
+
+
+async def load(port, clients, exchanges, timeout):
+    latencies = []
+    failures = 0
+    remaining = iter(range(exchanges))
+
+    async def client():
+        nonlocal failures
+        for _ in remaining:
+            try:
+                latencies.append(await one_exchange(port, timeout))
+            except Exception:
+                failures += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(clients)))
+    return time.perf_counter() - start, latencies, failures
+
+
+def percentile(values, pct):
+    if not values: return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Address-exchange listener load test")
+    parser.add_argument("--clients", type=int, default=200, help="Concurrent client connections")
+    parser.add_argument("--exchanges", type=int, default=2000, help="Total exchanges per listener")
+    parser.add_argument("--timeout", type=float, default=5.0, help="Per-exchange client timeout (s)")
+    parser.add_argument("--listeners", default="threaded,asyncio", help="Comma-separated listeners to test")
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    with tempfile.TemporaryDirectory() as log_dir:
+        print(f"{'listener':<10}{'exch/s':>10}{'ok':>8}{'failed':>8}{'p50 ms':>10}{'p99 ms':>10}")
+        for listener in args.listeners.split(","):
+            bench_agent = start_agent(listener, log_dir)
+            elapsed, latencies, failures = asyncio.run(
+                load(bench_agent.port, args.clients, args.exchanges, args.timeout))
+            bench_agent.running = False
+            print(f"{listener:<10}{len(latencies) / elapsed:>10,.0f}{len(latencies):>8}{failures:>8}"
+                  f"{percentile(latencies, 0.5) * 1000:>10.1f}{percentile(latencies, 0.99) * 1000:>10.1f}")
+            time.sleep(1.2)
+
+
+if __name__ == "__main__":
+    main()
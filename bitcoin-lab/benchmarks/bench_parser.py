@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Benchmark: legacy parse_tx() vs the memoryview TxLayout parser.
+
+parse_tx() is fed each transaction's hex, as the verbose deep dive used to
+do; parse_txs_layout() walks the serialized block in place. Reports
+transactions per second and the peak memory each parser holds.
+
+    python3 benchmarks/bench_parser.py --txs 3000
+"""
+import argparse
+import binascii
+import time
+import tracemalloc
+
+import synthetic
+from synthetic import miner
+
+
+def legacy(block_hex_txs):
+    parts = []
+    for i, tx_hex in enumerate(block_hex_txs):
+        parts.extend(miner.parse_tx(tx_hex, i + 1))
+    return parts
+
+
+def layout(block, count):
+    parsed, _ = miner.parse_txs_layout(block, 80 + len(miner.ser_compact_size(count)), count, first_index=1)
+    return parsed
+
+
+def measure(fn, *args, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    tracemalloc.start()
+    result = fn(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak, len(result)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Transaction parser benchmark")
+    parser.add_argument("--txs", type=int, default=2000, help="Transactions in the synthetic block")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per parser (best is kept)")
+    args = parser.parse_args()
+
+    txs = synthetic.make_txs(args.txs)
+    block = synthetic.make_block(args.txs)
+    tx_hex = [binascii.hexlify(tx).decode() for tx in txs]
+
+    print(f"block: {len(block):,} bytes, {args.txs} txs")
+    print(f"{'parser':<26}{'txs/s':>12}{'fields':>10}{'peak KiB':>12}{'speedup':>10}")
+    baseline = None
+    for name, fn, fn_args in (
+        ("parse_tx (hex, tuples)", legacy, (tx_hex,)),
+        ("parse_txs_layout (view)", layout, (block, args.txs)),
+    ):
+        elapsed, peak, fields = measure(fn, *fn_args, repeat=args.repeat)
+        rate = args.txs / elapsed
+        baseline = baseline or rate
+        print(f"{name:<26}{rate:>12,.0f}{fields:>10,}{peak / 1024:>12,.0f}{rate / baseline:>9.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Regression benchmarks for the mining and parsing hot paths.
+
+Runs offline on seeded synthetic data (see synthetic.py), reporting ops/sec
+and the peak memory allocated per call (tracemalloc) for each case. Save a
+baseline once, then compare later runs against it; the run exits non-zero
+when a case gets slower (or allocates more) than the threshold allows.
+
+    python3 benchmarks/bench_suite.py --save benchmarks/baseline.json
+    python3 benchmarks/bench_suite.py --compare benchmarks/baseline.json --threshold 0.2
+    python3 benchmarks/bench_suite.py --only merkle,scan
+"""
+import argparse
+import binascii
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+import synthetic
+from synthetic import miner
+from bench_hashing import load_genesis_module
+
+MIN_TIME = 0.2          # seconds per timed run (calls are batched up to this)
+ALLOC_SLACK = 4096      # bytes of extra peak allocation ignored when comparing
+
+
+def build_cases(scale=1):
+    """(name, fn, ops per call) for every hot path, on fixed-seed inputs."""
+    rng = random.Random(16)
+    template = synthetic.make_template(tx_count=2000 * scale, seed=16)
+    txids = [binascii.unhexlify(tx['txid'])[::-1] for tx in template['transactions']]
+    header = rng.randbytes(80)
+    header_prefix = header[:76]
+    tx = synthetic.make_tx(rng, inputs=2, outputs=2, segwit=True)
+    tx_hex = binascii.hexlify(tx)
+    block = synthetic.make_block(tx_count=500 * scale, seed=16)
+    heights = list(range(0, 1_000_000, 997))
+    pushes = [b'\x00' * n for n in (1, 20, 32, 75, 80, 255, 300)]
+    work = miner.WorkGenerator(template, bytes.fromhex("0014" + "22" * 20))
+    branch = work.branch
+    coinbase_hash = miner.sha256d(work.coinbase(0, witness=False))
+    genesis = load_genesis_module()
+    nonces = 20_000 * scale
+
+    def encode_heights():
+        for h in heights: miner.encode_script_num(h)
+
+    def push_all():
+        for data in pushes: miner.push_data(data)
+
+    return [
+        ("sha256d", lambda: miner.sha256d(header), 1),
+        ("merkle_root", lambda: miner.calculate_merkle_root([coinbase_hash] + txids), 1),
+        ("merkle_branch_root", lambda: branch.root(coinbase_hash), 1),
+        ("work_generator", lambda: miner.WorkGenerator(template, bytes.fromhex("0014" + "22" * 20)), 1),
+        ("parse_tx", lambda: miner.parse_tx(tx_hex, 1), 1),
+        ("parse_tx_layout", lambda: miner.parse_tx_layout(tx, 0, 1), 1),
+        ("parse_block_layout", lambda: miner.parse_txs_layout(block, 80 + len(miner.ser_compact_size(500 * scale)), 500 * scale), 500 * scale),
+        ("encode_script_num", encode_heights, len(heights)),
+        ("push_data", push_all, len(pushes)),
+        ("serialize_block", lambda: miner.serialize_block(header, b'\x00' * 200, template['transactions']), 1),
+        ("scan_nonces_miner", lambda: miner.scan_nonces(header_prefix, 0, 0, nonces), nonces),
+        ("scan_nonces_genesis", lambda: genesis.scan_nonces(header_prefix, 0, 0, nonces), nonces),
+    ]
+
+
+def measure(fn, ops, repeat):
+    fn()  # warm-up
+    calls = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(calls): fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= MIN_TIME or calls >= 1 << 20: break
+        calls *= 4
+
+    best = elapsed
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(calls): fn()
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"ops_per_sec": round(calls * ops / best, 1), "peak_bytes": peak}
+
+
+def compare(results, baseline, threshold):
+    """Returns the names of cases that regressed past the threshold."""
+    regressed = []
+    print(f"\n{'case':<22}{'ops/s':>14}{'baseline':>14}{'change':>9}{'peak B':>10}{'baseline':>10}")
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            print(f"{name:<22}{result['ops_per_sec']:>14,.0f}{'(new)':>14}")
+            continue
+        change = result['ops_per_sec'] / base['ops_per_sec'] - 1
+        slower = change < -threshold
+        bigger = result['peak_bytes'] > base['peak_bytes'] * (1 + threshold) + ALLOC_SLACK
+        flag = "  REGRESSED" if slower or bigger else ""
+        if flag: regressed.append(name)
+        print(f"{name:<22}{result['ops_per_sec']:>14,.0f}{base['ops_per_sec']:>14,.0f}{change:>+8.0%}"
+              f"{result['peak_bytes']:>10,}{base['peak_bytes']:>10,}{flag}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hot path regression benchmarks")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per case (best is kept)")
+    parser.add_argument("--scale", type=int, default=1, help="Multiply synthetic input sizes")
+    parser.add_argument("--only", help="Comma-separated substrings of case names to run")
+    parser.add_argument("--save", metavar="FILE", help="Write the results as a baseline JSON file")
+    parser.add_argument("--compare", metavar="FILE", help="Baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed slowdown before failing (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    cases = build_cases(args.scale)
+    if args.only:
+        wanted = args.only.split(",")
+        cases = [case for case in cases if any(w in case[0] for w in wanted)]
+
+    results = {}
+    print(f"{'case':<22}{'ops/s':>14}{'peak B/call':>14}")
+    for name, fn, ops in cases:
+        results[name] = measure(fn, ops, args.repeat)
+        print(f"{name:<22}{results[name]['ops_per_sec']:>14,.0f}{results[name]['peak_bytes']:>14,}")
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "scale": args.scale,
+                "created": int(time.time()),
+                "results": results,
+            }, f, indent=2)
+        print(f"\nBaseline saved to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline.get("scale", 1) != args.scale:
+            sys.exit(f"Baseline was recorded with --scale {baseline.get('scale', 1)}")
+        regressed = compare(results, baseline["results"], args.threshold)
+        if regressed:
+            print(f"\n❌ {len(regressed)} case(s) regressed more than {args.threshold:.0%}: {', '.join(regressed)}")
+            sys.exit(1)
+        print(f"\n✅ No regressions beyond {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Synthetic transactions, blocks and block templates for offline benchmarks
+and tests. Everything is derived from a seeded random.Random, so runs are
+reproducible and no bitcoind is needed.
+"""
+import random
+import struct
+import sys
+from pathlib import Path
+
+LAB_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(LAB_DIR))
+
+import miner  # noqa: E402
+
+
+def make_tx(rng, inputs=2, outputs=2, segwit=True):
+    """A structurally valid (unsigned, random-content) serialized transaction."""
+    ins = b''
+    for _ in range(inputs):
+        script_sig = b'' if segwit else rng.randbytes(rng.randint(70, 110))
+        ins += rng.randbytes(32) + struct.pack("<I", rng.randrange(4)) + \
+            miner.ser_compact_size(len(script_sig)) + script_sig + b'\xfd\xff\xff\xff'
+
+    outs = b''
+    for _ in range(outputs):
+        script_pubkey = b'\x00\x14' + rng.randbytes(20)
+        outs += struct.pack("<Q", rng.randrange(1, 50 * 10**8)) + \
+            miner.ser_compact_size(len(script_pubkey)) + script_pubkey
+
+    witness = b''
+    if segwit:
+        for _ in range(inputs):
+            sig = rng.randbytes(rng.randint(71, 72))
+            pubkey = rng.randbytes(33)
+            witness += b'\x02' + miner.ser_compact_size(len(sig)) + sig + miner.ser_compact_size(len(pubkey)) + pubkey
+
+    return (
+        struct.pack("<I", 2) + (b'\x00\x01' if segwit else b'') +
+        miner.ser_compact_size(inputs) + ins +
+        miner.ser_compact_size(outputs) + outs +
+        witness + struct.pack("<I", 0)
+    )
+
+
+def strip_witness(tx):
+    """Legacy serialization of a make_tx() transaction (for its txid)."""
+    if tx[4:6] != b'\x00\x01':
+        return tx
+    layout, _ = miner.parse_tx_layout(tx)
+    end_of_outputs = None
+    for i in range(len(layout)):
+        if layout.kinds[i] == miner.F_WITNESS:
+            end_of_outputs = layout.starts[i]
+            break
+    return tx[:4] + tx[6:end_of_outputs] + tx[-4:]
+
+
+def make_txs(count, seed=1, segwit_ratio=0.8):
+    rng = random.Random(seed)
+    return [
+        make_tx(rng, inputs=rng.randint(1, 3), outputs=rng.randint(1, 4), segwit=rng.random() < segwit_ratio)
+        for _ in range(count)
+    ]
+
+
+def make_template(tx_count=100, seed=1, height=1000, bits="207fffff"):
+    """A getblocktemplate-shaped dict whose transactions are make_tx() blobs."""
+    transactions = []
+    for tx in make_txs(tx_count, seed):
+        txid = miner.sha256d(strip_witness(tx))[::-1].hex()
+        wtxid = miner.sha256d(tx)[::-1].hex()
+        transactions.append({"data": tx.hex(), "txid": txid, "hash": wtxid})
+    return {
+        "version": 0x20000000,
+        "height": height,
+        "previousblockhash": random.Random(seed).randbytes(32).hex(),
+        "bits": bits,
+        "mintime": 1700000000,
+        "curtime": 1700000600,
+        "coinbasevalue": 50 * 10**8,
+        "default_witness_commitment": "6a24aa21a9ed" + "00" * 32,
+        "transactions": transactions,
+        "longpollid": f"{seed}-{height}",
+    }
+
+
+def make_block(tx_count=1000, seed=1):
+    """Serialized block bytes: 80-byte header, tx count, transactions."""
+    rng = random.Random(seed)
+    txs = make_txs(tx_count, seed)
+    return rng.randbytes(80) + miner.ser_compact_size(len(txs)) + b''.join(txs)
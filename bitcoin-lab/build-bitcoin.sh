@@ -13,6 +13,7 @@ cmake -B build -S .  -DWITH_QRENCODE=OFF -DBUILD_GUI=OFF \
 	CXXFLAGS="-Os -s"  \
 	-DBUILD_BITCOIN_QT=OFF \
 	-DENABLE_UPNP=OFF \
+	-DWITH_ZMQ=ON \
 	-DENABLE_UTILS=ON \
 	-DBUILD_BITCOIN_NODE=ON \
 	-DCMAKE_EXE_LINKER_FLAGS="-s" \
@@ -23,6 +23,11 @@ discover=1
 dnsseed=0
 txindex=1
 fallbackfee=0.0001
+# Block/tx notifications for the agent (scripts/zmqnotify.py); local only.
+zmqpubhashblock=tcp://127.0.0.1:28332
+zmqpubrawtx=tcp://127.0.0.1:28332
+zmqpubhashblockhwm=100000
+zmqpubrawtxhwm=100000
 # RPC exposed only inside the lab network; adjust as needed.
 rpcbind=0.0.0.0
 # Allow lab RFC1918 ranges; tighten for your setup.
@@ -69,12 +74,14 @@ fi
 : "${AGENT_LOG:=/home/user/.agent.log}"
 : "${AGENT_ON:=0}"
 : "${AGENT_MEMPOOL_TRIGGER:=50}"
+: "${AGENT_METRICS_PORT:=}"
 
 # Start a background Python HTTP server if not already running
 if [[ "${AGENT_ON}" == "1" ]]; then
   if ! pgrep -f "python3 /home/user/scripts/agent.py" >/dev/null 2>&1; then
     nohup python3 /home/user/scripts/agent.py \
       --log-path "${AGENT_LOG}" \
+      ${AGENT_METRICS_PORT:+--metrics-port "${AGENT_METRICS_PORT}"} \
       -v --mempool-trigger "${AGENT_MEMPOOL_TRIGGER}" 2>&1 & disown || true
     echo "[entrypoint] Started agent."
     echo "[entrypoint] Logs: ${AGENT_LOG}"
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+import atexit
+import itertools
+import json
+import logging
+import queue
+import sys
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+"""
+Shared non-blocking logging for the lab scripts (agent, pacer, miner).
+
+setup() puts a QueueHandler on the root logger and leaves formatting and
+all I/O (console text, JSON-lines file) to a QueueListener thread, so a
+slow disk or a stalled terminal never blocks listener, RPC or hashing
+threads. The queue is bounded: when it is full, records are dropped (and
+counted) rather than waited on.
+
+High-volume message kinds are sampled before they are queued. Tag a record
+with extra={"kind": "rpc"} and pass sample={"rpc": 10} to keep 1 in 10.
+Expensive arguments can be wrapped in Lazy so that they are only rendered,
+on the listener thread, for records that are actually written:
+
+    log.info("CMD EXEC: %s %s", method, Lazy(json.dumps, params), extra={"kind": "rpc"})
+"""
+
+DEFAULT_QUEUE_SIZE = 10_000
+DEFAULT_MAX_BYTES = 5 * 1024 * 1024
+DEFAULT_BACKUP_COUNT = 3
+CONSOLE_FORMAT = "%(asctime)s [%(levelname)s] %(message)s"
+CONSOLE_DATEFMT = "%H:%M:%S"
+
+# Attributes every LogRecord has; anything else came in through extra=
+_RECORD_FIELDS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+
+_listener = None
+_handler = None
+
+
+class Lazy:
+    """A log argument computed only when the message is formatted."""
+    __slots__ = ("fn", "args")
+
+    def __init__(self, fn, *args):
+        self.fn = fn
+        self.args = args
+
+    def __str__(self):
+        return str(self.fn(*self.args))
+
+
+def preview(value, limit=100):
+    """value as text (JSON unless already a string), cut to `limit` characters."""
+    text = value if isinstance(value, str) else json.dumps(value)
+    return text if len(text) < limit else text[:limit] + "..."
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: ts, level, logger, thread, msg, plus any extra= fields."""
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS and key not in entry: entry[key] = value
+        if record.exc_info: entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps 1 in `rate` records of each sampled kind; untagged records always pass."""
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = {kind: rate for kind, rate in rates.items() if rate > 1}
+        self.counters = {kind: itertools.count() for kind in self.rates}
+        self.skipped = dict.fromkeys(self.rates, 0)
+
+    def filter(self, record):
+        kind = getattr(record, "kind", None)
+        if kind not in self.rates: return True
+        if next(self.counters[kind]) % self.rates[kind] == 0: return True
+        self.skipped[kind] += 1
+        return False
+
+
+class DroppingQueueHandler(QueueHandler):
+    """
+    Never blocks the logging thread: a full queue drops the record, and the
+    next record that fits is preceded by a warning with the drop count.
+    Records are queued as-is (same process), so formatting happens on the
+    listener thread.
+    """
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self.unreported = 0
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        try:
+            if self.unreported:
+                notice = logging.makeLogRecord({"name": "lablog", "levelno": logging.WARNING, "levelname": "WARNING",
+                                                "msg": f"Log queue full: dropped {self.unreported} records"})
+                self.queue.put_nowait(notice)
+                self.unreported = 0
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            self.unreported += 1
+
+
+class MessageListener(QueueListener):
+    """Renders each record's message once, on the listener thread, before the handlers format it."""
+    def prepare(self, record):
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+def setup(log_path=None, level=logging.INFO, sample=None, console=True, console_format=CONSOLE_FORMAT,
+          datefmt=CONSOLE_DATEFMT, json_console=False, queue_size=DEFAULT_QUEUE_SIZE,
+          max_bytes=DEFAULT_MAX_BYTES, backup_count=DEFAULT_BACKUP_COUNT):
+    """
+    Routes the root logger through a queue. log_path gets JSON lines (rotated
+    at max_bytes), the console gets text (or JSON with json_console).
+    Calling it again replaces the previous pipeline. Returns the queue handler.
+    """
+    global _listener, _handler
+    shutdown()
+
+    handlers = []
+    if log_path:
+        file_handler = RotatingFileHandler(log_path, maxBytes=max_bytes, backupCount=backup_count)
+        file_handler.setFormatter(JsonFormatter())
+        handlers.append(file_handler)
+    if console:
+        stream = logging.StreamHandler(sys.stdout)
+        stream.setFormatter(JsonFormatter() if json_console else logging.Formatter(console_format, datefmt))
+        handlers.append(stream)
+
+    log_queue = queue.Queue(queue_size)
+    handler = DroppingQueueHandler(log_queue)
+    if sample: handler.addFilter(SamplingFilter(sample))
+
+    root = logging.getLogger()
+    for old in root.handlers[:]:
+        root.removeHandler(old)
+    root.addHandler(handler)
+    root.setLevel(level)
+
+    _handler = handler
+    _listener = MessageListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    return handler
+
+
+def shutdown():
+    """Flushes whatever is still queued and stops the listener thread."""
+    global _listener, _handler
+    if _listener is None: return
+    listener, _listener = _listener, None
+    logging.getLogger().removeHandler(_handler)
+    _handler = None
+    listener.stop()
+    for handler in listener.handlers:
+        handler.close()
+
+
+def parse_sample(specs):
+    """["rpc=10", "net=5"] -> {"rpc": 10, "net": 5}"""
+    rates = {}
+    for spec in specs or []:
+        kind, _, rate = spec.partition("=")
+        rates[kind] = int(rate)
+    return rates
+
+
+atexit.register(shutdown)
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+import json
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+"""
+Shared metrics for the lab scripts (miner, agent).
+
+A small thread-safe registry of counters, gauges and histograms that can be
+scraped as Prometheus text (serve_metrics) and/or appended as JSON lines
+(Registry.add_jsonl), so nodes across the lab can be compared side by side.
+"""
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _label_str(names, values, extra=""):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra: pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, registry, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.lock = registry.lock
+        self.values = {}
+
+    def _key(self, labels):
+        return tuple(str(labels.get(n, "")) for n in self.labels)
+
+    def samples(self):
+        with self.lock:
+            return [(self.name, self.labels, key, value) for key, value in self.values.items()]
+
+    def snapshot(self):
+        with self.lock:
+            return {",".join(key) if key else "": value for key, value in self.values.items()}
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def get(self, **labels):
+        return self.values.get(self._key(labels), 0)
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = value
+
+    def get(self, **labels):
+        return self.values.get(self._key(labels), 0)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, registry, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(registry, name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self.lock:
+            state = self.values.get(key)
+            if state is None:
+                state = self.values[key] = [[0] * len(self.buckets), 0.0, 0]
+            counts = state[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound: counts[i] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        out = []
+        with self.lock:
+            for key, (counts, total, n) in self.values.items():
+                for bound, count in zip(self.buckets, counts):
+                    out.append((f"{self.name}_bucket", self.labels, key, count, f'le="{bound}"'))
+                out.append((f"{self.name}_bucket", self.labels, key, n, 'le="+Inf"'))
+                out.append((f"{self.name}_sum", self.labels, key, total))
+                out.append((f"{self.name}_count", self.labels, key, n))
+        return out
+
+    def snapshot(self):
+        with self.lock:
+            return {",".join(key) if key else "": {"count": n, "sum": round(total, 6)}
+                    for key, (_, total, n) in self.values.items()}
+
+
+class Registry:
+    """Holds every metric of one process, plus an optional JSON-lines sink."""
+    def __init__(self, namespace=""):
+        self.namespace = namespace
+        self.lock = threading.RLock()
+        self.metrics = []
+        self.jsonl = None
+        self.jsonl_lock = threading.Lock()
+
+    def _add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def _name(self, name):
+        return f"{self.namespace}_{name}" if self.namespace else name
+
+    def counter(self, name, help_text, labels=()):
+        return self._add(Counter(self, self._name(name), help_text, labels))
+
+    def gauge(self, name, help_text, labels=()):
+        return self._add(Gauge(self, self._name(name), help_text, labels))
+
+    def histogram(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        return self._add(Histogram(self, self._name(name), help_text, labels, buckets))
+
+    def render(self):
+        """Prometheus text exposition format (0.0.4)."""
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for sample in metric.samples():
+                name, label_names, key, value = sample[:4]
+                extra = sample[4] if len(sample) > 4 else ""
+                lines.append(f"{name}{_label_str(label_names, key, extra)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        return {m.name: m.snapshot() for m in self.metrics}
+
+    # --- JSON LINES ---
+    def add_jsonl(self, path):
+        self.jsonl = open(path, "a", buffering=1)
+
+    def event(self, kind, **fields):
+        """Appends {"ts", "event", **fields} to the JSON-lines file, if one is set."""
+        if self.jsonl is None: return
+        line = json.dumps({"ts": round(time.time(), 3), "event": kind, **fields})
+        with self.jsonl_lock:
+            self.jsonl.write(line + "\n")
+
+    def close(self):
+        if self.jsonl is None: return
+        self.event("snapshot", metrics=self.snapshot())
+        with self.jsonl_lock:
+            self.jsonl.close()
+            self.jsonl = None
+
+
+def serve_metrics(registry, port, host="0.0.0.0"):
+    """Serves registry.render() on http://host:port/metrics from a daemon thread."""
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/", "/metrics"):
+                self.send_error(404)
+                return
+            body = registry.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -3,68 +3,80 @@ import hashlib
 import struct
 import binascii
 import time
-import subprocess
 import json
 import sys
 import argparse
 import os
+import multiprocessing
+import queue
+import collections
+import threading
+import array
+import logging
+
+from rpcclient import RPCClient, RPCError, RPCTimeout
+from addresses import CHAIN_NETWORKS, chain_accepts, decode_address
+import labmetrics
+import lablog
 
 """
 AI Disclosure: this script was fully vibed by Gemini 3 Pro
 """
 
 # --- CONFIGURATION ---
-RPC_WALLET_FLAG = "-rpcwallet=student"  
+RPC_WALLET = "student"
+RPC_TIMEOUT = 60
 VERBOSE = False
+MAX_TX = None   # limit transactions shown in block breakdowns
+MAX_HEX = None  # truncate hex fields longer than this many characters
+EXTRANONCE_SIZE = 8  # bytes rolled in the coinbase scriptSig
+SCRIPT_CACHE_FILE = os.environ.get("MINER_SCRIPT_CACHE", os.path.expanduser("~/.cache/bitcoin-lab/scriptpubkeys.json"))
 
 # --- LOGGING ---
-def log(msg, level="INFO"):
+LOGGER = logging.getLogger("miner")
+
+def log(msg, level="INFO", kind=None):
+    """Queued through lablog once main() has set it up; progress output stays on print()."""
     if level == "DEBUG" and not VERBOSE: return
-    print(f"[{level}] {msg}")
+    LOGGER.log(logging.getLevelName(level), msg, extra={"kind": kind} if kind else None)
+
+# --- METRICS ---
+METRICS = labmetrics.Registry("miner")
+HASHES = METRICS.counter("hashes_total", "Nonces hashed", ("worker",))
+HASHRATE = METRICS.gauge("worker_hashrate", "Hashes per second over the last progress interval", ("worker",))
+STAGE_SECONDS = METRICS.histogram("stage_seconds", "Time spent per stage (template_fetch, template_longpoll incl. the wait for a new tip, "
+                                  "merkle_build, hashing, submit)", ("stage",))
+TEMPLATE_AGE = METRICS.histogram("template_age_seconds", "Seconds since the template's curtime when a block was found",
+                                 buckets=(1, 5, 15, 30, 60, 120, 300, 600, 1800))
+SUBMITS = METRICS.counter("submit_total", "submitblock outcomes", ("result",))
+METRICS_EVENT_INTERVAL = 10  # seconds between hashrate lines in the JSON-lines export
 
 # --- RPC CALLER ---
+_rpc_client = None
+_node_chain = None
+
+def get_rpc_client():
+    global _rpc_client
+    if _rpc_client is None:
+        _rpc_client = RPCClient(wallet=RPC_WALLET, timeout=RPC_TIMEOUT)
+    return _rpc_client
+
 def rpc(method, params=None):
     if params is None: params = []
     
-    cmd_params = []
-    for p in params:
-        if isinstance(p, (dict, list)):
-            cmd_params.append(json.dumps(p))
-        else:
-            cmd_params.append(str(p))
-            
-    base_cmd = ["bitcoin-cli"]
-    cmd = base_cmd + [RPC_WALLET_FLAG, method] + cmd_params
-    
-    if VERBOSE: log(f"EXEC: {' '.join(cmd)}", "DEBUG")
+    if VERBOSE: LOGGER.debug("RPC: %s %s", method, lablog.Lazy(json.dumps, params), extra={"kind": "rpc"})
 
     try:
-        result_bytes = subprocess.check_output(cmd, stderr=subprocess.PIPE)
-        result_str = result_bytes.decode('utf-8').strip()
-        
-        if VERBOSE and result_str and len(result_str) < 500:
-            log(f"RESP: {result_str}", "DEBUG")
+        result = get_rpc_client().call(method, params)
+    except RPCError as e:
+        log(f"RPC FAILED: {e}", "ERROR")
+        raise
 
-        if not result_str: return None 
-
-        try:
-            return json.loads(result_str)
-        except json.JSONDecodeError:
-            return result_str
-
-    except subprocess.CalledProcessError as e:
-        err_msg = e.stderr.decode('utf-8').strip()
-        if "Wallet file not specified" in err_msg or "Method not found" in err_msg:
-            global_cmd = base_cmd + [method] + cmd_params
-            try:
-                res_bytes = subprocess.check_output(global_cmd, stderr=subprocess.PIPE)
-                return json.loads(res_bytes.decode('utf-8').strip())
-            except Exception as e2:
-                log(f"RPC FAILED: {err_msg}", "ERROR")
-                raise e
-        else:
-            log(f"RPC FAILED: {err_msg}", "ERROR")
-            raise e
+    if VERBOSE and result is not None:
+        result_str = json.dumps(result)
+        if len(result_str) < 500:
+            log(f"RESP: {result_str}", "DEBUG", kind="rpc")
+    return result
 
 # --- CRYPTO ---
 def sha256d(data):
@@ -97,7 +109,63 @@ def calculate_merkle_root(tx_hashes):
         level = next_level
     return level[0]
 
-def get_script_pubkey(address):
+class MerkleBranch:
+    """
+    Stratum-style merkle branch: the sibling hashes on the path from the
+    coinbase (leaf 0) to the root. Built once per template, after which a
+    new coinbase costs log2(n) sha256d calls instead of rehashing the tree.
+    """
+    __slots__ = ("hashes",)
+
+    def __init__(self, tx_hashes):
+        """tx_hashes: every leaf except the coinbase (internal byte order)."""
+        self.hashes = []
+        level = [None] + list(tx_hashes)
+        while len(level) > 1:
+            self.hashes.append(level[1])
+            next_level = [None]
+            for i in range(2, len(level), 2):
+                left = level[i]
+                right = level[i+1] if i + 1 < len(level) else left
+                next_level.append(sha256d(left + right))
+            level = next_level
+
+    @classmethod
+    def from_template(cls, template):
+        tx_hashes = []
+        for tx in template.get('transactions', []):
+            tx_id_hex = tx.get('txid', tx['hash'])
+            tx_hashes.append(binascii.unhexlify(tx_id_hex)[::-1])
+        return cls(tx_hashes)
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def root(self, coinbase_hash):
+        root = coinbase_hash
+        for sibling in self.hashes:
+            root = sha256d(root + sibling)
+        return root
+
+def load_script_cache(path=None):
+    try:
+        with open(path or SCRIPT_CACHE_FILE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_script_cache(cache, path=None):
+    path = path or SCRIPT_CACHE_FILE
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(cache, f, indent=1, sort_keys=True)
+        os.replace(tmp, path)
+    except OSError as e:
+        log(f"Could not write scriptPubKey cache {path}: {e}", "DEBUG")
+
+def rpc_script_pubkey(address):
     try:
         info = rpc("validateaddress", [address])
         if info and "scriptPubKey" in info:
@@ -107,6 +175,47 @@ def get_script_pubkey(address):
             return binascii.unhexlify(info["scriptPubKey"])
     except Exception:
         pass
+    return None
+
+def node_chain():
+    """The node's chain name from getblockchaininfo, fetched once."""
+    global _node_chain
+    if _node_chain is None:
+        try:
+            _node_chain = rpc("getblockchaininfo")["chain"]
+        except Exception:
+            log("Could not read the node's chain (getblockchaininfo).", "ERROR")
+            sys.exit(1)
+    return _node_chain
+
+def get_script_pubkey(address):
+    """
+    Standard addresses are decoded locally (no RPC) and must belong to the
+    node's chain. Anything else (or any address on a chain we don't know) is
+    asked of the node once and remembered in SCRIPT_CACHE_FILE under chain:address.
+    """
+    chain = node_chain()
+    try:
+        network, script = decode_address(address)
+        if chain_accepts(chain, address, network):
+            log(f"Decoded {network} address locally: {script.hex()}", "DEBUG")
+            return script
+        if chain in CHAIN_NETWORKS:
+            log(f"{address} is a {network} address, but the node is on {chain}.", "ERROR")
+            sys.exit(1)
+    except ValueError as e:
+        log(f"Local decode failed ({e}), trying cache/RPC", "DEBUG")
+
+    key = f"{chain}:{address}"
+    cache = load_script_cache()
+    if key in cache:
+        return binascii.unhexlify(cache[key])
+
+    script = rpc_script_pubkey(address)
+    if script is not None:
+        cache[key] = script.hex()
+        save_script_cache(cache)
+        return script
     log("Could not resolve scriptPubKey. Is the address valid?", "ERROR")
     sys.exit(1)
 
@@ -251,226 +360,783 @@ def parse_tx(raw_hex, tx_index):
     
     return parts
 
+# --- ZERO-COPY PARSING ---
+# Field kinds recorded by TxLayout
+(F_TX, F_VERSION, F_SEGWIT, F_IN_COUNT, F_INPUT, F_PREV_HASH, F_PREV_IDX,
+ F_SCRIPT_LEN, F_SCRIPT_SIG, F_SEQUENCE, F_OUT_COUNT, F_OUTPUT, F_VALUE,
+ F_SCRIPT_PUB, F_WITNESS, F_STACK_COUNT, F_ITEM_LEN, F_WITNESS_DATA,
+ F_LOCKTIME) = range(19)
+
+# kind -> (label, description, indent); "{}" is filled with the field's value
+FIELD_FORMATS = (
+    ("=== TX #{} ===", "", 0),
+    ("Version", "Tx Version", 0),
+    ("Segwit", "Marker (00) Flag (01)", 0),
+    ("InCount", "{} Inputs", 0),
+    ("Input #{}", "", 1),
+    ("PrevHash", "Previous Tx Hash", 2),
+    ("PrevIdx", "Index {}", 2),
+    ("ScriptLen", "{} bytes", 2),
+    ("ScriptSig", "Signature Script", 2),
+    ("Sequence", "Tx Sequence", 2),
+    ("OutCount", "{} Outputs", 0),
+    ("Output #{}", "", 1),
+    ("Value", "{} Satoshis", 2),
+    ("ScriptPub", "Pubkey Script", 2),
+    ("Witness #{}", "Stack for Input {}", 1),
+    ("Count", "{} items", 2),
+    ("ItemLen", "{} bytes", 2),
+    ("Data", "Witness Data", 2),
+    ("Locktime", "Block Height / Time", 0),
+)
+
+def _read_varint(buf, pos):
+    """Returns (value, encoded size) of the CompactSize at buf[pos]."""
+    prefix = buf[pos]
+    if prefix < 0xfd: return prefix, 1
+    if prefix == 0xfd: return struct.unpack_from("<H", buf, pos + 1)[0], 3
+    if prefix == 0xfe: return struct.unpack_from("<I", buf, pos + 1)[0], 5
+    return struct.unpack_from("<Q", buf, pos + 1)[0], 9
+
+class TxLayout:
+    """
+    Field layout of serialized transactions, kept as parallel arrays
+    (struct-of-arrays): kind, offset and length into the source buffer,
+    plus one integer per field (a count, index or value). Nothing is
+    copied out of the buffer; labels and hex are rendered by parts().
+    """
+    __slots__ = ("buf", "kinds", "starts", "lengths", "values")
+
+    def __init__(self, buf):
+        self.buf = buf
+        self.kinds = array.array('B')
+        self.starts = array.array('I')
+        self.lengths = array.array('I')
+        self.values = array.array('Q')
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def describe(self, i):
+        """(label, description, indent) for field i."""
+        label, desc, indent = FIELD_FORMATS[self.kinds[i]]
+        value = self.values[i]
+        return label.format(value), desc.format(value), indent
+
+    def parts(self):
+        """Yields (data, label, description, indent) like parse_tx, lazily."""
+        view = memoryview(self.buf)
+        for i in range(len(self.kinds)):
+            label, desc, indent = self.describe(i)
+            start = self.starts[i]
+            yield view[start:start + self.lengths[i]], label, desc, indent
+
+def parse_tx_layout(buf, pos=0, tx_index=0, layout=None):
+    """
+    Records the fields of the transaction at buf[pos:] into a TxLayout
+    (a new one unless given). buf can be bytes, bytearray or memoryview,
+    e.g. a whole block. Returns (layout, end position).
+    """
+    if layout is None: layout = TxLayout(buf)
+    kinds, starts, lengths, values = layout.kinds, layout.starts, layout.lengths, layout.values
+    add_kind, add_start, add_len, add_val = kinds.append, starts.append, lengths.append, values.append
+    unpack_from = struct.unpack_from
+
+    def add(kind, start, length, value=0):
+        add_kind(kind); add_start(start); add_len(length); add_val(value)
+
+    try:
+        add(F_TX, pos, 0, tx_index)
+        add(F_VERSION, pos, 4)
+        pos += 4
+
+        is_segwit = buf[pos] == 0 and buf[pos + 1] == 1
+        if is_segwit:
+            add(F_SEGWIT, pos, 2)
+            pos += 2
+
+        count, size = _read_varint(buf, pos)
+        add(F_IN_COUNT, pos, size, count)
+        pos += size
+        for i in range(count):
+            add(F_INPUT, pos, 0, i)
+            add(F_PREV_HASH, pos, 32)
+            add(F_PREV_IDX, pos + 32, 4, unpack_from("<I", buf, pos + 32)[0])
+            pos += 36
+            sl, size = _read_varint(buf, pos)
+            add(F_SCRIPT_LEN, pos, size, sl)
+            pos += size
+            if sl > 0:
+                add(F_SCRIPT_SIG, pos, sl)
+                pos += sl
+            add(F_SEQUENCE, pos, 4)
+            pos += 4
+
+        out_count, size = _read_varint(buf, pos)
+        add(F_OUT_COUNT, pos, size, out_count)
+        pos += size
+        for i in range(out_count):
+            add(F_OUTPUT, pos, 0, i)
+            add(F_VALUE, pos, 8, unpack_from("<Q", buf, pos)[0])
+            pos += 8
+            sl, size = _read_varint(buf, pos)
+            add(F_SCRIPT_LEN, pos, size, sl)
+            pos += size
+            if sl > 0:
+                add(F_SCRIPT_PUB, pos, sl)
+                pos += sl
+
+        if is_segwit:
+            for i in range(count):
+                add(F_WITNESS, pos, 0, i)
+                stack_count, size = _read_varint(buf, pos)
+                add(F_STACK_COUNT, pos, size, stack_count)
+                pos += size
+                for _ in range(stack_count):
+                    item_len, size = _read_varint(buf, pos)
+                    add(F_ITEM_LEN, pos, size, item_len)
+                    pos += size
+                    if item_len > 0:
+                        add(F_WITNESS_DATA, pos, item_len)
+                        pos += item_len
+
+        add(F_LOCKTIME, pos, 4)
+        pos += 4
+    except (IndexError, struct.error):
+        raise ValueError("Unexpected End of Stream")
+    if pos > len(buf): raise ValueError("Unexpected End of Stream")
+    return layout, pos
+
+def parse_txs_layout(buf, pos, count, first_index=0):
+    """Parses `count` back-to-back transactions (e.g. a block body) into one TxLayout."""
+    layout = TxLayout(buf)
+    for i in range(count):
+        _, pos = parse_tx_layout(buf, pos, first_index + i, layout)
+    return layout, pos
+
+def iter_block_parts(block, tx_ids=None, max_tx=None, tx_sizes=None):
+    """
+    Yields the high-level layout of a serialized block (header, tx count,
+    parsed coinbase, then each transaction as one raw blob), parsing one
+    transaction at a time. Stops after max_tx non-coinbase transactions.
+    With tx_sizes (known from the template) the blobs are sliced, not parsed.
+    """
+    view = memoryview(block)
+    header_time, = struct.unpack_from("<I", block, 68)
+    header_nonce, = struct.unpack_from("<I", block, 76)
+
+    # Header Section
+    yield b'', "=== BLOCK HEADER ===", "", 0
+    yield view[0:4], "Version", "Block Version", 0
+    yield view[4:36], "PrevHash", "Hash of prev block", 0
+    yield view[36:68], "MerkleRoot", "Root of all Txs", 0
+    yield view[68:72], "Time", f"Unix ({header_time})", 0
+    yield view[72:76], "Bits", "Target Compact", 0
+    yield view[76:80], "Nonce", f"Winning ({header_nonce})", 0
+
+    # Tx Count
+    count, size = _read_varint(block, 80)
+    yield view[80:80 + size], "TxCount", f"{count} Txs", 0
+    pos = 80 + size
+
+    for i in range(count):
+        if max_tx is not None and i > max_tx:
+            yield b'', f"... {count - i} more transactions (--max-tx {max_tx})", "", 0
+            return
+        if i == 0 or tx_sizes is None:
+            layout, end = parse_tx_layout(block, pos, i)
+        else:
+            end = pos + tx_sizes[i-1]
+        if i == 0:
+            # Coinbase gets the full field breakdown
+            parts = layout.parts()
+            next(parts)
+            yield b'', "=== COINBASE (Tx #0) ===", "Mining Reward", 0
+            yield from parts
+        else:
+            desc = f"ID: {tx_ids[i-1][:8]}..." if tx_ids else f"{end - pos} bytes"
+            yield b'', f"=== TX #{i} ===", "", 0
+            yield view[pos:end], "Tx Data", desc, 0
+        pos = end
+
+def iter_tx_parts(block, first_index=1, max_tx=None):
+    """Yields the field-by-field breakdown of a block's transactions, one tx at a time."""
+    count, size = _read_varint(block, 80)
+    pos = 80 + size
+    last = count - 1 if max_tx is None else min(count - 1, max_tx)
+    for i in range(last + 1):
+        layout, pos = parse_tx_layout(block, pos, i)
+        if i >= first_index:
+            yield from layout.parts()
+    if last < count - 1:
+        yield b'', f"... {count - 1 - last} more transactions (--max-tx {max_tx})", "", 0
+
 # --- VISUALIZER ---
-def print_block_breakdown(parts, title="SERIALIZED BLOCK STRUCTURE"):
+RENDER_FLUSH_BYTES = 64 * 1024
+
+def render_hex(data, max_hex=None):
+    """Hex of data, cut to max_hex characters (only the kept bytes are converted)."""
+    if max_hex and len(data) * 2 > max_hex:
+        keep = max_hex // 2
+        return f"{data[:keep].hex()}... (+{len(data) - keep} bytes)"
+    return data.hex()
+
+def print_block_breakdown(parts, title="SERIALIZED BLOCK STRUCTURE", out=None, max_hex=None):
     """
     Field-by-field layout.
+    `parts` can be any iterable (e.g. a generator over a block buffer); lines
+    are gathered into one buffer and written in large chunks, so memory stays
+    flat however big the block is.
     """
-    print("\n" + "#"*60)
-    print(f"  {title}")
-    print("#"*60)
+    out = out or sys.stdout
+    chunk = []
+    size = 0
+    chunk.append("\n" + "#"*60 + f"\n  {title}\n" + "#"*60 + "\n")
     
     for data, label, desc, indent in parts:
+        prefix = "    " * indent
         
         # Handle Section Headers (empty data)
-        if data == b'':
-            prefix = "    " * indent
-            print(f"\n{prefix}___ {label} ___")
-            continue
+        if not len(data):
+            line = f"\n{prefix}___ {label} ___\n"
+        else:
+            # Layout:
+            # [Indent] Label: Description
+            # [Indent] Hex:   <Full Hex String>
+            line = f"{prefix}{label}: {desc}\n{prefix}Hex: {render_hex(data, max_hex)}\n"
+        chunk.append(line)
+        size += len(line)
+        if size >= RENDER_FLUSH_BYTES:
+            out.write("".join(chunk))
+            chunk.clear()
+            size = 0
+                
+    chunk.append("\n" + "#"*60 + "\n\n")
+    out.write("".join(chunk))
+    out.flush()
 
-        hex_str = binascii.hexlify(data).decode()
-        prefix = "    " * indent
+def dump_block(block_hex):
+    """Prints the breakdown of a raw block (hex, as from getblock <hash> 0)."""
+    block = binascii.unhexlify(block_hex.strip())
+    print_block_breakdown(iter_block_parts(block, max_tx=MAX_TX), "SERIALIZED BLOCK STRUCTURE", max_hex=MAX_HEX)
+    if VERBOSE:
+        print_block_breakdown(iter_tx_parts(block, 0, MAX_TX), "TRANSACTION DEEP DIVE", max_hex=MAX_HEX)
+
+# --- WORK GENERATION ---
+NONCE_SPACE = 1 << 32
+MAX_FUTURE_BLOCK_TIME = 2 * 60 * 60  # consensus limit on header time vs. node clock
+
+WorkUnit = collections.namedtuple("WorkUnit", "extranonce ntime header_prefix start end")
+
+class WorkGenerator:
+    """
+    Turns one block template into disjoint, cheap work units.
+
+    Every unit carries its own extranonce (an 8-byte push at the end of the
+    coinbase scriptSig) and a full 32-bit nonce range, so workers never
+    overlap. A new unit only rehashes the coinbase and its merkle branch;
+    ntime follows the clock, clamped to what the template allows.
+    """
+    def __init__(self, template, script_pubkey):
+        self.template = template
+        self.height = template['height']
+        self.prev_hash = binascii.unhexlify(template['previousblockhash'])[::-1]
+        self.bits = int(template['bits'], 16)
+        self.version_bytes = struct.pack("<I", 0x20000000)
+        self.bits_bytes = struct.pack("<I", self.bits)
+        self.min_time = template['mintime']
+        self.max_time = template.get('curtime', int(time.time())) + MAX_FUTURE_BLOCK_TIME
+        self.transactions = template.get('transactions', [])
+        self.next_extranonce = 0
+
+        self.witness_commitment = None
+        if 'default_witness_commitment' in template:
+            self.witness_commitment = binascii.unhexlify(template['default_witness_commitment'])
+        self._build_coinbase(template['coinbasevalue'], script_pubkey)
+        self.branch = MerkleBranch.from_template(template)
+
+    def _build_coinbase(self, reward_val, script_pubkey):
+        """Manual assembly for correctness, split around the extranonce."""
+        witness_commitment = self.witness_commitment
+
+        # Version
+        self.cb_ver = struct.pack("<I", 1)
+
+        # Input
+        cb_in_count = b'\x01'
+        cb_prev_hash = b'\x00'*32
+        cb_prev_idx = b'\xff\xff\xff\xff'
         
-        # Layout:
-        # [Indent] Label: Description
-        # [Indent] Hex:   <Full Hex String>
-        print(f"{prefix}{label}: {desc}")
-        print(f"{prefix}Hex: {hex_str}")
-                
-    print("\n" + "#"*60 + "\n")
+        height_script = encode_script_num(self.height)
+        extra_nonce_tag = b'Student Miner'
+        # Fixed-width push so every extranonce yields the same coinbase size
+        script_sig_len = len(height_script) + len(push_data(extra_nonce_tag)) + 1 + EXTRANONCE_SIZE
+        cb_script_len = ser_compact_size(script_sig_len)
+        cb_seq = b'\xff\xff\xff\xff'
 
-# --- MINING ---
-def mine_block(target_address=None):
-    print("⛏️  Initializing Miner...")
+        # Outputs
+        out_count_int = 2 if witness_commitment else 1
+        cb_out_count = ser_compact_size(out_count_int)
 
-    # 1. Get Template
+        # Output 1 (Reward)
+        cb_val = struct.pack("<Q", reward_val)
+        cb_pk_len = ser_compact_size(len(script_pubkey))
+        
+        # Output 2 (Witness Commitment)
+        cb_wit_out = b''
+        if witness_commitment:
+            cb_wit_val = struct.pack("<Q", 0)
+            cb_wit_len = ser_compact_size(len(witness_commitment))
+            cb_wit_out = cb_wit_val + cb_wit_len + witness_commitment
+
+        # Witness Data (SegWit)
+        self.cb_witness = b''
+        if witness_commitment:
+            self.cb_witness = b'\x01\x20' + (b'\x00' * 32)
+
+        self.cb_lock = b'\x00\x00\x00\x00'
+
+        # Everything before / after the extranonce bytes
+        self.cb_head = (
+            cb_in_count + cb_prev_hash + cb_prev_idx + cb_script_len +
+            height_script + push_data(extra_nonce_tag) + struct.pack("B", EXTRANONCE_SIZE)
+        )
+        self.cb_tail = cb_seq + cb_out_count + cb_val + cb_pk_len + script_pubkey + cb_wit_out
+
+    def coinbase(self, extranonce, witness=True):
+        """Serialized coinbase; witness=False gives the legacy (txid) form."""
+        en = extranonce.to_bytes(EXTRANONCE_SIZE, 'little')
+        if witness and self.witness_commitment:
+            return self.cb_ver + b'\x00\x01' + self.cb_head + en + self.cb_tail + self.cb_witness + self.cb_lock
+        return self.cb_ver + self.cb_head + en + self.cb_tail + self.cb_lock
+
+    def merkle_root(self, extranonce):
+        coinbase_txid = sha256d(self.coinbase(extranonce, witness=False))
+        return self.branch.root(coinbase_txid)
+
+    def ntime(self):
+        return min(max(int(time.time()), self.min_time), self.max_time)
+
+    def next_unit(self):
+        extranonce = self.next_extranonce
+        self.next_extranonce += 1
+        ntime = self.ntime()
+        header_prefix = (
+            self.version_bytes + self.prev_hash + self.merkle_root(extranonce) +
+            struct.pack("<I", ntime) + self.bits_bytes
+        )
+        return WorkUnit(extranonce, ntime, header_prefix, 0, NONCE_SPACE)
+
+def serialize_block(header, coinbase, transactions):
+    """
+    Serialized block as one bytearray: header, tx count, coinbase, then the
+    template's transactions (hex 'data'). The final size is computed up front
+    and every piece is decoded straight into its slot, so nothing is copied
+    twice however many transactions the template carries.
+    """
+    tx_count = ser_compact_size(len(transactions) + 1)
+    size = len(header) + len(tx_count) + len(coinbase) + sum(len(tx['data']) for tx in transactions) // 2
+    block = bytearray(size)
+    view = memoryview(block)
+
+    pos = 0
+    for part in (header, tx_count, coinbase):
+        view[pos:pos + len(part)] = part
+        pos += len(part)
+    unhexlify = binascii.unhexlify
+    for tx in transactions:
+        data = unhexlify(tx['data'])
+        view[pos:pos + len(data)] = data
+        pos += len(data)
+    return block
+
+# --- PARALLEL HASHING ---
+SCAN_BATCH = 1 << 12  # nonces hashed between checks of the job counter
+
+def scan_nonces(header_prefix, target, start, end):
+    """
+    Hashes nonces in [start, end) and returns the first winner or None.
+    The first 64 header bytes never change, so their SHA-256 state (the
+    midstate) is computed once and copied; each attempt only feeds the
+    last 16 bytes, patched in place in a preallocated header buffer.
+    """
+    header = bytearray(80)
+    header[:76] = header_prefix
+    midstate = hashlib.sha256(header_prefix[:64])
+    tail = memoryview(header)[64:]
+    sha256 = hashlib.sha256
+    pack_into = struct.pack_into
+    from_bytes = int.from_bytes
+    for nonce in range(start, end):
+        pack_into("<I", header, 76, nonce)
+        h = midstate.copy()
+        h.update(tail)
+        if from_bytes(sha256(h.digest()).digest(), 'little') <= target:
+            return nonce
+    return None
+
+def _hash_worker(index, tasks, results, job, hashes):
+    """Pulls work units off the task queue until it receives None."""
+    try:
+        while True:
+            task = tasks.get()
+            if task is None: return
+            job_id, unit, target = task
+            found = None
+            nonce = unit.start
+            # A bumped job counter means another worker won (or the job is stale)
+            while nonce < unit.end and job.value == job_id:
+                stop = min(nonce + SCAN_BATCH, unit.end)
+                found = scan_nonces(unit.header_prefix, target, nonce, stop)
+                if found is not None:
+                    hashes[index] += found - nonce + 1
+                    break
+                hashes[index] += stop - nonce
+                nonce = stop
+            results.put((job_id, unit, found))
+    except KeyboardInterrupt:
+        pass
+
+class HashingPool:
+    """Worker processes that each hash their own work unit."""
+    def __init__(self, workers=1):
+        self.size = max(1, workers)
+        self.tasks = multiprocessing.Queue()
+        self.results = multiprocessing.Queue()
+        self.job = multiprocessing.Value('Q', 0, lock=False)
+        self.hashes = multiprocessing.Array('Q', self.size, lock=False)
+        self.procs = []
+        for i in range(self.size):
+            p = multiprocessing.Process(
+                target=_hash_worker,
+                args=(i, self.tasks, self.results, self.job, self.hashes),
+                daemon=True)
+            p.start()
+            self.procs.append(p)
+        self.reported = [0] * self.size
+        self.reported_at = time.time()
+
+    def total_hashes(self):
+        return sum(self.hashes)
+
+    def report_hashrate(self, emit=False):
+        """Feeds per-worker hash counts since the last report into the metrics."""
+        now = time.time()
+        interval = max(now - self.reported_at, 1e-6)
+        rates = []
+        for i in range(self.size):
+            done = self.hashes[i]
+            HASHES.inc(done - self.reported[i], worker=i)
+            rate = (done - self.reported[i]) / interval
+            HASHRATE.set(round(rate, 1), worker=i)
+            rates.append(round(rate, 1))
+            self.reported[i] = done
+        self.reported_at = now
+        if emit: METRICS.event("hashrate", workers=rates, total=round(sum(rates), 1))
+
+    def cancel(self):
+        """Makes every worker drop its current unit (within one SCAN_BATCH)."""
+        self.job.value += 1
+
+    def search(self, work, target, interrupt=None):
+        """
+        Hashes units from a WorkGenerator until one meets the target.
+        An exhausted unit is replaced with a fresh one (next extranonce).
+        Returns (unit, nonce, hashes, seconds); unit and nonce are None
+        if the interrupt event was set before a block was found.
+        """
+        job_id = self.job.value + 1
+        self.job.value = job_id
+
+        for _ in range(self.size):
+            self.tasks.put((job_id, work.next_unit(), target))
+
+        base_hashes = self.total_hashes()
+        start_t = time.time()
+        next_progress = start_t + 0.5
+        next_event = start_t + METRICS_EVENT_INTERVAL
+        self.reported_at = start_t
+        unit = nonce = None
+        while True:
+            if interrupt is not None and interrupt.is_set():
+                unit = nonce = None
+                break
+            try:
+                res_job, unit, nonce = self.results.get(timeout=0.05)
+            except queue.Empty:
+                unit = nonce = None
+                if time.time() >= next_progress:
+                    next_progress += 0.5
+                    emit = time.time() >= next_event
+                    if emit: next_event += METRICS_EVENT_INTERVAL
+                    self.report_hashrate(emit)
+                    done = self.total_hashes() - base_hashes
+                    rate = done / max(time.time() - start_t, 1e-6)
+                    sys.stdout.write(f"\r   Checking: {done}... ({format_hashrate(rate)})")
+                    sys.stdout.flush()
+                continue
+            if res_job != job_id: continue
+            if nonce is not None: break
+            self.tasks.put((job_id, work.next_unit(), target))
+
+        # Stop the remaining workers
+        if self.job.value == job_id:
+            self.job.value = job_id + 1
+        self.report_hashrate(emit=True)
+        return unit, nonce, self.total_hashes() - base_hashes, time.time() - start_t
+
+    def close(self):
+        self.job.value += 1
+        for _ in self.procs:
+            self.tasks.put(None)
+        for p in self.procs:
+            p.join(timeout=2)
+            if p.is_alive(): p.terminate()
+
+def format_hashrate(rate):
+    if rate >= 1e6: return f"{rate/1e6:.2f} MH/s"
+    if rate >= 1e3: return f"{rate/1e3:.1f} kH/s"
+    return f"{rate:.0f} H/s"
+
+# --- TEMPLATE LONG-POLLING ---
+LONGPOLL_TIMEOUT = 600
+
+class TemplateWatcher(threading.Thread):
+    """
+    Long-polls getblocktemplate (longpollid) in the background.
+    Each new template is stored as `latest`, sets `changed`, and runs the
+    on_change callback right away so stale hashing stops immediately.
+    Plain requests are timed as the template_fetch stage, long-polls (which
+    include waiting for the template to change) as template_longpoll.
+    """
+    def __init__(self, on_change=None):
+        super().__init__(daemon=True)
+        self.on_change = on_change
+        self.changed = threading.Event()
+        self.lock = threading.Lock()
+        self.latest = None
+        self.running = True
+
+    def run(self):
+        longpollid = None
+        while self.running:
+            request = {"rules": ["segwit"]}
+            if longpollid: request["longpollid"] = longpollid
+            stage = "template_longpoll" if longpollid else "template_fetch"
+            start_t = time.perf_counter()
+            try:
+                template = get_rpc_client().call("getblocktemplate", [request], timeout=LONGPOLL_TIMEOUT)
+                STAGE_SECONDS.observe(time.perf_counter() - start_t, stage=stage)
+            except RPCTimeout:
+                continue
+            except Exception as e:
+                log(f"Long-poll failed: {e}", "ERROR")
+                time.sleep(1)
+                continue
+            longpollid = template.get('longpollid')
+            with self.lock:
+                previous = self.latest
+                self.latest = template
+            self.changed.set()
+            if previous is not None and self.on_change:
+                self.on_change(previous, template)
+
+    def take(self, timeout=None):
+        """Waits for a template newer than the last one taken and returns it."""
+        if not self.changed.wait(timeout): return None
+        with self.lock:
+            self.changed.clear()
+            return self.latest
+
+# --- MINING ---
+def fetch_template():
     try:
-        template = rpc("getblocktemplate", [{"rules": ["segwit"]}])
+        with STAGE_SECONDS.time(stage="template_fetch"):
+            return rpc("getblocktemplate", [{"rules": ["segwit"]}])
     except Exception:
         log("Could not get block template.", "ERROR")
         sys.exit(1)
 
-    height = template['height']
-    prev_hash_hex = template['previousblockhash']
-    prev_hash = binascii.unhexlify(prev_hash_hex)[::-1]
-    bits = int(template['bits'], 16)
-    cur_time = int(time.time())
-    if cur_time <= template['mintime']: cur_time = template['mintime'] + 1
-
-    # 2. Prepare Coinbase Output
-    reward_val = template['coinbasevalue']
+def resolve_script_pubkey(target_address):
     if target_address:
-        script_pubkey = get_script_pubkey(target_address)
-    else:
-        script_pubkey = b'\x01\x51' # OP_TRUE
-    
-    witness_commitment = None
-    if 'default_witness_commitment' in template:
-        witness_commitment = binascii.unhexlify(template['default_witness_commitment'])
-    
-    # 3. Build Coinbase Structure (Manual assembly for correctness)
-    
-    # Version
-    cb_ver = struct.pack("<I", 1)
-    
-    # Marker/Flag (SegWit)
-    cb_marker_flag = b''
-    if witness_commitment:
-        cb_marker_flag = b'\x00\x01'
-
-    # Input
-    cb_in_count = b'\x01'
-    cb_prev_hash = b'\x00'*32
-    cb_prev_idx = b'\xff\xff\xff\xff'
-    
-    height_script = encode_script_num(height)
-    extra_nonce = b'Student Miner'
-    script_sig = height_script + push_data(extra_nonce)
-    cb_script_len = ser_compact_size(len(script_sig))
-    cb_seq = b'\xff\xff\xff\xff'
-
-    # Outputs
-    out_count_int = 2 if witness_commitment else 1
-    cb_out_count = ser_compact_size(out_count_int)
-
-    # Output 1 (Reward)
-    cb_val = struct.pack("<Q", reward_val)
-    cb_pk_len = ser_compact_size(len(script_pubkey))
-    
-    # Output 2 (Witness Commitment)
-    cb_wit_out = b''
-    if witness_commitment:
-        cb_wit_val = struct.pack("<Q", 0)
-        cb_wit_len = ser_compact_size(len(witness_commitment))
-        cb_wit_out = cb_wit_val + cb_wit_len + witness_commitment
-
-    # Witness Data (SegWit)
-    cb_witness = b''
-    if witness_commitment:
-        cb_witness = b'\x01\x20' + (b'\x00' * 32)
-
-    cb_lock = b'\x00\x00\x00\x00'
-
-    # Assemble Bytes
-    coinbase_bytes = (
-        cb_ver + cb_marker_flag + cb_in_count + cb_prev_hash + cb_prev_idx + 
-        cb_script_len + script_sig + cb_seq + cb_out_count + 
-        cb_val + cb_pk_len + script_pubkey + cb_wit_out + 
-        cb_witness + cb_lock
-    )
-
-    # Calculate Coinbase TXID (Legacy)
-    legacy_tx = (
-        cb_ver + cb_in_count + cb_prev_hash + cb_prev_idx + 
-        cb_script_len + script_sig + cb_seq + cb_out_count + 
-        cb_val + cb_pk_len + script_pubkey + cb_wit_out + cb_lock
-    )
-    coinbase_txid = sha256d(legacy_tx)
-
-    # 4. Merkle Root
-    tx_hashes = [coinbase_txid]
-    transactions = template.get('transactions', [])
-    for tx in transactions:
-        tx_id_hex = tx.get('txid', tx['hash'])
-        tx_hashes.append(binascii.unhexlify(tx_id_hex)[::-1])
-        
-    merkle_root = calculate_merkle_root(tx_hashes)
+        return get_script_pubkey(target_address)
+    return b'\x01\x51' # OP_TRUE
+
+def mine_template(template, script_pubkey, pool, interrupt=None):
+    """Hashes one template. Returns (work, unit, nonce) or None if interrupted."""
+    # Coinbase + Merkle Branch (built once, extranonce-rolled per work unit)
+    with STAGE_SECONDS.time(stage="merkle_build"):
+        work = WorkGenerator(template, script_pubkey)
+    transactions = work.transactions
 
-    print(f"   ├── Height: {height}")
+    print(f"   ├── Height: {work.height}")
     print(f"   ├── Txs: {len(transactions)}")
-    print(f"   ├── SegWit: {'Yes' if witness_commitment else 'No'}")
-    print(f"   └── Merkle: {binascii.hexlify(merkle_root[::-1]).decode()}")
-
-    # 5. Build Header
-    version_bytes = struct.pack("<I", 0x20000000)
-    time_bytes = struct.pack("<I", cur_time)
-    bits_bytes = struct.pack("<I", bits)
-
-    # 6. Mine
-    target = compact_to_target(bits)
-    nonce = 0
-    print("\n🔨 STARTING HASHING...")
-    start_t = time.time()
-    
-    found_header = None
-    
-    while True:
-        nonce_bytes = struct.pack("<I", nonce)
-        header = version_bytes + prev_hash + merkle_root + time_bytes + bits_bytes + nonce_bytes
-        block_hash = sha256d(header)
-        
-        if int.from_bytes(block_hash, 'little') <= target:
-            print(f"\n🎉 SUCCESS! Nonce: {nonce} ({round(time.time()-start_t, 2)}s)")
-            found_header = header
-            break
-        nonce += 1
-        if nonce % 200000 == 0:
-            sys.stdout.write(f"\r   Checking: {nonce}...")
-            sys.stdout.flush()
-
-    # 7. Construct BLOCK STRUCTURE (High Level Breakdown)
-    block_parts = []
-    
-    # Header Section
-    block_parts.append((b'', "=== BLOCK HEADER ===", "", 0))
-    block_parts.append((found_header[:4], "Version", "Block Version", 0))
-    block_parts.append((found_header[4:36], "PrevHash", "Hash of prev block", 0))
-    block_parts.append((found_header[36:68], "MerkleRoot", "Root of all Txs", 0))
-    block_parts.append((found_header[68:72], "Time", f"Unix ({cur_time})", 0))
-    block_parts.append((found_header[72:76], "Bits", "Target Compact", 0))
-    block_parts.append((found_header[76:80], "Nonce", f"Winning ({nonce})", 0))
+    print(f"   ├── SegWit: {'Yes' if work.witness_commitment else 'No'}")
+    print(f"   └── Merkle Branch: {len(work.branch)} hashes")
 
-    # Tx Count
-    tx_count_bytes = ser_compact_size(len(tx_hashes))
-    block_parts.append((tx_count_bytes, "TxCount", f"{len(tx_hashes)} Txs", 0))
-    
-    # Coinbase Parse (Recycle bytes via parse_tx for details)
-    cb_parsed = parse_tx(binascii.hexlify(coinbase_bytes), 0)
-    cb_parsed[0] = (b'', "=== COINBASE (Tx #0) ===", "Mining Reward", 0) 
-    block_parts.extend(cb_parsed)
-    
-    # Other Txs (Raw Blobs for Normal Mode)
-    full_block = found_header + tx_count_bytes + coinbase_bytes
-    
-    for i, tx in enumerate(transactions):
-        tx_data = binascii.unhexlify(tx['data'])
-        tx_id = tx.get('txid', tx['hash'])
-        block_parts.append((b'', f"=== TX #{i+1} ===", "", 0))
-        block_parts.append((tx_data, "Tx Data", f"ID: {tx_id[:8]}...", 0))
-        full_block += tx_data
+    target = compact_to_target(work.bits)
+    print(f"\n🔨 STARTING HASHING... ({pool.size} worker{'s' if pool.size != 1 else ''})")
+
+    unit, nonce, hashes, elapsed = pool.search(work, target, interrupt)
+    STAGE_SECONDS.observe(elapsed, stage="hashing")
+
+    rate = format_hashrate(hashes / max(elapsed, 1e-6))
+    if unit is None:
+        print(f"\n⏹️  Work abandoned after {hashes} hashes ({rate}).")
+        METRICS.event("abandoned", height=work.height, hashes=hashes, seconds=round(elapsed, 3))
+        return None
+
+    template_age = time.time() - template['curtime']
+    TEMPLATE_AGE.observe(template_age)
+    METRICS.event("found", height=work.height, nonce=nonce, extranonce=unit.extranonce,
+                  hashes=hashes, seconds=round(elapsed, 3), template_age=round(template_age, 1))
+
+    print(f"\n🎉 SUCCESS! Nonce: {nonce} Extranonce: {unit.extranonce} ({round(elapsed, 2)}s, {rate})")
+    print(f"   Merkle: {binascii.hexlify(unit.header_prefix[36:68][::-1]).decode()}")
+    return work, unit, nonce
+
+def submit_block(work, unit, nonce):
+    """Prints the block layout, submits it, and returns the submitblock result."""
+    start_t = time.perf_counter()
+    transactions = work.transactions
+    found_header = unit.header_prefix + struct.pack("<I", nonce)
+    coinbase_bytes = work.coinbase(unit.extranonce)
 
-    # 8. Print Block Structure (Always)
-    print_block_breakdown(block_parts, "SERIALIZED BLOCK STRUCTURE")
+    # 1. Assemble Block
+    full_block = serialize_block(found_header, coinbase_bytes, transactions)
 
-    # 9. Print Transaction Deep Dive (Only Verbose)
+    # 2. Print Block Structure (Always), streamed straight from the block buffer
+    tx_ids = [tx.get('txid', tx['hash']) for tx in transactions]
+    tx_sizes = [len(tx['data']) // 2 for tx in transactions]
+    print_block_breakdown(iter_block_parts(full_block, tx_ids, MAX_TX, tx_sizes), "SERIALIZED BLOCK STRUCTURE", max_hex=MAX_HEX)
+
+    # 3. Print Transaction Deep Dive (Only Verbose)
     if VERBOSE and transactions:
-        tx_dive_parts = []
-        for i, tx in enumerate(transactions):
-            tx_dive_parts.extend(parse_tx(tx['data'], i+1))
-        
-        print_block_breakdown(tx_dive_parts, "TRANSACTION DEEP DIVE")
+        print_block_breakdown(iter_tx_parts(full_block, 1, MAX_TX), "TRANSACTION DEEP DIVE", max_hex=MAX_HEX)
 
-    # 10. Submit
+    # 4. Submit
     print("📡 Submitting block...")
-    hex_block = binascii.hexlify(full_block).decode()
-    res = rpc("submitblock", [hex_block])
+    try:
+        res = rpc("submitblock", [full_block.hex()])
+    except RPCError as e:
+        SUBMITS.inc(result="error")
+        METRICS.event("submit", height=work.height, result="error", reason=str(e),
+                      seconds=round(time.perf_counter() - start_t, 3))
+        raise
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start_t, stage="submit")
     
     if res is None:
         print("✅ Block Accepted!")
+        outcome = "accepted"
     elif res == "duplicate":
         print("⚠️  Block Duplicate.")
+        outcome = "duplicate"
     else:
         print(f"❌ Rejected: {res}")
+        outcome = "rejected"
+    SUBMITS.inc(result=outcome)
+    METRICS.event("submit", height=work.height, result=outcome, reason=res,
+                  seconds=round(time.perf_counter() - start_t, 3))
+    return res
+
+def mine_block(target_address=None, workers=1):
+    print("⛏️  Initializing Miner...")
+
+    template = fetch_template()
+    script_pubkey = resolve_script_pubkey(target_address)
+
+    pool = HashingPool(workers)
+    try:
+        found = mine_template(template, script_pubkey, pool)
+    finally:
+        pool.close()
+    submit_block(*found)
+
+def mine_continuous(target_address=None, workers=1):
+    """
+    Mines block after block, switching to every new template the moment
+    the long-poll returns one, so no time is spent on a stale tip.
+    """
+    print("⛏️  Initializing Miner (continuous)...")
+    script_pubkey = resolve_script_pubkey(target_address)
+    pool = HashingPool(workers)
+    stats = {"blocks": 0, "stale_avoided": 0, "refreshes": 0}
+    active = {"template": None}
+
+    def on_change(previous, template):
+        mining = active["template"]
+        if mining is None: return
+        if template['previousblockhash'] != mining['previousblockhash']:
+            # New tip: anything still hashing on the old one is doomed
+            pool.cancel()
+            stats["stale_avoided"] += 1
+        else:
+            stats["refreshes"] += 1
+
+    watcher = TemplateWatcher(on_change)
+    watcher.start()
+    try:
+        while True:
+            template = watcher.take()
+            print(f"\n📋 Template for height {template['height']} "
+                  f"(stale work avoided: {stats['stale_avoided']}, refreshes: {stats['refreshes']})")
+            active["template"] = template
+            try:
+                found = mine_template(template, script_pubkey, pool, watcher.changed)
+            finally:
+                active["template"] = None
+            if found is None: continue
+
+            try:
+                res = submit_block(*found)
+            except RPCError as e:
+                # Counted in submit_total{result="error"}; the next template gets a fresh try
+                log(f"Submit failed ({e}), continuing with the next template", "ERROR")
+                continue
+            if res is None: stats["blocks"] += 1
+            print(f"📊 Blocks: {stats['blocks']} | Stale work avoided: {stats['stale_avoided']}")
+    finally:
+        watcher.running = False
+        pool.close()
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("-a", "--address", help="Wallet address to mine to")
     parser.add_argument("-v", "--verbose", action="store_true", help="Debug logging & Block Breakdown")
+    parser.add_argument("-w", "--workers", type=int, default=1, help="Hashing processes (0 = one per CPU core)")
+    parser.add_argument("-c", "--continuous", action="store_true", help="Keep mining, long-polling for new templates")
+    parser.add_argument("--max-tx", type=int, help="Show at most this many transactions in breakdowns")
+    parser.add_argument("--max-hex", type=int, help="Truncate hex fields (scripts, witness items) to this many characters")
+    parser.add_argument("--metrics-jsonl", metavar="FILE", help="Append hashrate, stage timing and submit events as JSON lines")
+    parser.add_argument("--metrics-port", type=int, help="Serve Prometheus metrics on this port (/metrics)")
+    parser.add_argument("--log-file", metavar="FILE", help="Also write log records to FILE as JSON lines")
+    parser.add_argument("--log-sample", action="append", metavar="KIND=N", help="Keep 1 in N verbose 'rpc' trace lines (repeatable)")
+    parser.add_argument("--dump-block", metavar="FILE", help="Print the breakdown of a raw block hex file ('-' for stdin) and exit")
     args = parser.parse_args()
     
     VERBOSE = args.verbose
+    MAX_TX = args.max_tx
+    MAX_HEX = args.max_hex
+    workers = args.workers if args.workers > 0 else (os.cpu_count() or 1)
+    lablog.setup(args.log_file, level=logging.DEBUG if VERBOSE else logging.INFO,
+                 sample=lablog.parse_sample(args.log_sample), console_format="[%(levelname)s] %(message)s")
     
+    if args.dump_block:
+        with (sys.stdin if args.dump_block == "-" else open(args.dump_block)) as f:
+            dump_block(f.read())
+        sys.exit(0)
+
+    if args.metrics_jsonl: METRICS.add_jsonl(args.metrics_jsonl)
+    if args.metrics_port: labmetrics.serve_metrics(METRICS, args.metrics_port)
+
     try:
-        mine_block(args.address)
+        if args.continuous:
+            mine_continuous(args.address, workers)
+        else:
+            mine_block(args.address, workers)
     except KeyboardInterrupt:
-        print("\n🛑 Stopped.")
\ No newline at end of file
+        print("\n🛑 Stopped.")
+    finally:
+        METRICS.close()
+        lablog.shutdown()
\ No newline at end of file
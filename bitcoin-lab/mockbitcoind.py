@@ -0,0 +1,628 @@
+#!/usr/bin/env python3
+import argparse
+import base64
+import hashlib
+import json
+import os
+import random
+import socket
+import struct
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from addresses import BECH32_CHARSET, decode_address, encode_segwit_address
+
+"""
+A fake bitcoind for offline testing and load generation.
+
+Serves the JSON-RPC subset that miner.py, agent.py and pacer.py use over
+keep-alive HTTP with .cookie auth, backed by a tiny in-memory regtest-like
+chain (real PoW check on submitblock, long-polling getblocktemplate, wallets
+with per-coin UTXOs and the mempool chain limit). Latency and failures can be
+injected per method.
+
+    python3 mockbitcoind.py --port 18443 --datadir /tmp/mock --latency 0.02 --fail-rate 0.05
+    BITCOIN_RPC_PORT=18443 BITCOIN_DATADIR=/tmp/mock python3 miner.py
+"""
+
+DEFAULT_PORT = 18443
+DEFAULT_BITS = "207fffff"
+BLOCK_REWARD = 50 * 10**8
+LONGPOLL_TIMEOUT = 60
+COIN = 10**8
+COINBASE_MATURITY = 10  # as in custom-genesis.patch
+TX_FEE = 1000
+KEYPOOL_SIZE = 1000  # derived addresses the wallet watches past the last one handed out
+UNCONFIRMED_ERROR = ("Insufficient funds. Unconfirmed UTXOs are available, but spending them creates "
+                     "a chain of transactions that will be rejected by the mempool")
+
+# Methods that need a wallet (bitcoind answers -19 on "/" unless exactly one is loaded)
+WALLET_METHODS = {"getbalance", "sendmany", "send", "getnewaddress", "getaddressinfo",
+                  "listunspent", "listsinceblock", "listdescriptors", "keypoolrefill"}
+
+
+def sha256d(data):
+    return hashlib.sha256(hashlib.sha256(data).digest()).digest()
+
+def compact_to_target(bits):
+    exponent = bits >> 24
+    mantissa = bits & 0xffffff
+    if exponent <= 3: return mantissa >> (8 * (3 - exponent))
+    return mantissa << (8 * (exponent - 3))
+
+def ser_compact_size(n):
+    if n < 253: return struct.pack("B", n)
+    if n < 0x10000: return struct.pack("<BH", 253, n)
+    if n < 0x100000000: return struct.pack("<BI", 254, n)
+    return struct.pack("<BQ", 255, n)
+
+
+class MockRPCError(Exception):
+    def __init__(self, code, message, status=500):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+        self.status = status
+
+
+def desc_checksum(desc):
+    """Stand-in for the BIP 380 descriptor checksum (8 chars, stable per descriptor)."""
+    return "".join(BECH32_CHARSET[b & 31] for b in hashlib.sha256(desc.encode()).digest()[:8])
+
+def derive_address(desc, index):
+    return encode_segwit_address("bcrt", 0, hashlib.sha256(f"{desc}/{index}".encode()).digest()[:20])
+
+
+class Wallet:
+    """
+    Addresses, unspent coins and a receive history for listsinceblock.
+    Receive addresses come from one ranged (fake) wpkh descriptor, so
+    getnewaddress and deriveaddresses agree; the wallet only recognises
+    indexes below range_end, like bitcoind's keypool.
+    """
+    def __init__(self, name, rng):
+        self.name = name
+        self.rng = rng
+        self.descriptor = f"wpkh(tpubMock{rng.randbytes(16).hex()}/0/*)"
+        self.next_index = 0
+        self.range_end = KEYPOOL_SIZE
+        self.addresses = set()
+        self.coins = {}    # (txid, vout) -> {"amount", "address", "height", "coinbase", "change"}
+        self.history = []  # the same dicts, plus txid/vout, in arrival order
+
+    def derive(self, start, end):
+        """Addresses for indexes start..end (inclusive); the watched ones become ours."""
+        addresses = [derive_address(self.descriptor, i) for i in range(start, end + 1)]
+        self.addresses.update(addresses[:max(0, self.range_end - start)])
+        return addresses
+
+    def new_address(self):
+        address = self.derive(self.next_index, self.next_index)[0]
+        self.next_index += 1
+        self.range_end = max(self.range_end, self.next_index + KEYPOOL_SIZE)
+        return address
+
+    def mature(self, coin, tip_height):
+        # Like bitcoind's wallet, one block later than consensus would allow
+        if not coin["coinbase"]: return True
+        return coin["height"] is not None and tip_height - coin["height"] + 1 > COINBASE_MATURITY
+
+    def balance(self, tip_height):
+        return sum(c["amount"] for c in self.coins.values() if self.mature(c, tip_height))
+
+
+class MockNode:
+    """In-memory chain, mempool and wallets behind the RPC methods."""
+    def __init__(self, bits=DEFAULT_BITS, seed=None, peers=(), longpoll_timeout=LONGPOLL_TIMEOUT, publisher=None):
+        self.rng = random.Random(seed)
+        self.publisher = publisher  # zmqnotify.StandInPublisher, if --zmq-port was given
+        self.bits = bits
+        self.longpoll_timeout = longpoll_timeout
+        self.peers = list(peers)
+        self.cond = threading.Condition()
+        self.mempool = []  # template-shaped tx dicts
+        self.mempool_seq = 0
+        self.wallets = {}
+        genesis = {"hash": self.rng.randbytes(32).hex(), "height": 0, "time": int(time.time()),
+                   "previousblockhash": None, "nTx": 1}
+        self.blocks = [genesis]
+        self.by_hash = {genesis["hash"]: genesis}
+
+    @property
+    def tip(self):
+        return self.blocks[-1]
+
+    def longpollid(self):
+        return f"{self.tip['hash']}{self.mempool_seq}"
+
+    def connect(self, block_hash, block_time, n_tx=1):
+        """Appends a block to the tip and wakes long-pollers (caller holds cond)."""
+        block = {"hash": block_hash, "height": self.tip["height"] + 1, "time": block_time,
+                 "previousblockhash": self.tip["hash"], "nTx": n_tx}
+        self.blocks.append(block)
+        self.by_hash[block_hash] = block
+        for wallet in self.wallets.values():
+            for entry in wallet.history:
+                if entry["height"] is None: entry["height"] = block["height"]
+        if self.publisher:
+            # bitcoind announces a connected block's transactions, then the block
+            for tx in self.mempool: self.publisher.rawtx(bytes.fromhex(tx["data"]))
+            self.publisher.hashblock(block_hash)
+        self.mempool = []
+        self.mempool_seq += 1
+        self.cond.notify_all()
+        return block
+
+    def fake_tx(self, amounts):
+        """A structurally valid (unsigned) one-input segwit transaction paying {address: sats}."""
+        outputs = b''
+        for address, amount in amounts.items():
+            _, script = decode_address(address)
+            outputs += struct.pack("<Q", amount) + ser_compact_size(len(script)) + script
+        body = (struct.pack("<I", 2) + b'\x01' + self.rng.randbytes(32) + struct.pack("<I", 0) + b'\x00' +
+                b'\xfd\xff\xff\xff' + ser_compact_size(len(amounts)) + outputs)
+        witness = b'\x01\x40' + self.rng.randbytes(64)
+        legacy = body + struct.pack("<I", 0)
+        full = body[:4] + b'\x00\x01' + body[4:] + witness + struct.pack("<I", 0)
+        return {
+            "data": full.hex(),
+            "txid": sha256d(legacy)[::-1].hex(),
+            "hash": sha256d(full)[::-1].hex(),
+            "fee": 1000,
+            "weight": len(legacy) * 3 + len(full),
+        }
+
+    def wallet(self, name, create=False):
+        if name is None:
+            if len(self.wallets) != 1:
+                raise MockRPCError(-19, "Wallet file not specified (must request wallet RPC through /wallet/<filename> uri-path).")
+            return next(iter(self.wallets.values()))
+        if name not in self.wallets:
+            if not create: raise MockRPCError(-18, f"Requested wallet does not exist or is not loaded: {name}")
+            self.wallets[name] = Wallet(name, self.rng)
+        return self.wallets[name]
+
+    def owner(self, address):
+        for wallet in self.wallets.values():
+            if address in wallet.addresses: return wallet
+        return None
+
+    def credit(self, txid, vout, address, sats, height=None, coinbase=False, change=False):
+        wallet = self.owner(address)
+        if wallet is None: return
+        coin = {"txid": txid, "vout": vout, "amount": sats, "address": address,
+                "height": height, "coinbase": coinbase, "change": change}
+        wallet.coins[(txid, vout)] = coin
+        wallet.history.append(coin)
+
+    def spend(self, wallet, sats, inputs=None):
+        """Builds, 'broadcasts' and credits a wallet payment (caller holds cond)."""
+        need = sum(sats.values()) + TX_FEE
+        tip_height = self.tip["height"]
+        if inputs is not None:
+            chosen = []
+            for outpoint in inputs:
+                coin = wallet.coins.get((outpoint["txid"], outpoint["vout"]))
+                if coin is None or not wallet.mature(coin, tip_height):
+                    raise MockRPCError(-8, "Input not found or already spent")
+                chosen.append(coin)
+            if sum(c["amount"] for c in chosen) < need:
+                raise MockRPCError(-4, "Insufficient funds")
+        else:
+            # Like bitcoind under its mempool chain limit: confirmed coins only
+            confirmed = sorted((c for c in wallet.coins.values()
+                                if c["height"] is not None and wallet.mature(c, tip_height)),
+                               key=lambda c: -c["amount"])
+            chosen, total = [], 0
+            for coin in confirmed:
+                if total >= need: break
+                chosen.append(coin)
+                total += coin["amount"]
+            if total < need:
+                if wallet.balance(tip_height) >= need: raise MockRPCError(-6, UNCONFIRMED_ERROR)
+                raise MockRPCError(-6, "Insufficient funds")
+
+        change = sum(c["amount"] for c in chosen) - need
+        outputs = dict(sats)
+        change_address = None
+        if change > 0:
+            change_address = wallet.new_address()
+            outputs[change_address] = change
+        try:
+            tx = self.fake_tx(outputs)
+        except ValueError:
+            raise MockRPCError(-5, "Invalid Bitcoin address") from None
+        for coin in chosen:
+            del wallet.coins[(coin["txid"], coin["vout"])]
+        for vout, (address, amount) in enumerate(outputs.items()):
+            self.credit(tx["txid"], vout, address, amount, change=address == change_address)
+        self.mempool.append(tx)
+        self.mempool_seq += 1
+        if self.publisher: self.publisher.rawtx(bytes.fromhex(tx["data"]))
+        self.cond.notify_all()
+        return tx["txid"]
+
+    def dispatch(self, method, params, wallet_name):
+        handler = getattr(self, f"rpc_{method}", None)
+        if handler is None:
+            raise MockRPCError(-32601, "Method not found", status=404)
+        if method in WALLET_METHODS:
+            with self.cond:
+                wallet = self.wallet(wallet_name)
+            return handler(wallet, *params)
+        return handler(*params)
+
+    # --- MINING ---
+    def rpc_getblocktemplate(self, request=None):
+        longpollid = (request or {}).get("longpollid")
+        with self.cond:
+            if longpollid:
+                self.cond.wait_for(lambda: self.longpollid() != longpollid, self.longpoll_timeout)
+            tip = self.tip
+            return {
+                "version": 0x20000000,
+                "rules": ["csv", "!segwit", "taproot"],
+                "previousblockhash": tip["hash"],
+                "transactions": list(self.mempool),
+                "coinbasevalue": BLOCK_REWARD + sum(tx["fee"] for tx in self.mempool),
+                "longpollid": self.longpollid(),
+                "target": f"{compact_to_target(int(self.bits, 16)):064x}",
+                "mintime": tip["time"] + 1,
+                "curtime": max(int(time.time()), tip["time"] + 1),
+                "bits": self.bits,
+                "height": tip["height"] + 1,
+                "default_witness_commitment": "6a24aa21a9ed" + "00" * 32,
+            }
+
+    def rpc_submitblock(self, block_hex, *_):
+        try:
+            header = bytes.fromhex(block_hex[:160])
+        except ValueError:
+            raise MockRPCError(-22, "Block decode failed") from None
+        if len(header) < 80: raise MockRPCError(-22, "Block decode failed")
+        block_hash = sha256d(header)
+        bits, = struct.unpack_from("<I", header, 72)
+        block_time, = struct.unpack_from("<I", header, 68)
+        with self.cond:
+            if block_hash[::-1].hex() in self.by_hash: return "duplicate"
+            if header[4:36][::-1].hex() != self.tip["hash"]: return "inconclusive"
+            if bits != int(self.bits, 16): return "bad-diffbits"
+            if int.from_bytes(block_hash, "little") > compact_to_target(bits): return "high-hash"
+            self.connect(block_hash[::-1].hex(), block_time, len(self.mempool) + 1)
+        return None
+
+    def rpc_generatetoaddress(self, nblocks, address, *_):
+        hashes = []
+        with self.cond:
+            for _ in range(nblocks):
+                block = self.connect(self.rng.randbytes(32).hex(), max(int(time.time()), self.tip["time"] + 1))
+                hashes.append(block["hash"])
+                self.credit(self.rng.randbytes(32).hex(), 0, address, BLOCK_REWARD, block["height"], coinbase=True)
+        return hashes
+
+    def rpc_waitfornewblock(self, timeout=0, current_tip=None):
+        with self.cond:
+            start_hash = current_tip or self.tip["hash"]
+            self.cond.wait_for(lambda: self.tip["hash"] != start_hash, timeout / 1000 if timeout else None)
+            return {"hash": self.tip["hash"], "height": self.tip["height"]}
+
+    # --- CHAIN ---
+    def rpc_getblockchaininfo(self):
+        with self.cond:
+            tip = self.tip
+            return {"chain": "regtest", "blocks": tip["height"], "headers": tip["height"],
+                    "bestblockhash": tip["hash"], "time": tip["time"], "mediantime": tip["time"],
+                    "verificationprogress": 1.0, "initialblockdownload": False}
+
+    def rpc_getblock(self, block_hash, verbosity=1):
+        with self.cond:
+            block = self.by_hash.get(block_hash)
+            if block is None: raise MockRPCError(-5, "Block not found")
+            return dict(block, confirmations=self.tip["height"] - block["height"] + 1)
+
+    def rpc_getblockheader(self, block_hash, verbose=True):
+        return self.rpc_getblock(block_hash)  # mock blocks carry header fields only
+
+    def rpc_getmempoolinfo(self):
+        with self.cond:
+            return {"loaded": True, "size": len(self.mempool),
+                    "bytes": sum(len(tx["data"]) // 2 for tx in self.mempool)}
+
+    def rpc_getpeerinfo(self):
+        return [{"id": i, "addr": addr, "inbound": False} for i, addr in enumerate(self.peers)]
+
+    def rpc_getzmqnotifications(self):
+        if not self.publisher: return []
+        return [{"type": kind, "address": self.publisher.endpoint, "hwm": 1000}
+                for kind in ("pubhashblock", "pubrawtx")]
+
+    # --- WALLET ---
+    def rpc_listwallets(self):
+        with self.cond:
+            return list(self.wallets)
+
+    def rpc_createwallet(self, name, *_):
+        with self.cond:
+            if name in self.wallets:
+                raise MockRPCError(-4, f"Wallet file verification failed. Failed to create database path '{name}'. Database already exists.")
+            self.wallet(name, create=True)
+        return {"name": name}
+
+    def rpc_getnewaddress(self, wallet, *_):
+        with self.cond:
+            return wallet.new_address()
+
+    def rpc_getbalance(self, wallet, *_):
+        with self.cond:
+            return wallet.balance(self.tip["height"]) / COIN
+
+    def rpc_sendmany(self, wallet, _dummy, amounts, *_):
+        with self.cond:
+            return self.spend(wallet, {address: int(round(float(v) * COIN)) for address, v in amounts.items()})
+
+    def rpc_send(self, wallet, outputs, conf_target=None, estimate_mode=None, fee_rate=None, options=None):
+        if isinstance(outputs, list):
+            outputs = {k: v for item in outputs for k, v in item.items()}
+        options = options or {}
+        inputs = options.get("inputs")
+        if inputs is not None and options.get("add_inputs", False):
+            inputs = None
+        with self.cond:
+            txid = self.spend(wallet, {address: int(round(float(v) * COIN)) for address, v in outputs.items()}, inputs)
+        return {"txid": txid, "complete": True}
+
+    def coin_json(self, coin, wallet):
+        confirmations = 0 if coin["height"] is None else self.tip["height"] - coin["height"] + 1
+        return {"txid": coin["txid"], "vout": coin["vout"], "address": coin["address"],
+                "amount": coin["amount"] / COIN, "confirmations": confirmations,
+                "spendable": True, "solvable": True, "safe": confirmations > 0 or coin["change"]}
+
+    def rpc_listunspent(self, wallet, minconf=1, maxconf=9999999, *_):
+        with self.cond:
+            coins = [self.coin_json(c, wallet) for c in wallet.coins.values()
+                     if wallet.mature(c, self.tip["height"])]
+        return [c for c in coins if minconf <= c["confirmations"] <= maxconf]
+
+    def rpc_listsinceblock(self, wallet, blockhash="", target_confirmations=1, include_watchonly=False,
+                           include_removed=True, include_change=False, *_):
+        with self.cond:
+            since = self.by_hash[blockhash]["height"] if blockhash in self.by_hash else -1
+            transactions = []
+            for coin in wallet.history:
+                if coin["height"] is not None and coin["height"] <= since: continue
+                if coin["change"] and not include_change: continue
+                entry = self.coin_json(coin, wallet)
+                if coin["coinbase"]:
+                    entry["category"] = "generate" if wallet.mature(coin, self.tip["height"]) else "immature"
+                else:
+                    entry["category"] = "receive"
+                if coin["height"] is not None:
+                    entry["blockheight"] = coin["height"]
+                    entry["blockhash"] = self.blocks[coin["height"]]["hash"]
+                transactions.append(entry)
+            return {"transactions": transactions, "removed": [], "lastblock": self.tip["hash"]}
+
+    def rpc_listdescriptors(self, wallet, private=False):
+        with self.cond:
+            return {"wallet_name": wallet.name, "descriptors": [
+                {"desc": f"{wallet.descriptor}#{desc_checksum(wallet.descriptor)}", "timestamp": self.blocks[0]["time"],
+                 "active": True, "internal": False, "range": [0, wallet.range_end - 1],
+                 "next": wallet.next_index, "next_index": wallet.next_index},
+            ]}
+
+    def rpc_keypoolrefill(self, wallet, newsize=KEYPOOL_SIZE):
+        with self.cond:
+            wallet.range_end = max(wallet.range_end, wallet.next_index + int(newsize))
+
+    def rpc_getdescriptorinfo(self, descriptor):
+        desc = descriptor.split("#")[0]
+        return {"descriptor": f"{desc}#{desc_checksum(desc)}", "checksum": desc_checksum(desc),
+                "isrange": "*" in desc, "issolvable": True, "hasprivatekeys": False}
+
+    def rpc_deriveaddresses(self, descriptor, derive_range=None):
+        desc, _, checksum = descriptor.partition("#")
+        if not checksum: raise MockRPCError(-5, "Missing checksum")
+        if checksum != desc_checksum(desc): raise MockRPCError(-5, "Provided checksum does not match computed checksum")
+        if derive_range is None: raise MockRPCError(-8, "Range should be specified for a ranged descriptor")
+        start, end = (0, derive_range) if isinstance(derive_range, int) else derive_range
+        with self.cond:
+            for wallet in self.wallets.values():
+                if wallet.descriptor == desc: return wallet.derive(start, end)
+        return [derive_address(desc, i) for i in range(start, end + 1)]
+
+    def rpc_validateaddress(self, address):
+        try:
+            _, script = decode_address(address)
+        except ValueError:
+            return {"isvalid": False}
+        return {"isvalid": True, "address": address, "scriptPubKey": script.hex()}
+
+    def rpc_getaddressinfo(self, wallet, address):
+        info = self.rpc_validateaddress(address)
+        if not info["isvalid"]: raise MockRPCError(-5, "Invalid address")
+        return dict(info, ismine=address in wallet.addresses)
+
+
+class MockBitcoind(ThreadingHTTPServer):
+    """
+    HTTP front end for a MockNode.
+    latency: base seconds added to every call (plus up to `jitter` more),
+    method_latency: {method: seconds} overrides, fail_rate: share of calls
+    answered with an RPC error, drop_rate: share of requests whose
+    connection is closed without a reply.
+    """
+    daemon_threads = True
+
+    def __init__(self, node=None, host="127.0.0.1", port=0, datadir=None, latency=0.0, jitter=0.0,
+                 method_latency=None, fail_rate=0.0, drop_rate=0.0, seed=None):
+        super().__init__((host, port), MockHandler)
+        self.node = node or MockNode(seed=seed)
+        self.latency = latency
+        self.jitter = jitter
+        self.method_latency = method_latency or {}
+        self.fail_rate = fail_rate
+        self.drop_rate = drop_rate
+        self.fault_rng = random.Random(seed)
+        self.stats = {"requests": 0, "calls": 0, "failed": 0, "dropped": 0}
+        self.lock = threading.Lock()
+        self.cookie = f"__cookie__:{os.urandom(32).hex()}"
+        self.datadir = datadir
+        if datadir:
+            os.makedirs(datadir, exist_ok=True)
+            with open(os.path.join(datadir, ".cookie"), "w") as f:
+                f.write(self.cookie)
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        if self.datadir:
+            try:
+                os.remove(os.path.join(self.datadir, ".cookie"))
+            except OSError:
+                pass
+
+    def roll(self, rate):
+        with self.lock:
+            return rate > 0 and self.fault_rng.random() < rate
+
+    def delay(self, method):
+        base = self.method_latency.get(method, self.latency)
+        with self.lock:
+            extra = self.fault_rng.uniform(0, self.jitter) if self.jitter else 0
+        if base + extra > 0: time.sleep(base + extra)
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        # Headers and body go out in separate writes; without this, Nagle plus
+        # the client's delayed ACK adds ~40ms to every keep-alive call
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def log_message(self, *args):
+        pass
+
+    def reply(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        server = self.server
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length)
+        expected = "Basic " + base64.b64encode(server.cookie.encode()).decode()
+        if self.headers.get("Authorization") != expected:
+            self.send_response(401)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        with server.lock:
+            server.stats["requests"] += 1
+        if server.roll(server.drop_rate):
+            with server.lock:
+                server.stats["dropped"] += 1
+            self.close_connection = True
+            return
+
+        try:
+            request = json.loads(body)
+        except ValueError:
+            self.reply(500, {"result": None, "id": None, "error": {"code": -32700, "message": "Parse error"}})
+            return
+
+        wallet = self.path[len("/wallet/"):] if self.path.startswith("/wallet/") else None
+        if isinstance(request, list):
+            # bitcoind answers a batch with 200 and per-call errors
+            self.reply(200, [self.answer(r, wallet)[1] for r in request])
+        else:
+            self.reply(*self.answer(request, wallet))
+
+    def answer(self, request, wallet):
+        server = self.server
+        method = request.get("method")
+        request_id = request.get("id")
+        with server.lock:
+            server.stats["calls"] += 1
+        server.delay(method)
+        if server.roll(server.fail_rate):
+            with server.lock:
+                server.stats["failed"] += 1
+            return 500, {"result": None, "id": request_id, "error": {"code": -1, "message": f"Injected failure ({method})"}}
+        try:
+            result = server.node.dispatch(method, request.get("params") or [], wallet)
+        except MockRPCError as e:
+            return e.status, {"result": None, "id": request_id, "error": {"code": e.code, "message": e.message}}
+        except TypeError as e:
+            return 500, {"result": None, "id": request_id, "error": {"code": -1, "message": f"Bad params: {e}"}}
+        return 200, {"result": result, "error": None, "id": request_id}
+
+
+def parse_method_latency(values):
+    out = {}
+    for item in values or []:
+        method, _, seconds = item.partition("=")
+        out[method] = float(seconds)
+    return out
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake bitcoind JSON-RPC server for offline testing")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--datadir", default=os.path.expanduser("~/.bitcoin-mock"), help="Where the .cookie is written")
+    parser.add_argument("--bits", default=DEFAULT_BITS, help="Compact target served in templates (hex)")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every call")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Up to this many extra random seconds per call")
+    parser.add_argument("--method-latency", action="append", metavar="METHOD=SECONDS", help="Per-method latency (repeatable)")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Share of calls answered with an RPC error")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="Share of requests closed without a reply")
+    parser.add_argument("--block-interval", type=float, default=0, help="Generate a block every N seconds (0 = never)")
+    parser.add_argument("--wallet", action="append", default=[], help="Create this wallet at startup (repeatable)")
+    parser.add_argument("--peer", action="append", default=[], help="Address reported by getpeerinfo (repeatable)")
+    parser.add_argument("--seed", type=int, help="Seed for chain data and fault injection")
+    parser.add_argument("--zmq-port", type=int, help="Publish hashblock/rawtx on tcp://host:PORT (needs pyzmq)")
+    args = parser.parse_args()
+
+    publisher = None
+    if args.zmq_port:
+        import zmqnotify
+        publisher = zmqnotify.StandInPublisher(f"tcp://{args.host}:{args.zmq_port}")
+    node = MockNode(bits=args.bits, seed=args.seed, peers=args.peer, publisher=publisher)
+    for name in args.wallet:
+        node.wallet(name, create=True)
+    server = MockBitcoind(node, args.host, args.port, args.datadir, args.latency, args.jitter,
+                          parse_method_latency(args.method_latency), args.fail_rate, args.drop_rate, args.seed)
+    print(f"mock bitcoind on {args.host}:{server.port} (cookie in {args.datadir})")
+    print(f"  export BITCOIN_RPC_HOST={args.host} BITCOIN_RPC_PORT={server.port} BITCOIN_DATADIR={args.datadir}")
+    if publisher: print(f"  zmq notifications on {publisher.endpoint}")
+    server.start()
+    try:
+        while True:
+            time.sleep(args.block_interval or 60)
+            if args.block_interval:
+                node.rpc_generatetoaddress(1, "")
+            stats = server.stats
+            print(f"height {node.tip['height']} | requests {stats['requests']} calls {stats['calls']} "
+                  f"failed {stats['failed']} dropped {stats['dropped']}")
+    except KeyboardInterrupt:
+        print("\nStopped.")
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
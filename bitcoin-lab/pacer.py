@@ -1,12 +1,13 @@
 #!/usr/bin/env python3
 import time
-import subprocess
 import json
 import argparse
 import logging
-import sys
 from datetime import datetime
 
+import lablog
+from rpcclient import RPCClient
+
 """
 Bitcoin Lab Pacer (Heartbeat) - v2 Fixed
 Ensures the blockchain never freezes by mining a block if no activity 
@@ -22,38 +23,21 @@ class BitcoinPacer:
     def __init__(self, interval_minutes, wallet_name, log_path):
         self.interval_seconds = interval_minutes * 60
         self.wallet_name = wallet_name
-        self.rpc_cmd = ["bitcoin-cli", f"-rpcwallet={self.wallet_name}"]
+        self.rpc_client = RPCClient(wallet=self.wallet_name, timeout=60)
         
-        # Setup Logging
-        logging.basicConfig(
-            level=logging.INFO,
-            format='%(asctime)s [%(levelname)s] %(message)s',
-            datefmt='%Y-%m-%d %H:%M:%S',
-            handlers=[
-                logging.FileHandler(log_path),
-                logging.StreamHandler(sys.stdout)
-            ]
-        )
+        # Setup Logging (queued; JSON lines to log_path, text to stdout)
+        lablog.setup(log_path, datefmt='%Y-%m-%d %H:%M:%S')
         self.logger = logging.getLogger("Pacer")
         
         self.ensure_wallet()
         self.last_block_time = time.time()
         self.last_height = 0
+        self.last_hash = None
 
-    def rpc(self, method, params=None):
+    def rpc(self, method, params=None, timeout=None):
         if params is None: params = []
-        cmd = self.rpc_cmd + [method] + [str(p) for p in params]
         try:
-            result = subprocess.check_output(cmd, stderr=subprocess.PIPE, timeout=60)
-            result_str = result.decode('utf-8').strip()
-            
-            # [FIX] Try JSON first, fallback to raw string if that fails
-            # (Necessary because 'getnewaddress' returns a plain string, not JSON)
-            try:
-                return json.loads(result_str)
-            except json.JSONDecodeError:
-                return result_str
-                
+            return self.rpc_client.call(method, params, timeout=timeout)
         except Exception as e:
             self.logger.error(f"RPC Error ({method}): {e}")
             return None
@@ -67,9 +51,7 @@ class BitcoinPacer:
         if self.wallet_name not in wallets:
             self.logger.info(f"Creating pacer wallet: {self.wallet_name}")
             try:
-                # We use subprocess directly here to ignore the output
-                subprocess.run(["bitcoin-cli", "createwallet", self.wallet_name], 
-                             stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+                self.rpc_client.call_global("createwallet", [self.wallet_name])
             except Exception as e:
                 # If it fails, it might already exist but not be loaded, which is fine
                 self.logger.warning(f"Wallet creation skipped (might already exist): {e}")
@@ -87,48 +69,87 @@ class BitcoinPacer:
                 return
 
             # Mine 1 block
-            self.rpc("generatetoaddress", [1, addr])
-            self.logger.info("✅ Block mined successfully.")
+            hashes = self.rpc("generatetoaddress", [1, addr])
+            if hashes:
+                self.record_block(hashes[-1], self.last_height + 1, self.block_time(hashes[-1]))
+                self.logger.info("✅ Block mined successfully.")
         except Exception as e:
             self.logger.error(f"Mining failed: {e}")
 
+    def block_time(self, block_hash):
+        """Header time of a block, or None if the node can't say."""
+        header = self.rpc("getblockheader", [block_hash])
+        return header.get('time') if header else None
+
+    def record_block(self, block_hash, height, block_time=None):
+        """
+        Remembers the tip so the scheduler never has to re-fetch it. The
+        countdown runs from the block's header time (capped at now, as miners
+        may stamp blocks up to 2h ahead), falling back to local arrival.
+        """
+        self.last_hash = block_hash
+        self.last_height = height
+        self.last_block_time = min(block_time, time.time()) if block_time is not None else time.time()
+
+    def refresh_tip(self):
+        """Loads the current tip once at startup (or after RPC trouble)."""
+        info = self.get_blockchain_info()
+        if not info: return False
+
+        # getblockchaininfo carries the tip time since v23; getblock covers older nodes
+        block_data = info if 'time' in info else self.rpc("getblock", [info.get('bestblockhash', "")])
+        if not block_data: return False
+        self.record_block(info.get('bestblockhash'), info.get('blocks', 0), block_data.get('time', time.time()))
+        return True
+
     def run(self):
         self.logger.info(f"Starting Pacer. Interval: {self.interval_seconds/60} minutes.")
         
+        while not self.refresh_tip():
+            time.sleep(10)
+        
         while True:
             try:
-                info = self.get_blockchain_info()
-                if not info:
+                time_since_last = time.time() - self.last_block_time
+                remaining = self.interval_seconds - time_since_last
+
+                # TRIGGER CONDITION:
+                if remaining <= 0:
+                    self.logger.warning(f"Staleness detected ({int(time_since_last)}s > {self.interval_seconds}s).")
+                    self.mine_block()
+                    if time.time() - self.last_block_time >= self.interval_seconds:
+                        # Mining failed; don't hammer the node
+                        time.sleep(10)
+                    continue
+
+                # waitfornewblock treats a 0 ms timeout as "forever"; finish short waits locally
+                if remaining < 1:
+                    time.sleep(remaining)
+                    continue
+
+                self.logger.info(f"Height: {self.last_height} | Last Block: {int(time_since_last/60)} min ago")
+
+                # Sleep inside bitcoind until a block arrives or the interval runs out
+                # (passing the known tip means a block found between calls is not missed)
+                params = [int(remaining * 1000)]
+                if self.last_hash: params.append(self.last_hash)
+                tip = self.rpc("waitfornewblock", params, timeout=remaining + 30)
+                if not tip:
                     time.sleep(10)
+                    self.refresh_tip()
                     continue
 
-                current_height = info.get('blocks', 0)
-                best_block_hash = info.get('bestblockhash', "")
-                
-                # Get the timestamp of the last block
-                block_data = self.rpc("getblock", [best_block_hash])
-                if block_data:
-                    last_block_timestamp = block_data.get('time', time.time())
-                    time_since_last = time.time() - last_block_timestamp
-                    
-                    self.logger.info(f"Height: {current_height} | Last Block: {int(time_since_last/60)} min ago")
-
-                    # TRIGGER CONDITION:
-                    if time_since_last > self.interval_seconds:
-                        self.logger.warning(f"Staleness detected ({int(time_since_last)}s > {self.interval_seconds}s).")
-                        self.mine_block()
-                    else:
-                        # Chain is healthy, do nothing
-                        pass
+                if tip.get('hash') != self.last_hash:
+                    # Chain is healthy: restart the countdown from this block
+                    self.record_block(tip['hash'], tip.get('height', self.last_height + 1), self.block_time(tip['hash']))
+                    self.logger.info(f"New block at height {self.last_height}.")
 
             except KeyboardInterrupt:
                 self.logger.info("Stopping Pacer.")
                 break
             except Exception as e:
                 self.logger.error(f"Loop error: {e}")
-
-            # Check every 60 seconds
-            time.sleep(60)
+                time.sleep(10)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Bitcoin Lab Pacer")
@@ -1,4 +1,7 @@
+import argparse
 import hashlib
+import multiprocessing
+import os
 import struct
 import binascii
 import time
@@ -13,6 +16,20 @@ nTime = int(time.time())
 nBits = 0x207fffff  # The "Easy" Limit
 initial_reward = 50 * 100000000
 
+# The patched CreateGenesisBlock() only pushes nBits into the scriptSig for
+# 0x207fffff; any other nBits keeps Satoshi's 486604799 (0x1d00ffff)
+PATCHED_BITS = 0x207fffff
+LEGACY_SCRIPT_BITS = 486604799
+
+# --- SEARCH SPACE ---
+# The nonce x nTime space is cut into chunks: chunk j covers
+# nTime = start + j // CHUNKS_PER_TIME, nonces (j % CHUNKS_PER_TIME) * CHUNK_NONCES onward.
+# Worker i takes chunks i, i + workers, i + 2*workers, ...
+CHUNK_NONCES = 1 << 20
+CHUNKS_PER_TIME = (1 << 32) // CHUNK_NONCES
+SCAN_BATCH = 1 << 16  # nonces between checks for an earlier winner
+NO_WINNER = (1 << 64) - 1
+
 def sha256d(data):
     return hashlib.sha256(hashlib.sha256(data).digest()).digest()
 
@@ -50,7 +67,8 @@ def create_merkle_root():
     # Push nBits (4 bytes)
     # Since 0x207fffff takes 4 bytes, it is pushed as: [04] [ff ff 7f 20]
     # Note: Bitcoin serializes integer nBits little-endian.
-    nbits_bytes = struct.pack("<I", nBits) 
+    script_bits = nBits if nBits == PATCHED_BITS else LEGACY_SCRIPT_BITS
+    nbits_bytes = struct.pack("<I", script_bits)
     script_p1 = b'\x04' + nbits_bytes
     
     # Push 4 (CScriptNum(4))
@@ -84,7 +102,75 @@ def create_merkle_root():
     # Merkle root is just sha256d of the single coinbase tx
     return sha256d(tx)
 
-def mine():
+def scan_nonces(header_prefix, target, start, end, midstate=None):
+    # The first 64 bytes of the header (version, prev hash, most of the merkle
+    # root) are constant, so hash them once and copy that SHA-256 state for
+    # every attempt. Only the last 16 bytes (merkle tail, time, bits, nonce)
+    # are fed per nonce, written in place into one preallocated buffer.
+    # Those 64 bytes don't include nTime either, so callers rolling the time
+    # can pass the same midstate for every nTime.
+    header = bytearray(80)
+    header[:76] = header_prefix
+    if midstate is None:
+        midstate = hashlib.sha256(header_prefix[:64])
+    tail = memoryview(header)[64:]
+    for nonce in range(start, end):
+        struct.pack_into("<I", header, 76, nonce)
+        h = midstate.copy()
+        h.update(tail)
+        block_hash = hashlib.sha256(h.digest()).digest()
+
+        # Compare as integer (little endian for PoW check)
+        if int.from_bytes(block_hash, 'little') <= target:
+            return nonce, block_hash
+    return None, None
+
+def chunk_range(chunk, start_time):
+    """(nTime, first nonce, end nonce) covered by a chunk index."""
+    time_offset, index = divmod(chunk, CHUNKS_PER_TIME)
+    first = index * CHUNK_NONCES
+    return start_time + time_offset, first, first + CHUNK_NONCES
+
+def search_worker(index, workers, header_base, target, start_time, winner, lock, hashes, results):
+    """
+    Scans chunks index, index + workers, ... until every chunk it could still
+    win with comes after the earliest winner found so far, so the parallel
+    search returns the same (nTime, nonce) as a sequential one would.
+    """
+    midstate = hashlib.sha256(header_base[:64])
+    chunk = index
+    try:
+        while chunk < winner.value:
+            chunk_time, nonce, end = chunk_range(chunk, start_time)
+            header_prefix = header_base[:68] + struct.pack("<I", chunk_time) + header_base[72:76]
+            while nonce < end and chunk < winner.value:
+                stop = min(nonce + SCAN_BATCH, end)
+                found, block_hash = scan_nonces(header_prefix, target, nonce, stop, midstate)
+                if found is not None:
+                    hashes[index] += found - nonce + 1
+                    with lock:
+                        if chunk < winner.value: winner.value = chunk
+                    results.put((chunk, found, chunk_time, block_hash))
+                    return
+                hashes[index] += stop - nonce
+                nonce = stop
+            chunk += workers
+    except KeyboardInterrupt:
+        pass
+
+def print_cpp_constants(nonce, found_time, hash_hex, merkle_root_hex):
+    """The lines in custom-genesis.patch (chainparams.cpp) that change with a new genesis."""
+    print("\n--- custom-genesis.patch (src/kernel/chainparams.cpp) ---")
+    print(f'        const char* pszTimestamp = "{pszTimestamp}";')
+    print(f"        genesis = CreateGenesisBlock(pszTimestamp, genesisOutputScript, {found_time}, {nonce}, {nBits:#010x}, {nVersion}, 50 * COIN);")
+    print(f'        assert(consensus.hashGenesisBlock == uint256{{"{hash_hex}"}});')
+    print(f'        assert(genesis.hashMerkleRoot == uint256{{"{merkle_root_hex}"}});')
+    print(f"            .nTime    = {found_time}, // should match timestamp of updated genesis block")
+    if nBits != PATCHED_BITS:
+        print(f"\nNOTE: nBits {nBits:#x} is not {PATCHED_BITS:#x}, so the merkle root above assumes the")
+        print(f"      scriptSig pushes {LEGACY_SCRIPT_BITS} (see the nBits check in CreateGenesisBlock).")
+
+def mine(workers=1):
     print(f"preparing to mine...")
     print(f"Timestamp: \"{pszTimestamp}\" ({nTime})")
     print(f"nBits: {nBits:#x}")
@@ -94,35 +180,63 @@ def mine():
     print(f"Calculated Merkle Root: {merkle_root_hex}")
     
     target = compact_to_target(nBits)
+    expected = (1 << 256) / (target + 1)
     
-    nonce = 0
     # Header: Version(4) + Prev(32) + Merkle(32) + Time(4) + Bits(4) + Nonce(4)
-    # Prefill the constant parts
-    header_prefix = struct.pack("<I", nVersion) + (b'\x00' * 32) + merkle_root + struct.pack("<I", nTime) + struct.pack("<I", nBits)
+    # Prefill the constant parts; each worker patches in its own nTime
+    header_base = struct.pack("<I", nVersion) + (b'\x00' * 32) + merkle_root + struct.pack("<I", nTime) + struct.pack("<I", nBits)
     
-    print("Mining...")
+    print(f"Mining with {workers} worker(s), ~{expected:,.0f} hashes expected...")
     start = time.time()
-    
-    while True:
-        header = header_prefix + struct.pack("<I", nonce)
-        block_hash = sha256d(header)
-        
-        # Compare as integer (little endian for PoW check)
-        hash_int = int.from_bytes(block_hash, 'little')
-        
-        if hash_int <= target:
-            hash_hex = binascii.hexlify(block_hash[::-1]).decode()
-            print(f"\n--- SUCCESS ---")
-            print(f"Nonce:   {nonce}")
-            print(f"Time:    {nTime}")
-            print(f"Bits:    {nBits:#x}")
-            print(f"Hash:    {hash_hex}")
-            print(f"Merkle:  {merkle_root_hex}")
-            return nonce, nTime, hash_hex, merkle_root_hex
-            
-        nonce += 1
-        if nonce % 1000000 == 0:
-            print(f"Checked {nonce} nonces...")
+
+    winner = multiprocessing.Value('Q', NO_WINNER, lock=False)
+    lock = multiprocessing.Lock()
+    hashes = multiprocessing.Array('Q', workers, lock=False)
+    results = multiprocessing.Queue()
+    procs = [
+        multiprocessing.Process(target=search_worker, daemon=True,
+                                args=(i, workers, header_base, target, nTime, winner, lock, hashes, results))
+        for i in range(workers)
+    ]
+    for p in procs: p.start()
+
+    try:
+        while any(p.is_alive() for p in procs):
+            for p in procs: p.join(timeout=2 / workers)
+            done = sum(hashes)
+            elapsed = max(time.time() - start, 1e-6)
+            print(f"\rChecked {done:,} hashes ({done / elapsed / 1e3:,.1f} kH/s, "
+                  f"{done / expected:.1%} of expected, nTime +{done >> 32})", end="", flush=True)
+    except KeyboardInterrupt:
+        winner.value = 0
+        print("\nStopped.")
+        return None
+
+    found = []
+    while len(found) < workers:
+        try:
+            found.append(results.get(timeout=0.1))
+        except Exception:
+            break
+    chunk, nonce, found_time, block_hash = min(found)
+    hash_hex = binascii.hexlify(block_hash[::-1]).decode()
+    print(f"\n--- SUCCESS ---")
+    print(f"Nonce:   {nonce}")
+    print(f"Time:    {found_time}")
+    print(f"Bits:    {nBits:#x}")
+    print(f"Hash:    {hash_hex}")
+    print(f"Merkle:  {merkle_root_hex}")
+    print(f"Elapsed: {time.time() - start:.1f}s")
+    print_cpp_constants(nonce, found_time, hash_hex, merkle_root_hex)
+    return nonce, found_time, hash_hex, merkle_root_hex
 
 if __name__ == "__main__":
-    mine()
+    parser = argparse.ArgumentParser(description="Search for genesis block parameters")
+    parser.add_argument("--bits", type=lambda v: int(v, 16), default=nBits, help="Compact target, hex (default 0x207fffff)")
+    parser.add_argument("--time", type=int, default=nTime, help="Starting nTime (rolled forward when a second's nonces run out)")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count() or 1, help="Search processes")
+    args = parser.parse_args()
+
+    nBits = args.bits
+    nTime = args.time
+    mine(max(1, args.workers))
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+import base64
+import http.client
+import itertools
+import json
+import os
+import socket
+import threading
+
+"""
+Shared JSON-RPC client for the lab scripts (miner, agent, pacer).
+
+Talks to bitcoind directly over keep-alive HTTP, authenticating with the
+.cookie file in the datadir (same as electrs-init.sh), instead of forking
+a bitcoin-cli process for every call.
+"""
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8332
+DEFAULT_TIMEOUT = 30
+DEFAULT_POOL_SIZE = 4
+
+# bitcoin-cli -rpcwallet=... fell back to the node endpoint on these errors
+WALLET_FALLBACK_ERRORS = ("Wallet file not specified", "Method not found")
+
+
+class RPCError(Exception):
+    """An error returned by bitcoind (or a failure to reach it)."""
+    def __init__(self, message, code=None, method=None):
+        super().__init__(message)
+        self.message = message
+        self.code = code
+        self.method = method
+
+    def __str__(self):
+        if self.code is None:
+            return self.message
+        return f"error code: {self.code} error message: {self.message}"
+
+
+class RPCTimeout(RPCError):
+    pass
+
+
+class RPCClient:
+    """
+    Thread-safe JSON-RPC client with a small pool of persistent connections.
+
+    Calls go to /wallet/<wallet> first and fall back to the node endpoint
+    when bitcoind says the method is not a wallet method, mirroring how the
+    scripts used bitcoin-cli -rpcwallet=<wallet>.
+    """
+    def __init__(self, wallet=None, datadir=None, host=None, port=None,
+                 timeout=DEFAULT_TIMEOUT, pool_size=DEFAULT_POOL_SIZE,
+                 cookie_file=None, user=None, password=None):
+        self.wallet = wallet
+        self.datadir = datadir or os.environ.get("BITCOIN_DATADIR") or os.path.expanduser("~/.bitcoin")
+        self.host = host or os.environ.get("BITCOIN_RPC_HOST", DEFAULT_HOST)
+        self.port = int(port or os.environ.get("BITCOIN_RPC_PORT", DEFAULT_PORT))
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.cookie_file = cookie_file or os.path.join(self.datadir, ".cookie")
+        self.user = user
+        self.password = password
+
+        self._ids = itertools.count(1)
+        self._idle = []
+        self._lock = threading.Lock()
+        self._auth = None
+
+    # --- AUTH ---
+    def _auth_header(self, reload=False):
+        if self._auth is None or reload:
+            if self.user is not None:
+                creds = f"{self.user}:{self.password or ''}"
+            else:
+                try:
+                    with open(self.cookie_file, "r") as f:
+                        creds = f.read().strip()
+                except OSError as e:
+                    raise RPCError(f"Cannot read RPC cookie {self.cookie_file}: {e}")
+            self._auth = "Basic " + base64.b64encode(creds.encode()).decode()
+        return self._auth
+
+    # --- CONNECTION POOL ---
+    def _acquire(self):
+        with self._lock:
+            if self._idle:
+                return self._idle.pop(), True
+        return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout), False
+
+    def _release(self, conn):
+        with self._lock:
+            if len(self._idle) < self.pool_size:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+    def _post(self, path, payload, timeout=None):
+        """POSTs a JSON payload and returns (http_status, decoded body)."""
+        body = json.dumps(payload).encode()
+        reload_auth = False
+        for attempt in range(3):
+            conn, reused = self._acquire()
+            conn.timeout = timeout if timeout is not None else self.timeout
+            if conn.sock is not None:
+                conn.sock.settimeout(conn.timeout)
+            try:
+                conn.request("POST", path, body, {
+                    "Authorization": self._auth_header(reload=reload_auth),
+                    "Content-Type": "application/json",
+                })
+                resp = conn.getresponse()
+                data = resp.read()
+            except (socket.timeout, TimeoutError):
+                conn.close()
+                raise RPCTimeout(f"RPC timed out after {conn.timeout}s")
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError) as e:
+                conn.close()
+                # An idle keep-alive socket may have been closed by bitcoind; retry on a fresh one
+                if reused: continue
+                raise RPCError(f"Connection to bitcoind lost: {e}")
+            except (OSError, http.client.HTTPException) as e:
+                conn.close()
+                raise RPCError(f"Cannot connect to bitcoind at {self.host}:{self.port}: {e}")
+
+            if resp.will_close:
+                conn.close()
+            else:
+                self._release(conn)
+
+            if resp.status == 401 and not reload_auth:
+                # bitcoind writes a new cookie every time it restarts
+                reload_auth = True
+                continue
+
+            try:
+                return resp.status, json.loads(data)
+            except json.JSONDecodeError:
+                raise RPCError(f"HTTP {resp.status} {resp.reason}: {data[:200].decode(errors='replace')}")
+        raise RPCError(f"HTTP {resp.status} {resp.reason}")
+
+    # --- CALLS ---
+    def _call_path(self, path, method, params, timeout):
+        request_id = next(self._ids)
+        payload = {"jsonrpc": "1.0", "id": request_id, "method": method, "params": params}
+        _, reply = self._post(path, payload, timeout)
+        error = reply.get("error")
+        if error:
+            raise RPCError(error.get("message", str(error)), error.get("code"), method)
+        return reply.get("result")
+
+    def call_global(self, method, params=None, timeout=None):
+        """Calls a method on the node endpoint, ignoring the wallet."""
+        return self._call_path("/", method, params if params is not None else [], timeout)
+
+    def call(self, method, params=None, timeout=None):
+        """Calls a method on the wallet endpoint, falling back to the node endpoint."""
+        if params is None: params = []
+        if not self.wallet:
+            return self._call_path("/", method, params, timeout)
+        try:
+            return self._call_path(f"/wallet/{self.wallet}", method, params, timeout)
+        except RPCTimeout:
+            raise
+        except RPCError as e:
+            if e.code is not None and any(s in e.message for s in WALLET_FALLBACK_ERRORS):
+                return self._call_path("/", method, params, timeout)
+            raise
+
+    def _batch_path(self, path, calls, timeout):
+        """Sends calls as one JSON-RPC batch; returns results (or RPCErrors) in order."""
+        ids = [next(self._ids) for _ in calls]
+        payload = [
+            {"jsonrpc": "1.0", "id": request_id, "method": method, "params": params if params is not None else []}
+            for request_id, (method, params) in zip(ids, calls)
+        ]
+        _, replies = self._post(path, payload, timeout)
+        if not isinstance(replies, list):
+            # A top-level error (e.g. malformed request) applies to the whole batch
+            error = (replies or {}).get("error") or {}
+            raise RPCError(error.get("message", "Invalid batch reply"), error.get("code"))
+
+        by_id = {reply.get("id"): reply for reply in replies}
+        results = []
+        for request_id, (method, _) in zip(ids, calls):
+            reply = by_id.get(request_id)
+            if reply is None:
+                results.append(RPCError("Missing reply in batch", method=method))
+            elif reply.get("error"):
+                error = reply["error"]
+                results.append(RPCError(error.get("message", str(error)), error.get("code"), method))
+            else:
+                results.append(reply.get("result"))
+        return results
+
+    def batch(self, calls, timeout=None):
+        """
+        Runs [(method, params), ...] in one HTTP round trip.
+        Returns a list in call order holding each result, or the RPCError
+        for calls that failed (the batch itself only raises on transport errors).
+        """
+        calls = list(calls)
+        if not calls: return []
+        if not self.wallet:
+            return self._batch_path("/", calls, timeout)
+
+        results = self._batch_path(f"/wallet/{self.wallet}", calls, timeout)
+        retry = [
+            i for i, res in enumerate(results)
+            if isinstance(res, RPCError) and res.code is not None
+            and any(s in res.message for s in WALLET_FALLBACK_ERRORS)
+        ]
+        if retry:
+            fallback = self._batch_path("/", [calls[i] for i in retry], timeout)
+            for i, res in zip(retry, fallback):
+                results[i] = res
+        return results
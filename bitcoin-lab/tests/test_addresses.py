@@ -0,0 +1,92 @@
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+
+LAB_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(LAB_DIR))
+
+import addresses  # noqa: E402
+import miner  # noqa: E402
+
+
+# BIP 173 / BIP 350 test vectors plus well-known base58 addresses
+VALID = [
+    ("BC1QW508D6QEJXTDG4Y5R3ZARVARY0C5XW7KV8F3T4", "main",
+     "0014751e76e8199196d454941c45d1b3a323f1433bd6"),
+    ("tb1qrp33g0q5c5txsp9arysrx4k6zdkfs4nce4xj0gdcccefvpysxf3q0sl5k7", "test",
+     "00201863143c14c5166804bd19203356da136c985678cd4d27a1b8c6329604903262"),
+    ("bc1p0xlxvlhemja6c4dqv22uapctqupfhlxm9h8z3k2e72q4k9hcz7vqzk5jj0", "main",
+     "512079be667ef9dcbbac55a06295ce870b07029bfcdb2dce28d959f2815b16f81798"),
+    ("1BvBMSEYstWetqTFn5Au4m4GFg7xJaNVN2", "main",
+     "76a91477bff20c60e522dfaa3350c39b030a5d004e839a88ac"),
+    ("3J98t1WpEZ73CNmQviecrnyiWrnqRhWNLy", "main",
+     "a914b472a266d0bd89c13706a4132ccfb16f7c3b9fcb87"),
+]
+
+TESTNET_P2PKH = "mipcBbFg9gMiCh81Kj8tqqdgoZub1ZJRfn"
+
+INVALID = [
+    "bc1qw508d6qejxtdg4y5r3zarvary0c5xw7kemeawh",  # bech32m checksum on a v0 program
+    "tb1pw508d6qejxtdg4y5r3zarqfsj6c3",  # bech32 checksum on a v1 program
+    "bc1zw508d6qejxtdg4y5r3zarvaryvqyzf3du",  # invalid padding
+    "1BvBMSEYstWetqTFn5Au4m4GFg7xJaNVN3",  # bad base58 checksum
+]
+
+
+class DecodeAddressTests(unittest.TestCase):
+    def test_valid_addresses(self):
+        for address, network, script in VALID:
+            self.assertEqual(addresses.decode_address(address), (network, bytes.fromhex(script)), msg=address)
+
+    def test_invalid_addresses(self):
+        for address in INVALID:
+            with self.assertRaises(ValueError, msg=address):
+                addresses.decode_address(address)
+
+    def test_chain_accepts_only_its_own_addresses(self):
+        self.assertTrue(addresses.chain_accepts("main", *VALID[0][:2]))
+        self.assertFalse(addresses.chain_accepts("regtest", *VALID[0][:2]))
+        self.assertFalse(addresses.chain_accepts("regtest", *VALID[1][:2]))  # tb1 is testnet/signet only
+        self.assertTrue(addresses.chain_accepts("signet", *VALID[1][:2]))
+        self.assertTrue(addresses.chain_accepts("regtest", TESTNET_P2PKH, "test"))  # shared base58 versions
+
+
+class ScriptPubKeyCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        patcher = mock.patch.object(miner, "SCRIPT_CACHE_FILE", str(Path(self.tmp.name) / "cache.json"))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.chain = "main"
+        chain_patcher = mock.patch.object(miner, "node_chain", lambda: self.chain)
+        chain_patcher.start()
+        self.addCleanup(chain_patcher.stop)
+
+    def test_standard_address_needs_no_rpc(self):
+        address, _, script = VALID[0]
+        with mock.patch.object(miner, "rpc_script_pubkey") as rpc_lookup:
+            self.assertEqual(miner.get_script_pubkey(address), bytes.fromhex(script))
+        rpc_lookup.assert_not_called()
+
+    def test_address_from_another_network_is_rejected(self):
+        self.chain = "regtest"
+        with mock.patch.object(miner, "rpc_script_pubkey") as rpc_lookup, self.assertRaises(SystemExit):
+            miner.get_script_pubkey(VALID[0][0])
+        rpc_lookup.assert_not_called()
+
+    def test_rpc_result_is_cached_on_disk(self):
+        self.chain = "regtest"
+        script = bytes.fromhex("6a")
+        with mock.patch.object(miner, "rpc_script_pubkey", return_value=script) as rpc_lookup:
+            self.assertEqual(miner.get_script_pubkey("bcrt1notdecodable"), script)
+            self.assertEqual(miner.get_script_pubkey("bcrt1notdecodable"), script)
+        rpc_lookup.assert_called_once()
+        self.assertEqual(miner.load_script_cache(), {"regtest:bcrt1notdecodable": "6a"})
+
+
+if __name__ == "__main__":
+    unittest.main()
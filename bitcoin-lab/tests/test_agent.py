@@ -0,0 +1,447 @@
+import json
+import logging
+import random
+import socket
+import sys
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+
+LAB_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(LAB_DIR))
+
+import agent  # noqa: E402
+from mockbitcoind import MockNode, MockRPCError  # noqa: E402
+from rpcclient import RPCError, RPCTimeout  # noqa: E402
+
+
+def bare_agent():
+    """A BitcoinAgent with just the state the peer logic needs (no RPC, no logging setup)."""
+    a = agent.BitcoinAgent.__new__(agent.BitcoinAgent)
+    a.running = True
+    a.verbose = False
+    a.peer_lock = threading.Lock()
+    a.peer_backoff = {}
+    a.peer_map = agent.PeerTable()
+    a.legacy_peers = {}
+    a.gossip_fanout = agent.DEFAULT_GOSSIP_FANOUT
+    a.logger = logging.getLogger("Agent")
+    return a
+
+
+def gossip_agent(address):
+    a = bare_agent()
+    a.addresses = agent.AddressRing(None, None)
+    a.addresses.addresses = (address,)
+    return a
+
+
+def mock_wallet_rpc():
+    """(MockNode with a "student" wallet, list of methods called, agent-style rpc() that returns None on errors)."""
+    node = MockNode(seed=7)
+    node.wallet("student", create=True)
+    calls = []
+
+    def rpc(method, params=None):
+        calls.append(method)
+        try:
+            return node.dispatch(method, params or [], "student")
+        except MockRPCError:
+            return None
+
+    return node, calls, rpc
+
+
+class PeerHostParsingTests(unittest.TestCase):
+    def test_ipv4_with_port(self):
+        self.assertEqual(agent.parse_peer_host("172.18.0.5:8333"), "172.18.0.5")
+
+    def test_bracketed_ipv6_with_port(self):
+        self.assertEqual(agent.parse_peer_host("[2001:db8::7]:8333"), "2001:db8::7")
+
+    def test_bare_ipv6_is_left_intact(self):
+        self.assertEqual(agent.parse_peer_host("fd00::1"), "fd00::1")
+
+    def test_ipv4_mapped_addresses_are_unwrapped(self):
+        self.assertEqual(agent.normalize_ip("::ffff:10.0.0.2"), "10.0.0.2")
+        self.assertEqual(agent.normalize_ip("2001:db8::1"), "2001:db8::1")
+
+    def test_hostname_without_port(self):
+        self.assertEqual(agent.parse_peer_host("instructor"), "instructor")
+
+
+class PeerDiscoveryTests(unittest.TestCase):
+    def test_backoff_doubles_and_resets_on_success(self):
+        a = bare_agent()
+        now = time.time()
+
+        a.record_exchange_result("10.0.0.2", False)
+        first_retry = a.peer_backoff["10.0.0.2"][1]
+        a.record_exchange_result("10.0.0.2", False)
+        second_retry = a.peer_backoff["10.0.0.2"][1]
+
+        self.assertAlmostEqual(first_retry - now, agent.PEER_BACKOFF_BASE, delta=2)
+        self.assertAlmostEqual(second_retry - now, 2 * agent.PEER_BACKOFF_BASE, delta=2)
+        self.assertFalse(a.peer_due("10.0.0.2", now))
+
+        a.record_exchange_result("10.0.0.2", True)
+        self.assertTrue(a.peer_due("10.0.0.2", now))
+
+    def test_backoff_is_capped(self):
+        a = bare_agent()
+        for _ in range(30):
+            a.record_exchange_result("10.0.0.3", False)
+
+        self.assertLessEqual(a.peer_backoff["10.0.0.3"][1] - time.time(), agent.PEER_BACKOFF_MAX + 1)
+
+    def test_sweep_runs_exchanges_concurrently(self):
+        a = bare_agent()
+        seen = []
+
+        def slow_exchange(ip):
+            time.sleep(0.2)
+            seen.append(ip)
+            return ip != "10.0.0.9"
+
+        a.exchange_with_peer = slow_exchange
+        ips = [f"10.0.0.{i}" for i in range(10)]
+        start = time.time()
+        with ThreadPoolExecutor(max_workers=10) as executor:
+            a.exchange_with_peers(ips, executor)
+
+        self.assertLess(time.time() - start, 1.0)
+        self.assertEqual(sorted(seen), sorted(ips))
+        self.assertEqual(list(a.peer_backoff), ["10.0.0.9"])
+
+
+class GossipTests(unittest.TestCase):
+    def test_table_expires_evicts_stalest_and_keeps_fresher_entries(self):
+        now = time.time()
+        table = agent.PeerTable(capacity=2, ttl=60)
+        self.assertFalse(table.update("10.0.0.1", "bcrt1old", now - 120))
+        self.assertTrue(table.update("10.0.0.1", "bcrt1a", now - 30))
+        self.assertTrue(table.update("10.0.0.2", "bcrt1b", now - 10))
+        self.assertFalse(table.update("10.0.0.2", "bcrt1stale", now - 20))
+        self.assertTrue(table.update("10.0.0.3", "bcrt1c", now + 3600))  # clamped to now
+
+        self.assertEqual(sorted(table.addresses()), ["bcrt1b", "bcrt1c"])
+        self.assertEqual(table.expire(now + 55), 1)
+        self.assertEqual(table.addresses(), ["bcrt1c"])
+
+    def test_exchange_carries_gossip_and_still_answers_legacy_json(self):
+        a, b = gossip_agent("bcrt1a"), gossip_agent("bcrt1b")
+        b.peer_map.update("10.0.0.3", "bcrt1c", time.time() - 5)
+        b.peer_map.update("10.0.0.1", "bcrt1b-view-of-a")
+
+        reply = b.process_exchange("10.0.0.1", agent.encode_gossip("bcrt1a", [("10.0.0.4", "bcrt1d", time.time())]))
+        address, entries = agent.decode_gossip(reply[agent.GOSSIP_HEADER.size:])
+        self.assertEqual(address, "bcrt1b")
+        self.assertEqual(sorted(e[:2] for e in entries), [("10.0.0.3", "bcrt1c"), ("10.0.0.4", "bcrt1d")])  # not a's own entry
+        self.assertEqual(a.learn("10.0.0.2", address, entries), 2)
+        self.assertEqual(a.peer_map.entries["10.0.0.3"][0], "bcrt1c")
+        self.assertEqual(b.peer_map.entries["10.0.0.4"][0], "bcrt1d")
+
+        self.assertEqual(json.loads(b.process_exchange("10.0.0.5", b'{"address": "bcrt1e"}')), {"address": "bcrt1b", "gossip": agent.GOSSIP_VERSION})
+        self.assertEqual(b.peer_map.entries["10.0.0.5"][0], "bcrt1e")
+
+    def serve(self, handlers):
+        """Answers one connection on 127.0.0.2 with each handler in turn; returns the port."""
+        server = socket.create_server(("127.0.0.2", 0))
+        self.addCleanup(server.close)
+
+        def run():
+            for handler in handlers:
+                client, _ = server.accept()
+                with client:
+                    try:
+                        handler(client)
+                    except Exception:
+                        pass
+
+        threading.Thread(target=run, daemon=True).start()
+        return server.getsockname()[1]
+
+    def test_old_agents_get_the_legacy_message(self):
+        def baseline_handler(client):
+            # The pre-gossip listener: one recv(1024), one JSON reply, close
+            json.loads(client.recv(1024).decode('utf-8'))
+            client.sendall(json.dumps({"address": "bcrt1old"}).encode('utf-8'))
+
+        a = gossip_agent("bcrt1a")
+        a.port = self.serve([baseline_handler] * 2)
+        self.assertTrue(a.exchange_with_peer("127.0.0.2"))
+
+        self.assertEqual(set(a.legacy_peers), {"127.0.0.2"})
+        self.assertEqual(a.peer_map.entries["127.0.0.2"][0], "bcrt1old")
+
+    def test_new_agents_are_not_marked_legacy(self):
+        b = gossip_agent("bcrt1b")
+        received = []
+
+        def new_agent(client):
+            data = agent.recv_message(client)
+            received.append(data.startswith(agent.GOSSIP_MAGIC))
+            client.sendall(b.process_exchange("127.0.0.1", data))
+
+        a = gossip_agent("bcrt1a")
+        a.port = self.serve([lambda client: None, new_agent, new_agent, new_agent])
+        self.assertTrue(a.exchange_with_peer("127.0.0.2"))  # hung up early, then answered the JSON fallback
+        self.assertEqual(a.legacy_peers, {})
+        self.assertTrue(a.exchange_with_peer("127.0.0.2"))
+
+        a.legacy_peers["127.0.0.2"] = time.time() - agent.PEER_TTL - 1  # an old mark expires
+        self.assertTrue(a.exchange_with_peer("127.0.0.2"))
+        self.assertEqual(received, [False, True, True])
+
+    def test_listeners_accept_ipv4_and_ipv6_peers(self):
+        if not socket.has_dualstack_ipv6(): self.skipTest("no dual-stack IPv6 here")
+        for listener in ("threaded", "asyncio"):
+            with socket.create_server(("::1", 0), family=socket.AF_INET6) as probe:
+                port = probe.getsockname()[1]
+            a = gossip_agent("bcrt1listener")
+            a.port, a.max_connections = port, 10
+            a.conn_limit = threading.Semaphore(10)
+            threading.Thread(target=a.start_listener if listener == "threaded" else a.start_async_listener, daemon=True).start()
+
+            for host in ("127.0.0.1", "::1"):
+                for _ in range(50):
+                    try:
+                        conn = socket.create_connection((host, port), timeout=2)
+                        break
+                    except OSError:
+                        time.sleep(0.05)
+                with conn:
+                    conn.sendall(json.dumps({"address": f"bcrt1from{host}"}).encode('utf-8'))
+                    self.assertEqual(json.loads(conn.recv(1024)), {"address": "bcrt1listener", "gossip": agent.GOSSIP_VERSION}, msg=listener)
+            a.running = False
+
+            self.assertEqual(a.peer_map.entries["127.0.0.1"][0], "bcrt1from127.0.0.1", msg=listener)
+            self.assertEqual(a.peer_map.entries["::1"][0], "bcrt1from::1", msg=listener)
+
+    def test_large_frames_are_read_whole(self):
+        entries = [(f"10.1.{i // 256}.{i % 256}", "bcrt1" + "q" * 60, time.time()) for i in range(agent.GOSSIP_BATCH)]
+        frame = agent.encode_gossip("bcrt1a", entries)
+        self.assertGreater(len(frame), 4096)
+        left, right = socket.socketpair()
+        with left, right:
+            threading.Thread(target=lambda: [left.sendall(frame[i:i + 1000]) for i in range(0, len(frame), 1000)]).start()
+            self.assertEqual(agent.recv_message(right), frame)
+
+        with self.assertRaises(ValueError):
+            agent.gossip_frame_size(agent.GOSSIP_HEADER.pack(agent.GOSSIP_MAGIC, 2, 10))
+
+    def test_fanout_reaches_the_whole_lab(self):
+        random.seed(25)
+        lab = {f"10.2.0.{i}": gossip_agent(f"bcrt1agent{i}") for i in range(40)}
+        for sweep in range(8):
+            for ip, a in lab.items():
+                a.gossip_fanout = 2
+                for target in a.pick_gossip_targets([peer for peer in lab if peer != ip]):
+                    frame = agent.encode_gossip(a.addresses.pick(), a.peer_map.sample(agent.GOSSIP_BATCH, exclude=target))
+                    reply = lab[target].process_exchange(ip, frame)
+                    a.learn(target, *agent.decode_gossip(reply[agent.GOSSIP_HEADER.size:]))
+            if all(len(a.peer_map) == len(lab) - 1 for a in lab.values()): break
+
+        self.assertTrue(all(len(a.peer_map) == len(lab) - 1 for a in lab.values()))
+        self.assertLess(sweep, 7)  # well under one connection per peer per agent
+
+
+class TransactionGeneratorTests(unittest.TestCase):
+    def test_rate_backs_off_as_mempool_fills(self):
+        self.assertEqual(agent.adaptive_tps(10, 0, 4000), 10)
+        self.assertEqual(agent.adaptive_tps(10, 2000, 4000), 10)
+        self.assertAlmostEqual(agent.adaptive_tps(10, 3000, 4000), 5)
+        self.assertAlmostEqual(agent.adaptive_tps(10, 5000, 4000), 10 * agent.TPS_MIN_FACTOR)
+
+    def test_failed_sends_do_not_mine_at_the_send_rate(self):
+        node, calls, rpc = mock_wallet_rpc()
+        a = bare_agent()
+        a.rpc = rpc
+        a.rpc_batch = lambda batch: [rpc(method, params) for method, params in batch]
+        a.target_tps, a.outputs_per_tx, a.mempool_trigger = 50, 2, 4000
+        a.events, a.last_rpc_error = None, None
+        a.utxos = agent.UtxoView(a.rpc_batch)
+        a.addresses = agent.AddressRing(rpc, a.rpc_batch)
+        a.addresses.rotate()
+        start_height = node.tip["height"]
+        threading.Timer(1.0, lambda: setattr(a, "running", False)).start()
+        a.loop_generator()
+
+        # Only the status window's low-balance refill; none of the ~50 failed tokens mined
+        self.assertEqual(node.tip["height"] - start_height, 1)
+
+    def test_token_bucket_paces_to_rate(self):
+        bucket = agent.TokenBucket(rate=200, capacity=5)
+        taken = 0
+        deadline = time.monotonic() + 0.25
+        while time.monotonic() < deadline:
+            if bucket.take(): taken += 1
+            else: time.sleep(bucket.wait_time())
+
+        self.assertAlmostEqual(taken, 50, delta=10)
+
+    def test_outputs_are_distinct_and_topped_up_in_one_call(self):
+        a = bare_agent()
+        for ip, address in {"10.0.0.2": "bcrt1peer", "10.0.0.3": "bcrt1peer", "10.0.0.4": "bcrt1other"}.items():
+            a.peer_map.update(ip, address)
+        node, calls, rpc = mock_wallet_rpc()
+        a.addresses = agent.AddressRing(rpc, None, size=1)
+        a.addresses.rotate()
+        calls.clear()
+        outputs = a.pick_output_addresses(5)
+
+        self.assertEqual(len(outputs), 5)
+        self.assertEqual(len(set(outputs)), 5)
+        self.assertEqual(set(outputs[:2]), {"bcrt1peer", "bcrt1other"})
+        self.assertEqual(calls, ["deriveaddresses"])
+        self.assertEqual(len(a.addresses.addresses), 1)
+
+
+class AddressRingTests(unittest.TestCase):
+    def test_ring_stays_bounded_and_derives_in_bulk(self):
+        node, calls, rpc = mock_wallet_rpc()
+        ring = agent.AddressRing(rpc, None, size=8)
+        ring.rotate()
+        for _ in range(10): ring.rotate(3)
+
+        self.assertEqual(len(ring.addresses), 8)
+        self.assertEqual(calls.count("deriveaddresses"), 11)
+        self.assertEqual(calls.count("listdescriptors"), 1)
+        wallet = node.wallets["student"]
+        self.assertTrue(all(address in wallet.addresses for address in ring.addresses))
+        self.assertIn(ring.pick(), ring.addresses)
+
+    def test_keypool_is_extended_before_deriving_past_it(self):
+        node, calls, rpc = mock_wallet_rpc()
+        node.wallets["student"].range_end = 10
+        ring = agent.AddressRing(rpc, None, size=8)
+        ring.rotate()
+        ring.rotate(8)
+
+        self.assertIn("keypoolrefill", calls)
+        self.assertTrue(all(address in node.wallets["student"].addresses for address in ring.addresses))
+
+    def test_falls_back_to_getnewaddress_without_descriptors(self):
+        batches = []
+
+        def fake_batch(calls):
+            batches.append(calls)
+            return [f"bcrt1new{i}" for i in range(len(calls))]
+
+        ring = agent.AddressRing(lambda method, params=None: None, fake_batch, size=4)
+        ring.rotate()
+        self.assertEqual(ring.addresses, tuple(f"bcrt1new{i}" for i in range(4)))
+        self.assertEqual(batches, [[("getnewaddress", [])] * 4])
+
+
+class UtxoViewTests(unittest.TestCase):
+    def view(self, responses):
+        """A UtxoView fed canned (listunspent|listsinceblock, getblockchaininfo) batch replies."""
+        calls = []
+
+        def fake_batch(batch):
+            calls.append([method for method, _ in batch])
+            return responses.pop(0)
+
+        return agent.UtxoView(fake_batch), calls
+
+    def test_selects_only_confirmed_mature_coins(self):
+        view, _ = self.view([
+            ([{"txid": "aa", "vout": 0, "amount": 0.05, "confirmations": 3},
+              {"txid": "bb", "vout": 1, "amount": 0.02, "confirmations": 0},
+              {"txid": "cc", "vout": 0, "amount": 1.0, "confirmations": 1}],
+             {"blocks": 20, "bestblockhash": "tip20"}),
+        ])
+        view.refresh()
+
+        self.assertEqual(view.select(0.01), [("aa", 0)])   # smallest coin that covers it
+        self.assertEqual(view.select(0.01), [("cc", 0)])   # "aa" is reserved now
+        self.assertEqual(view.select(0.01), [])            # "bb" is unconfirmed
+        view.release([("aa", 0)])
+        view.spent([("cc", 0)])
+        self.assertAlmostEqual(view.total(), 0.07)
+
+    def test_pool_counts_confirmed_coins_and_scales_with_rate(self):
+        view, _ = self.view([
+            ([{"txid": "aa", "vout": 0, "amount": 0.05, "confirmations": 3},
+              {"txid": "bb", "vout": 1, "amount": 0.02, "confirmations": 0},
+              {"txid": "cc", "vout": 0, "amount": 1.0, "confirmations": 1}],
+             {"blocks": 20, "bestblockhash": "tip20"}),
+        ])
+        view.refresh()
+        self.assertEqual(view.pool_status(), (1, 1.0))  # unconfirmed change is not in the pool
+
+        a = bare_agent()
+        a.utxos, a.target_tps = view, 5
+        self.assertEqual(view.block_interval(), agent.DEFAULT_BLOCK_INTERVAL)
+        view.tip_times.extend([(1000.0, 21), (1100.0, 31)])
+        self.assertEqual(view.block_interval(), 10)
+        self.assertEqual(a.pool_target(), 75)  # 5 tx/s x 10 s x POOL_HEADROOM
+        a.target_tps = None
+        self.assertEqual(a.pool_target(), agent.SPLIT_TARGET)
+
+    def test_incremental_refresh_follows_new_blocks(self):
+        view, calls = self.view([
+            ([], {"blocks": 5, "bestblockhash": "tip5"}),
+            ({"transactions": [
+                {"category": "receive", "txid": "dd", "vout": 2, "amount": 0.3, "confirmations": 1},
+                {"category": "immature", "txid": "ee", "vout": 0, "amount": 50, "confirmations": 1},
+                {"category": "send", "txid": "ff", "vout": 0, "amount": -0.1, "confirmations": 1},
+             ], "removed": [], "lastblock": "tip6"}, {"blocks": 6, "bestblockhash": "tip6"}),
+            ({"transactions": [], "removed": [{"txid": "dd", "vout": 2}], "lastblock": "tip7"},
+             {"blocks": 7, "bestblockhash": "tip7"}),
+        ])
+        view.refresh()
+        view.refresh(force=True)
+
+        self.assertEqual(set(view.coins), {("dd", 2), ("ee", 0)})
+        self.assertEqual(view.select(1), [])  # the coinbase is still immature
+        self.assertEqual(view.select(0.1), [("dd", 2)])
+
+        view.refresh(force=True)
+        self.assertEqual(set(view.coins), {("ee", 0)})
+        self.assertEqual(calls[1][0], "listsinceblock")
+
+
+class AgentMetricsTests(unittest.TestCase):
+    def test_rpc_latency_timeouts_and_errors(self):
+        class FakeClient:
+            def call(self, method, params):
+                if method == "getbalance": raise RPCTimeout("timed out")
+                if method == "sendmany": raise RPCError("Insufficient funds", code=-6)
+                return {}
+
+        a = bare_agent()
+        a.logger = logging.getLogger("test")
+        a.rpc_client, a.rpc_timeout = FakeClient(), 1
+        before = (agent.RPC_TIMEOUTS.get(method="getbalance"), agent.RPC_ERRORS.get(method="sendmany"),
+                  agent.RPC_SECONDS.snapshot().get("getmempoolinfo", {}).get("count", 0))
+        a.rpc("getmempoolinfo")
+        a.rpc("getbalance")
+        a.rpc("sendmany")
+
+        self.assertEqual(agent.RPC_TIMEOUTS.get(method="getbalance"), before[0] + 1)
+        self.assertEqual(agent.RPC_ERRORS.get(method="sendmany"), before[1] + 1)
+        self.assertEqual(agent.RPC_SECONDS.snapshot()["getmempoolinfo"]["count"], before[2] + 1)
+
+    def test_exchanges_and_recovery_blocks_are_counted(self):
+        a = bare_agent()
+        a.addresses = agent.AddressRing(None, None)
+        a.addresses.addresses = ("bcrt1mine",)
+        a.rpc = lambda method, params=None: ["00" * 32]
+        before = agent.RECOVERY_BLOCKS.get(reason="congestion")
+        a.record_exchange_result("10.9.0.1", True)
+        a.record_exchange_result("10.9.0.1", False)
+        a.mine_recovery_block("congestion")
+
+        self.assertEqual(agent.EXCHANGES.get(peer="10.9.0.1", result="ok"), 1)
+        self.assertEqual(agent.EXCHANGES.get(peer="10.9.0.1", result="failed"), 1)
+        self.assertEqual(agent.RECOVERY_BLOCKS.get(reason="congestion"), before + 1)
+        self.assertIn('agent_exchanges_total{peer="10.9.0.1",result="ok"} 1', agent.METRICS.render())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+import binascii
+import struct
+import sys
+import unittest
+from pathlib import Path
+from unittest import mock
+
+
+LAB_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(LAB_DIR))
+sys.path.insert(0, str(LAB_DIR / "benchmarks"))
+
+import miner  # noqa: E402
+import synthetic  # noqa: E402
+
+
+SCRIPT_PUBKEY = bytes.fromhex("0014" + "11" * 20)
+
+
+def concatenated_block(header, coinbase, transactions):
+    """The assembly submit_block() used before serialize_block()."""
+    full_block = header + miner.ser_compact_size(len(transactions) + 1) + coinbase
+    for tx in transactions:
+        full_block += binascii.unhexlify(tx['data'])
+    return full_block
+
+
+class SerializeBlockTests(unittest.TestCase):
+    def assert_matches_concatenation(self, tx_count):
+        work = miner.WorkGenerator(synthetic.make_template(tx_count, seed=tx_count), SCRIPT_PUBKEY)
+        unit = work.next_unit()
+        header = unit.header_prefix + struct.pack("<I", 12345)
+        coinbase = work.coinbase(unit.extranonce)
+
+        block = miner.serialize_block(header, coinbase, work.transactions)
+        expected = concatenated_block(header, coinbase, work.transactions)
+
+        self.assertEqual(bytes(block), expected)
+        self.assertEqual(block.hex(), binascii.hexlify(expected).decode())
+
+    def test_coinbase_only(self):
+        self.assert_matches_concatenation(0)
+
+    def test_small_template(self):
+        self.assert_matches_concatenation(3)
+
+    def test_multi_byte_tx_count(self):
+        self.assert_matches_concatenation(300)
+
+
+class TemplateWatcherTests(unittest.TestCase):
+    def test_fetches_and_long_polls_are_timed(self):
+        templates = [dict(synthetic.make_template(1, seed=i), longpollid=str(i)) for i in range(3)]
+        client = mock.Mock()
+        client.call.side_effect = lambda method, params, timeout: templates[min(2, int(params[0].get("longpollid", -1)) + 1)]
+        before = {stage: miner.STAGE_SECONDS.snapshot().get(stage, {"count": 0})["count"]
+                  for stage in ("template_fetch", "template_longpoll")}
+
+        with mock.patch.object(miner, "get_rpc_client", return_value=client):
+            watcher = miner.TemplateWatcher()
+            watcher.start()
+            for _ in range(2):
+                watcher.take(timeout=5)
+            watcher.running = False
+            watcher.join(5)
+
+        snapshot = miner.STAGE_SECONDS.snapshot()
+        self.assertEqual(snapshot["template_fetch"]["count"], before["template_fetch"] + 1)
+        self.assertGreaterEqual(snapshot["template_longpoll"]["count"], before["template_longpoll"] + 1)
+
+
+class ContinuousMiningTests(unittest.TestCase):
+    def test_failed_submit_moves_on_to_the_next_template(self):
+        class Done(Exception):
+            pass
+
+        watcher = mock.Mock()
+        watcher.take.side_effect = [{"height": 1}, {"height": 2}, Done()]
+        submit = mock.Mock(side_effect=[miner.RPCError("Connection to bitcoind lost"), None])
+        with mock.patch.multiple(miner, TemplateWatcher=mock.Mock(return_value=watcher), HashingPool=mock.Mock(),
+                                 resolve_script_pubkey=mock.Mock(), submit_block=submit,
+                                 mine_template=mock.Mock(return_value=("work", "unit", 0))), \
+                mock.patch("builtins.print"), self.assertRaises(Done):
+            miner.mine_continuous()
+
+        self.assertEqual(submit.call_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
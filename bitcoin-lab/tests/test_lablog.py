@@ -0,0 +1,62 @@
+import json
+import logging
+import queue
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+
+LAB_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(LAB_DIR))
+
+import lablog  # noqa: E402
+
+
+class LabLogTests(unittest.TestCase):
+    def setUp(self):
+        self.addCleanup(lablog.shutdown)
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = Path(tmp.name) / "lab.log"
+
+    def read_lines(self):
+        lablog.shutdown()
+        return [json.loads(line) for line in self.path.read_text().splitlines()]
+
+    def test_records_are_written_as_json_lines(self):
+        lablog.setup(self.path, console=False)
+        logging.getLogger("Agent").warning("peer %s timed out", "10.0.0.2", extra={"kind": "net", "peer": "10.0.0.2"})
+
+        [entry] = self.read_lines()
+        self.assertEqual(entry["msg"], "peer 10.0.0.2 timed out")
+        self.assertEqual((entry["level"], entry["logger"], entry["kind"], entry["peer"]),
+                         ("WARNING", "Agent", "net", "10.0.0.2"))
+
+    def test_sampled_kinds_skip_formatting(self):
+        rendered = []
+        lablog.setup(self.path, console=False, sample={"rpc": 5})
+        logger = logging.getLogger("Agent")
+        for i in range(20):
+            logger.info("CMD EXEC: %s", lablog.Lazy(lambda i=i: rendered.append(i) or i), extra={"kind": "rpc"})
+        logger.info("Broadcasted TXID: abc")
+
+        lines = self.read_lines()
+        self.assertEqual(len(lines), 5)
+        self.assertEqual(rendered, [0, 5, 10, 15])
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        handler = lablog.DroppingQueueHandler(queue.Queue(2))
+        record = logging.makeLogRecord({"msg": "x"})
+        for _ in range(5): handler.enqueue(record)
+        self.assertEqual(handler.dropped, 3)
+
+        handler.queue.get_nowait()
+        handler.queue.get_nowait()
+        handler.enqueue(record)
+        notice = handler.queue.get_nowait()
+        self.assertIn("dropped 3 records", notice.getMessage())
+
+
+if __name__ == "__main__":
+    unittest.main()
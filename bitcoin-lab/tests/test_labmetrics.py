@@ -0,0 +1,65 @@
+import json
+import sys
+import tempfile
+import unittest
+import urllib.request
+from pathlib import Path
+
+
+LAB_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(LAB_DIR))
+
+import labmetrics  # noqa: E402
+
+
+class RegistryTests(unittest.TestCase):
+    def test_prometheus_text(self):
+        registry = labmetrics.Registry("lab")
+        submits = registry.counter("submit_total", "submitblock outcomes", ("result",))
+        stage = registry.histogram("stage_seconds", "Stage time", ("stage",), buckets=(0.1, 1))
+        submits.inc(result="accepted")
+        submits.inc(2, result="rejected")
+        stage.observe(0.5, stage="hashing")
+
+        text = registry.render()
+
+        self.assertIn("# TYPE lab_submit_total counter", text)
+        self.assertIn('lab_submit_total{result="rejected"} 2', text)
+        self.assertIn('lab_stage_seconds_bucket{stage="hashing",le="0.1"} 0', text)
+        self.assertIn('lab_stage_seconds_bucket{stage="hashing",le="1"} 1', text)
+        self.assertIn('lab_stage_seconds_bucket{stage="hashing",le="+Inf"} 1', text)
+        self.assertIn('lab_stage_seconds_count{stage="hashing"} 1', text)
+
+    def test_label_values_are_escaped(self):
+        registry = labmetrics.Registry()
+        registry.gauge("g", "G", ("peer",)).set(1, peer='a"b\\c')
+        self.assertIn('g{peer="a\\"b\\\\c"} 1', registry.render())
+
+    def test_jsonl_events_and_final_snapshot(self):
+        registry = labmetrics.Registry("lab")
+        registry.counter("blocks_total", "Blocks").inc()
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "metrics.jsonl"
+            registry.add_jsonl(path)
+            registry.event("submit", result="accepted")
+            registry.close()
+
+            lines = [json.loads(line) for line in path.read_text().splitlines()]
+
+        self.assertEqual([line["event"] for line in lines], ["submit", "snapshot"])
+        self.assertEqual(lines[1]["metrics"], {"lab_blocks_total": {"": 1}})
+
+    def test_http_endpoint(self):
+        registry = labmetrics.Registry("lab")
+        registry.counter("hits_total", "Hits").inc()
+        server = labmetrics.serve_metrics(registry, 0, "127.0.0.1")
+        self.addCleanup(server.shutdown)
+
+        port = server.server_address[1]
+        body = urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5).read().decode()
+
+        self.assertIn("lab_hits_total 1", body)
+
+
+if __name__ == "__main__":
+    unittest.main()
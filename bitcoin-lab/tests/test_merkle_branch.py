@@ -0,0 +1,60 @@
+import binascii
+import random
+import sys
+import unittest
+from pathlib import Path
+
+
+LAB_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(LAB_DIR))
+
+import miner  # noqa: E402
+
+
+class MerkleBranchTests(unittest.TestCase):
+    def setUp(self):
+        self.rng = random.Random(1337)
+
+    def random_hashes(self, count):
+        return [self.rng.randbytes(32) for _ in range(count)]
+
+    def test_matches_full_tree_for_odd_and_even_leaf_counts(self):
+        for leaf_count in list(range(1, 34)) + [100, 255, 256, 257, 1000]:
+            leaves = self.random_hashes(leaf_count)
+            branch = miner.MerkleBranch(leaves[1:])
+
+            self.assertEqual(
+                branch.root(leaves[0]),
+                miner.calculate_merkle_root(leaves),
+                msg=f"{leaf_count} leaves",
+            )
+
+    def test_new_coinbase_reuses_branch(self):
+        leaves = self.random_hashes(57)
+        branch = miner.MerkleBranch(leaves[1:])
+
+        for _ in range(5):
+            coinbase = self.rng.randbytes(32)
+            self.assertEqual(branch.root(coinbase), miner.calculate_merkle_root([coinbase] + leaves[1:]))
+
+    def test_branch_length_is_log2_of_leaf_count(self):
+        self.assertEqual(len(miner.MerkleBranch([])), 0)
+        self.assertEqual(len(miner.MerkleBranch(self.random_hashes(1))), 1)
+        self.assertEqual(len(miner.MerkleBranch(self.random_hashes(1023))), 10)
+        self.assertEqual(len(miner.MerkleBranch(self.random_hashes(1024))), 11)
+
+    def test_from_template_uses_txid_in_internal_byte_order(self):
+        leaves = self.random_hashes(6)
+        template = {
+            "transactions": [
+                {"txid": binascii.hexlify(h[::-1]).decode(), "hash": "ff" * 32}
+                for h in leaves[1:]
+            ]
+        }
+        branch = miner.MerkleBranch.from_template(template)
+
+        self.assertEqual(branch.root(leaves[0]), miner.calculate_merkle_root(leaves))
+
+
+if __name__ == "__main__":
+    unittest.main()
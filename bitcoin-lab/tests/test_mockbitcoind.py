@@ -0,0 +1,95 @@
+import struct
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+
+
+LAB_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(LAB_DIR))
+
+import miner  # noqa: E402
+from mockbitcoind import COINBASE_MATURITY, MockBitcoind, MockNode  # noqa: E402
+from rpcclient import RPCClient, RPCError  # noqa: E402
+
+
+class MockBitcoindTests(unittest.TestCase):
+    def start(self, **kwargs):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        server = MockBitcoind(MockNode(seed=1), datadir=tmp.name, seed=1, **kwargs).start()
+        self.addCleanup(server.stop)
+        client = RPCClient(wallet="student", datadir=tmp.name, port=server.port, timeout=10)
+        self.addCleanup(client.close)
+        return server, client
+
+    def test_mined_template_is_accepted(self):
+        server, client = self.start()
+        template = client.call("getblocktemplate", [{"rules": ["segwit"]}])
+        work = miner.WorkGenerator(template, b'\x51')
+        unit = work.next_unit()
+        nonce = miner.scan_nonces(unit.header_prefix, miner.compact_to_target(work.bits), 0, 1 << 20)
+        block = miner.serialize_block(unit.header_prefix + struct.pack("<I", nonce),
+                                      work.coinbase(unit.extranonce), work.transactions)
+
+        self.assertIsNone(client.call("submitblock", [block.hex()]))
+        self.assertEqual(client.call("submitblock", [block.hex()]), "duplicate")
+        self.assertEqual(client.call("getblockchaininfo")["blocks"], 1)
+
+    def test_wallet_flow_and_mempool(self):
+        server, client = self.start()
+        client.call_global("createwallet", ["student"])
+        address = client.call("getnewaddress")
+        client.call("generatetoaddress", [1, address])
+        self.assertEqual(client.call("getbalance"), 0.0)  # coinbase still immature
+
+        client.call("generatetoaddress", [COINBASE_MATURITY, ""])
+        self.assertEqual(client.call("getbalance"), 50.0)
+        client.call("sendmany", ["", {address: 1.5}])
+        self.assertEqual(client.call("getmempoolinfo")["size"], 1)
+        self.assertEqual(len(client.call("getblocktemplate", [{"rules": ["segwit"]}])["transactions"]), 1)
+
+    def test_unconfirmed_coins_are_not_chained(self):
+        server, client = self.start()
+        client.call_global("createwallet", ["student"])
+        address = client.call("getnewaddress")
+        client.call("generatetoaddress", [1, address])
+        client.call("generatetoaddress", [COINBASE_MATURITY, ""])
+
+        client.call("sendmany", ["", {address: 30}])
+        with self.assertRaises(RPCError) as ctx:
+            client.call("sendmany", ["", {address: 30}])
+        self.assertIn("Unconfirmed UTXOs", str(ctx.exception))
+
+        client.call("generatetoaddress", [1, ""])
+        self.assertEqual(len(client.call("listunspent")), 2)
+        client.call("sendmany", ["", {address: 30}])
+
+    def test_longpoll_returns_on_new_block(self):
+        server, client = self.start()
+        template = client.call("getblocktemplate", [{"rules": ["segwit"]}])
+        threading.Timer(0.2, server.node.rpc_generatetoaddress, (1, "")).start()
+
+        start = time.time()
+        fresh = client.call("getblocktemplate", [{"rules": ["segwit"], "longpollid": template["longpollid"]}])
+
+        self.assertLess(time.time() - start, 5)
+        self.assertEqual(fresh["height"], template["height"] + 1)
+
+    def test_failure_injection(self):
+        server, client = self.start(fail_rate=1.0)
+        with self.assertRaises(RPCError) as ctx:
+            client.call("getblockchaininfo")
+        self.assertIn("Injected failure", str(ctx.exception))
+
+    def test_latency_injection(self):
+        server, client = self.start(method_latency={"getmempoolinfo": 0.2})
+        start = time.time()
+        client.call("getmempoolinfo")
+        self.assertGreaterEqual(time.time() - start, 0.2)
+
+
+if __name__ == "__main__":
+    unittest.main()
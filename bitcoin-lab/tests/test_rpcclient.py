@@ -0,0 +1,177 @@
+import base64
+import json
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+
+LAB_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(LAB_DIR))
+
+from rpcclient import RPCClient, RPCError, RPCTimeout  # noqa: E402
+
+
+class StubBitcoind(ThreadingHTTPServer):
+    """Answers JSON-RPC the way bitcoind does for the handful of methods the tests need."""
+    daemon_threads = True
+
+    def __init__(self, cookie):
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        self.cookie = cookie
+        self.connections = 0
+        self.batches = 0
+        self.requests = []
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def log_message(self, *args):
+        pass
+
+    def reply(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        length = int(self.headers["Content-Length"])
+        request = json.loads(self.rfile.read(length))
+        expected = "Basic " + base64.b64encode(self.server.cookie.encode()).decode()
+        if self.headers.get("Authorization") != expected:
+            self.send_response(401)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        if isinstance(request, list):
+            # bitcoind answers a batch with 200 and per-call errors
+            self.server.batches += 1
+            self.reply(200, [self.answer(r)[1] for r in request])
+        else:
+            self.reply(*self.answer(request))
+
+    def answer(self, request):
+        self.server.requests.append((self.path, request["method"], request["params"]))
+        method = request["method"]
+        on_wallet = self.path.startswith("/wallet/")
+
+        if method == "getbalance" and not on_wallet:
+            return 500, {"result": None, "id": request["id"],
+                         "error": {"code": -19, "message": "Wallet file not specified (must request wallet RPC through /wallet/<filename> uri-path)."}}
+        elif method == "nodeonly" and on_wallet:
+            return 404, {"result": None, "id": request["id"],
+                         "error": {"code": -32601, "message": "Method not found"}}
+        elif method == "sleep":
+            time.sleep(request["params"][0])
+            return 200, {"result": None, "error": None, "id": request["id"]}
+        elif method == "fail":
+            return 500, {"result": None, "id": request["id"],
+                         "error": {"code": -6, "message": "Unconfirmed UTXOs are available, but spending them creates a chain of transactions that will be rejected by the mempool"}}
+        return 200, {"result": {"method": method, "path": self.path, "params": request["params"]},
+                     "error": None, "id": request["id"]}
+
+
+class RPCClientTests(unittest.TestCase):
+    def setUp(self):
+        self.datadir = Path(tempfile.mkdtemp(prefix="rpcclient-"))
+        (self.datadir / ".cookie").write_text("__cookie__:secret\n", encoding="utf-8")
+        self.server = StubBitcoind("__cookie__:secret")
+        self.thread = threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True)
+        self.thread.start()
+        self.client = RPCClient(wallet="student", datadir=str(self.datadir),
+                                host="127.0.0.1", port=self.server.server_address[1], timeout=5)
+
+    def tearDown(self):
+        self.client.close()
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.datadir)
+
+    def test_calls_wallet_endpoint_with_cookie_auth(self):
+        result = self.client.call("getbalance")
+
+        self.assertEqual(result["path"], "/wallet/student")
+        self.assertEqual(self.server.requests, [("/wallet/student", "getbalance", [])])
+
+    def test_reuses_one_keep_alive_connection(self):
+        for i in range(10):
+            self.assertEqual(self.client.call("echo", [i])["params"], [i])
+
+        self.assertEqual(self.server.connections, 1)
+
+    def test_falls_back_to_global_endpoint(self):
+        result = self.client.call("nodeonly", [1])
+
+        self.assertEqual(result["path"], "/")
+        self.assertEqual([r[0] for r in self.server.requests], ["/wallet/student", "/"])
+
+    def test_call_global_skips_wallet(self):
+        self.assertEqual(self.client.call_global("createwallet", ["pacer"])["path"], "/")
+
+    def test_rpc_errors_carry_code_and_message(self):
+        with self.assertRaises(RPCError) as ctx:
+            self.client.call("fail")
+
+        self.assertEqual(ctx.exception.code, -6)
+        self.assertIn("Unconfirmed UTXOs are available", str(ctx.exception))
+        # The connection survives an RPC-level error
+        self.client.call("echo")
+        self.assertEqual(self.server.connections, 1)
+
+    def test_reloads_cookie_after_node_restart(self):
+        self.client.call("echo")
+        self.server.cookie = "__cookie__:rotated"
+        (self.datadir / ".cookie").write_text("__cookie__:rotated\n", encoding="utf-8")
+
+        self.assertEqual(self.client.call("echo", ["again"])["params"], ["again"])
+
+    def test_batch_maps_results_back_in_call_order(self):
+        results = self.client.batch([("getmempoolinfo", []), ("fail", []), ("getbalance", ["*"])])
+
+        self.assertEqual(self.server.batches, 1)
+        self.assertEqual(results[0]["method"], "getmempoolinfo")
+        self.assertIsInstance(results[1], RPCError)
+        self.assertEqual(results[1].code, -6)
+        self.assertEqual(results[2]["params"], ["*"])
+
+    def test_batch_retries_only_non_wallet_calls_on_global_endpoint(self):
+        results = self.client.batch([("getbalance", []), ("nodeonly", [2])])
+
+        self.assertEqual(self.server.batches, 2)
+        self.assertEqual(results[0]["path"], "/wallet/student")
+        self.assertEqual(results[1]["path"], "/")
+        self.assertEqual(self.server.requests[-1], ("/", "nodeonly", [2]))
+
+    def test_empty_batch_makes_no_request(self):
+        self.assertEqual(self.client.batch([]), [])
+        self.assertEqual(self.server.connections, 0)
+
+    def test_timeout_raises(self):
+        with self.assertRaises(RPCTimeout):
+            self.client.call("sleep", [0.5], timeout=0.1)
+
+    def test_unreachable_node_raises(self):
+        self.server.shutdown()
+        self.server.server_close()
+        client = RPCClient(datadir=str(self.datadir), host="127.0.0.1",
+                           port=self.server.server_address[1], timeout=1)
+
+        with self.assertRaises(RPCError):
+            client.call("echo")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+import binascii
+import io
+import random
+import sys
+import unittest
+from pathlib import Path
+
+
+LAB_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(LAB_DIR))
+sys.path.insert(0, str(LAB_DIR / "benchmarks"))
+
+import miner  # noqa: E402
+import synthetic  # noqa: E402
+
+
+def materialize(parts):
+    return [(bytes(data), label, desc, indent) for data, label, desc, indent in parts]
+
+
+class TxLayoutTests(unittest.TestCase):
+    def test_matches_legacy_parser_field_for_field(self):
+        rng = random.Random(7)
+        for segwit in (False, True):
+            for inputs, outputs in ((1, 1), (2, 3), (3, 1)):
+                tx = synthetic.make_tx(rng, inputs, outputs, segwit)
+                layout, end = miner.parse_tx_layout(tx, tx_index=4)
+
+                self.assertEqual(end, len(tx))
+                self.assertEqual(
+                    materialize(layout.parts()),
+                    miner.parse_tx(binascii.hexlify(tx), 4),
+                    msg=f"segwit={segwit} inputs={inputs} outputs={outputs}",
+                )
+
+    def test_parses_transactions_in_place_from_a_block(self):
+        block = synthetic.make_block(tx_count=50, seed=3)
+        txs = synthetic.make_txs(50, seed=3)
+
+        layout, end = miner.parse_txs_layout(block, 81, 50, first_index=1)
+
+        self.assertEqual(end, len(block))
+        expected = []
+        for i, tx in enumerate(txs):
+            expected.extend(miner.parse_tx(binascii.hexlify(tx), i + 1))
+        self.assertEqual(materialize(layout.parts()), expected)
+
+    def test_parts_are_views_into_the_source_buffer(self):
+        tx = synthetic.make_tx(random.Random(1), 1, 1, True)
+        layout, _ = miner.parse_tx_layout(tx)
+
+        data = next(d for d, label, _, _ in layout.parts() if label == "PrevHash")
+        self.assertIsInstance(data, memoryview)
+        self.assertIs(data.obj, tx)
+
+    def test_truncated_transaction_raises(self):
+        tx = synthetic.make_tx(random.Random(2), 2, 2, True)
+        with self.assertRaises(ValueError):
+            miner.parse_tx_layout(tx[:-10])
+
+
+class BlockBreakdownTests(unittest.TestCase):
+    def test_block_parts_cover_the_whole_block(self):
+        block = synthetic.make_block(tx_count=20, seed=5)
+        parts = list(miner.iter_block_parts(block))
+
+        self.assertEqual(b"".join(bytes(data) for data, _, _, _ in parts), block)
+        self.assertEqual(sum(label == "Tx Data" for _, label, _, _ in parts), 19)
+
+    def test_max_tx_and_max_hex_bound_the_output(self):
+        block = synthetic.make_block(tx_count=200, seed=5)
+        out = io.StringIO()
+
+        miner.print_block_breakdown(miner.iter_tx_parts(block, 0, max_tx=3), out=out, max_hex=16)
+
+        text = out.getvalue()
+        self.assertIn("=== TX #3 ===", text)
+        self.assertNotIn("=== TX #4 ===", text)
+        self.assertIn("196 more transactions", text)
+        self.assertTrue(all(len(line) < 80 for line in text.splitlines()))
+
+    def test_render_hex_truncates_without_hexing_the_tail(self):
+        self.assertEqual(miner.render_hex(b"\xab" * 4), "abababab")
+        self.assertEqual(miner.render_hex(b"\xab" * 40, max_hex=8), "abababab... (+36 bytes)")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+import struct
+import sys
+import time
+import unittest
+from pathlib import Path
+
+
+LAB_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(LAB_DIR))
+
+import zmqnotify  # noqa: E402
+from mockbitcoind import COINBASE_MATURITY, MockNode  # noqa: E402
+
+
+@unittest.skipUnless(zmqnotify.available(), "pyzmq is not installed")
+class ChainEventsTests(unittest.TestCase):
+    def connect(self, mempool_size=None):
+        publisher = zmqnotify.StandInPublisher("tcp://127.0.0.1:*")
+        self.addCleanup(publisher.close)
+        events = zmqnotify.ChainEvents(publisher.endpoint, mempool_size).start()
+        self.addCleanup(events.stop)
+        # ZMQ drops whatever is published before the subscription lands
+        deadline = time.time() + 5
+        while events.blocks_seen == 0 and time.time() < deadline:
+            publisher.hashblock("00" * 32)
+            events.wait_for_block(0.05)
+        self.assertGreater(events.blocks_seen, 0)
+        return publisher, events
+
+    def test_rawtx_counts_until_the_next_block(self):
+        sizes = [0, 0, 1]
+        publisher, events = self.connect(mempool_size=lambda: sizes.pop(0) if sizes else 1)
+        for raw in (b"tx-a", b"tx-b", b"tx-a"):  # a block re-announces its txs
+            publisher.rawtx(raw)
+        self.assertTrue(events.wait_for(lambda: events.txs_seen == 3, 5))
+        self.assertEqual(events.mempool_count, 2)
+
+        publisher.hashblock("ab" * 32)
+        self.assertTrue(events.wait_for(lambda: events.tip == "ab" * 32, 5))
+        self.assertEqual(events.mempool_count, 1)  # resynced over "RPC"
+
+    def test_sequence_gap_is_detected(self):
+        events = zmqnotify.ChainEvents("tcp://127.0.0.1:1")
+        events.handle(b"rawtx", b"x", struct.pack("<I", 7))
+        events.handle(b"rawtx", b"y", struct.pack("<I", 9))
+        self.assertEqual(events.gaps, 1)
+
+    def test_mock_node_publishes_blocks_and_txs(self):
+        publisher, events = self.connect()
+        node = MockNode(seed=3, publisher=publisher)
+        wallet = node.wallet("student", create=True)
+        address = wallet.new_address()
+        node.rpc_generatetoaddress(1, address)
+        node.rpc_generatetoaddress(COINBASE_MATURITY, "")
+        self.assertTrue(events.wait_for(lambda: events.tip == node.tip["hash"], 5))
+
+        node.rpc_sendmany(wallet, "", {address: 1})
+        self.assertTrue(events.wait_for(lambda: events.mempool_count == 1, 5))
+
+
+if __name__ == "__main__":
+    unittest.main()
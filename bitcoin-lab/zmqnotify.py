@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+import argparse
+import hashlib
+import struct
+import threading
+import time
+
+try:
+    import zmq
+except ImportError:  # optional: callers fall back to polling RPC
+    zmq = None
+
+"""
+Optional block/transaction notifications from bitcoind's ZMQ feeds.
+
+ChainEvents subscribes to -zmqpubhashblock and -zmqpubrawtx from a daemon
+thread and keeps the chain tip and mempool size current, so the agent's
+loops can wait for events instead of polling RPC on a timer. The mempool
+size is re-read over RPC once per block (and after a lost message); in
+between, every new rawtx counts one.
+
+StandInPublisher serves the same feeds without a node (mockbitcoind.py
+--zmq-port uses it), and running this file prints what a feed delivers:
+
+    python3 zmqnotify.py tcp://127.0.0.1:28332
+"""
+
+DEFAULT_ENDPOINT = "tcp://127.0.0.1:28332"
+TOPICS = (b"hashblock", b"rawtx")
+POLL_MS = 500
+RCV_HWM = 100_000  # bitcoind's docs advise a high watermark well above the default 1000
+
+
+def available():
+    return zmq is not None
+
+
+class ChainEvents:
+    """
+    Tip and mempool state fed by ZMQ. endpoint: one address or a list (the
+    two feeds may be published on different ports). mempool_size: optional
+    callable returning the node's mempool size (e.g. getmempoolinfo), used
+    to resync.
+    """
+    def __init__(self, endpoint=DEFAULT_ENDPOINT, mempool_size=None):
+        if zmq is None: raise RuntimeError("pyzmq is not installed")
+        self.endpoints = [endpoint] if isinstance(endpoint, str) else list(endpoint)
+        self.mempool_size = mempool_size
+        self.cond = threading.Condition()
+        self.running = False
+        self.thread = None
+        self.tip = None
+        self.blocks_seen = 0
+        self.txs_seen = 0
+        self.mempool_count = 0
+        self.pending = set()  # rawtx digests since the last block (blocks re-announce their txs)
+        self.sequence = {}
+        self.gaps = 0
+        self.last_event = 0.0
+
+    def start(self):
+        self.resync()
+        self.running = True
+        ready = threading.Event()
+        self.thread = threading.Thread(target=self.run, args=(ready,), daemon=True)
+        self.thread.start()
+        ready.wait(5)
+        return self
+
+    def stop(self):
+        self.running = False
+        if self.thread: self.thread.join(2 * POLL_MS / 1000)
+
+    def resync(self):
+        if self.mempool_size is None: return
+        try:
+            size = self.mempool_size()
+        except Exception:
+            return
+        if size is None: return
+        with self.cond:
+            self.mempool_count = int(size)
+            self.pending.clear()
+
+    # --- SUBSCRIBER ---
+    def run(self, ready):
+        ctx = zmq.Context.instance()
+        sock = ctx.socket(zmq.SUB)
+        sock.setsockopt(zmq.RCVHWM, RCV_HWM)
+        sock.setsockopt(zmq.TCP_KEEPALIVE, 1)
+        sock.setsockopt(zmq.LINGER, 0)
+        for topic in TOPICS: sock.setsockopt(zmq.SUBSCRIBE, topic)
+        for endpoint in self.endpoints: sock.connect(endpoint)
+        ready.set()
+        try:
+            while self.running:
+                if not sock.poll(POLL_MS): continue
+                self.handle(*sock.recv_multipart())
+        finally:
+            sock.close()
+
+    def handle(self, topic, body, seq=b""):
+        lost = False
+        if len(seq) == 4:
+            number = struct.unpack("<I", seq)[0]
+            expected = self.sequence.get(topic)
+            lost = expected is not None and number != expected
+            self.sequence[topic] = (number + 1) & 0xffffffff
+        if lost: self.gaps += 1
+
+        if topic == b"hashblock":
+            with self.cond:
+                self.tip = body.hex()
+                self.blocks_seen += 1
+                self.mempool_count = 0
+                self.pending.clear()
+            self.resync()
+        elif topic == b"rawtx":
+            digest = hashlib.sha256(body).digest()
+            with self.cond:
+                self.txs_seen += 1
+                if digest not in self.pending:
+                    self.pending.add(digest)
+                    self.mempool_count += 1
+            if lost: self.resync()
+        else:
+            return
+
+        with self.cond:
+            self.last_event = time.time()
+            self.cond.notify_all()
+
+    # --- WAITING ---
+    def wait_for(self, predicate, timeout):
+        """Blocks until predicate() holds (checked on every event) or timeout; returns its value."""
+        with self.cond:
+            return self.cond.wait_for(predicate, timeout)
+
+    def wait_for_block(self, timeout):
+        """True if a block arrived within timeout."""
+        seen = self.blocks_seen
+        return self.wait_for(lambda: self.blocks_seen != seen, timeout)
+
+
+class StandInPublisher:
+    """Publishes hashblock/rawtx frames the way bitcoind does (topic, body, LE sequence)."""
+    def __init__(self, endpoint=DEFAULT_ENDPOINT):
+        if zmq is None: raise RuntimeError("pyzmq is not installed")
+        self.sock = zmq.Context.instance().socket(zmq.PUB)
+        self.sock.setsockopt(zmq.LINGER, 0)
+        self.sock.bind(endpoint)
+        self.endpoint = self.sock.getsockopt_string(zmq.LAST_ENDPOINT)  # resolves a "*" port
+        self.lock = threading.Lock()  # zmq sockets are not thread-safe
+        self.sequence = {}
+
+    def publish(self, topic, body):
+        with self.lock:
+            seq = self.sequence.get(topic, 0)
+            self.sequence[topic] = (seq + 1) & 0xffffffff
+            self.sock.send_multipart([topic, body, struct.pack("<I", seq)])
+
+    def hashblock(self, block_hash):
+        """block_hash: display hex, as returned by RPC."""
+        self.publish(b"hashblock", bytes.fromhex(block_hash))
+
+    def rawtx(self, raw):
+        self.publish(b"rawtx", raw)
+
+    def close(self):
+        with self.lock:
+            self.sock.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print bitcoind ZMQ block/tx notifications")
+    parser.add_argument("endpoint", nargs="?", default=DEFAULT_ENDPOINT)
+    args = parser.parse_args()
+    if zmq is None:
+        raise SystemExit("pyzmq is not installed (pip install pyzmq)")
+
+    events = ChainEvents(args.endpoint).start()
+    print(f"Listening on {args.endpoint} (Ctrl+C to stop)")
+    try:
+        while True:
+            if events.wait_for_block(10):
+                print(f"block {events.tip} | txs seen {events.txs_seen}, mempool ~{events.mempool_count}, gaps {events.gaps}")
+    except KeyboardInterrupt:
+        events.stop()
+
+
+if __name__ == "__main__":
+    main()